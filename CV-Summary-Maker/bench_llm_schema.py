@@ -0,0 +1,97 @@
+"""
+Before/after comparison of the verbose (legacy) and compact LLM output schemas.
+
+Offline (no API calls) — size of the same structured CV in both wire formats:
+    python bench_llm_schema.py --offline result1.json result2.json
+
+Live — output tokens and latency reported by the provider for both prompts:
+    GEMINI_API_KEY=... python bench_llm_schema.py --provider gemini --model gemini-2.5-flash cv1.txt cv2.txt
+    OPENAI_API_KEY=... python bench_llm_schema.py --provider openai --model gpt-4o-mini cv1.txt
+(.txt inputs are canonicalised CV text, e.g. dumped from the app.)
+"""
+import argparse, json, os, statistics, time
+
+from cv_llm import _strong_prompt, compact_from_verbose
+
+# Prompt as it was before the compact schema (kept here only for comparison runs).
+LEGACY_PROMPT = (
+    "You are a specialized HR in the tunneling industry. "
+    "Return STRICT JSON with keys exactly:\n"
+    "identity: { name_initials, position, nationality, languages[], year_of_birth, total_experience_months }\n"
+    "profile_summary: short paragraph (2-4 lines) summarizing seniority, key methods (EPB/Slurry/Mixshield/NATM/Hard Rock/Open TBM/Shield/Drill & Blast), diameters, TBM OEMs, and countries.\n"
+    "work_experiences: array of { from:'YYYY-MM'|Mon YYYY|'-', to:'YYYY-MM'|Mon YYYY|'Present', role, project, city_country, bullets[] }\n"
+    "education: string[] or objects with degree/institution/city_country/year\n"
+    "skills: string[]\n"
+    "courses: string[]\n"
+    "Constraints: redact PII; initials for names; use '-' for unknown; do not include extra text outside JSON."
+)
+
+
+def _approx_tokens(s: str) -> int:
+    return max(1, round(len(s) / 4))
+
+
+def offline(paths):
+    rows = []
+    for p in paths:
+        with open(p, encoding="utf-8") as fh:
+            verbose = json.load(fh)
+        v = json.dumps(verbose, ensure_ascii=False)
+        c = json.dumps(compact_from_verbose(verbose), ensure_ascii=False, separators=(",", ":"))
+        rows.append((os.path.basename(p), len(v), len(c)))
+        print(f"{os.path.basename(p):40s} verbose {len(v):6d} ch ~{_approx_tokens(v):5d} tok | "
+              f"compact {len(c):6d} ch ~{_approx_tokens(c):5d} tok | -{100 * (1 - len(c) / len(v)):.0f}%")
+    if rows:
+        tv = sum(r[1] for r in rows); tc = sum(r[2] for r in rows)
+        print(f"TOTAL verbose {tv} ch, compact {tc} ch, saving {100 * (1 - tc / tv):.0f}%")
+
+
+def _call(provider, api_key, model, prompt, text):
+    payload = json.dumps({"desired_position": "", "resume_text": text}, ensure_ascii=False)
+    t0 = time.perf_counter()
+    if provider == "openai":
+        from openai import OpenAI
+        resp = OpenAI(api_key=api_key).chat.completions.create(
+            model=model, temperature=0, response_format={"type": "json_object"},
+            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": payload}])
+        out_tok = resp.usage.completion_tokens if resp.usage else 0
+    else:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        resp = genai.GenerativeModel(model).generate_content(
+            prompt + "\nINPUT:\n" + payload,
+            generation_config={"temperature": 0, "response_mime_type": "application/json"})
+        um = getattr(resp, "usage_metadata", None)
+        out_tok = getattr(um, "candidates_token_count", 0) if um else 0
+    return out_tok, time.perf_counter() - t0
+
+
+def live(provider, model, paths):
+    api_key = os.getenv("OPENAI_API_KEY" if provider == "openai" else "GEMINI_API_KEY")
+    if not api_key:
+        raise SystemExit("API key env var not set")
+    res = {"legacy": [], "compact": []}
+    for p in paths:
+        with open(p, encoding="utf-8") as fh:
+            text = fh.read()
+        for name, prompt in (("legacy", LEGACY_PROMPT), ("compact", _strong_prompt())):
+            tok, dt = _call(provider, api_key, model, prompt, text)
+            res[name].append((tok, dt))
+            print(f"{os.path.basename(p):40s} {name:8s} out_tokens={tok:5d} latency={dt:6.2f}s")
+    for name, vals in res.items():
+        if vals:
+            print(f"{name:8s} mean out_tokens={statistics.mean(v[0] for v in vals):.0f} "
+                  f"mean latency={statistics.mean(v[1] for v in vals):.2f}s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("--offline", action="store_true")
+    ap.add_argument("--provider", choices=["gemini", "openai"], default="gemini")
+    ap.add_argument("--model", default="")
+    a = ap.parse_args()
+    if a.offline:
+        offline(a.paths)
+    else:
+        live(a.provider, a.model or ("gpt-4o-mini" if a.provider == "openai" else "gemini-2.5-flash"), a.paths)
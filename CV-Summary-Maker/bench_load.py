@@ -0,0 +1,242 @@
+"""
+Load driver: runs N CVs through the generate pipeline (filter -> canonicalise -> redact -> LLM call
+layer -> sanitise -> ensure_schema -> render) with C concurrent workers and reports
+throughput and latency percentiles.
+
+--mock starts mock_llm_server in-process and points both SDKs at it (no API quota used):
+    python bench_load.py --mock --cvs 200 --concurrency 8 --latency-median 1.0 --error-rate 0.02 --burst-every 30 --burst-len 3
+    python bench_load.py --mock --provider openai --fallback gemini --rpm 300 --cvs 100
+Real endpoints (uses quota; keys from GEMINI_API_KEY / OPENAI_API_KEY):
+    python bench_load.py --cvs 5 --concurrency 2
+--inputs DIR uses the PDF/DOCX files in DIR (cycled) instead of synthetic CV text.
+--pack sends short CVs several per request (cv_pack); each worker then runs one pack at a time:
+    python bench_load.py --mock --rpm 60 --cvs 120 --concurrency 8 --pack
+"""
+import argparse, json, os, statistics, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from cv_pipeline import (extract_text_any, canonicalize_text, strip_pii, build_payload, sanitize_cv_json,
+                         ensure_schema, DEFAULT_TEMPLATE_PATH)
+from cv_llm import GEMINI_BASE_URL_ENV
+from cv_pagefilter import filter_cv_text
+from cv_usage import totals
+from cv_profile import RunProfiler
+from cv_llm_client import CallPolicy, Provider, DEFAULT_MODELS, API_KEY_ENVS, breaker_states
+from cv_router import RoutingConfig, TierStats, STRONG_MODELS
+from cv_pack import PackConfig, PackItem, PackResult, Packer, call_pack, packable
+from cv_render_pool import renderer
+
+
+class _Upload:
+    """Minimal stand-in for Streamlit's UploadedFile."""
+
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as fh:
+            self._data = fh.read()
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+def synthetic_cv_text(i: int, cv: dict) -> str:
+    """Plain CV text for a structured CV; i varies name, contact details and length."""
+    ident = cv.get("identity") or {}
+    lines = [f"Candidate {i:05d}", f"{ident.get('position') or 'TBM Operator'}",
+             f"Email: candidate{i}@example.com  Phone: +44 7700 {900000 + i:06d}",
+             f"Nationality: {ident.get('nationality') or '-'}  Languages: {', '.join(ident.get('languages') or [])}", ""]
+    work = cv.get("work_experiences") or []
+    for rep in range(1 + i % 3):
+        for w in work:
+            lines.append(f"{w.get('from')} - {w.get('to')}  {w.get('role')}  {w.get('project')}  {w.get('city_country')}")
+            lines.extend(f"• {b}" for b in w.get("bullets") or [])
+    lines += ["", "Education"] + [str(e) for e in cv.get("education") or []]
+    lines += ["", "Skills: " + ", ".join(cv.get("skills") or [])]
+    return "\n".join(lines)
+
+
+def _pct(xs, q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else 0.0
+
+
+def prepare(i: int, raw: str, position: str, page_filter: bool = True) -> PackItem:
+    chars_in = len(raw)
+    if page_filter:
+        raw = filter_cv_text(raw)[0]
+    pii = {}
+    text = strip_pii(canonicalize_text(raw), pii)
+    return PackItem(str(i), build_payload(text, position), raw, {"chars_in": chars_in, "pii": pii})
+
+
+def finish(res: PackResult, t0: float, render: bool) -> dict:
+    it = res.item
+    if res.error is not None:
+        e = res.error
+        return {"ok": False, "total_s": time.perf_counter() - t0, "llm_s": e.info.get("seconds", 0.0),
+                "attempts": e.info.get("attempts", 0), "hedged": e.info.get("hedged", 0), "fallback": False,
+                "tier": "-", "error": str(e)[:200], "chars_in": it.ctx["chars_in"], "chars_out": len(it.raw),
+                "usage": e.info.get("usage") or []}
+    info, text = res.info, it.payload["resume_text"]
+    data = sanitize_cv_json(res.resp or {}, it.ctx["pii"])
+    identity, profile, work, edu, skills, courses = ensure_schema(data, it.payload["desired_position"], text)
+    if render:
+        renderer("ooxml")(DEFAULT_TEMPLATE_PATH, identity, profile, work, edu, skills, courses, full_text=text)
+    return {"ok": True, "total_s": time.perf_counter() - t0, "llm_s": info["seconds"], "attempts": info["attempts"],
+            "hedged": info["hedged"], "fallback": info["fallback"], "tier": info["tier"], "error": "",
+            "chars_in": it.ctx["chars_in"], "chars_out": len(it.raw), "usage": info["usage"]}
+
+
+def run_group(raws, position: str, primary: Provider, fallback, route_cfg, policy: CallPolicy, stats: TierStats,
+              render: bool, page_filter: bool = True) -> list:
+    """One request's worth of CVs: [(index, raw)], several when packed. A row per CV."""
+    t0 = time.perf_counter()
+    items = [prepare(i, raw, position, page_filter) for i, raw in raws]
+    return [finish(r, t0, render) for r in call_pack(items, primary, fallback, route_cfg, policy, stats)]
+
+
+def run_one(raw: str, position: str, primary: Provider, fallback, route_cfg, policy: CallPolicy, stats: TierStats,
+            render: bool, page_filter: bool = True) -> dict:
+    return run_group([(0, raw)], position, primary, fallback, route_cfg, policy, stats, render, page_filter)[0]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cvs", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--inputs", default=None, help="directory of PDF/DOCX CVs (cycled)")
+    ap.add_argument("--provider", choices=list(DEFAULT_MODELS), default="gemini")
+    ap.add_argument("--model", default="")
+    ap.add_argument("--fallback", choices=list(DEFAULT_MODELS), default=None)
+    ap.add_argument("--route", action="store_true", help="fast/strong routing (cv_router)")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--attempts", type=int, default=3)
+    ap.add_argument("--no-hedge", action="store_true")
+    ap.add_argument("--no-render", action="store_true")
+    ap.add_argument("--no-filter", action="store_true", help="send the full extracted text (no cv_pagefilter)")
+    ap.add_argument("--pack", action="store_true", help="pack short CVs into shared requests (cv_pack)")
+    ap.add_argument("--position", default="Tunneling Professional")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--profile", default=None, metavar="DIR", help="write cv_run.pstats and cv_run.collapsed.txt to DIR")
+    m = ap.add_argument_group("mock server")
+    m.add_argument("--mock", action="store_true")
+    m.add_argument("--latency-median", type=float, default=1.0)
+    m.add_argument("--latency-sigma", type=float, default=0.6)
+    m.add_argument("--error-rate", type=float, default=0.0)
+    m.add_argument("--burst-every", type=float, default=0.0)
+    m.add_argument("--burst-len", type=float, default=0.0)
+    m.add_argument("--rpm", type=int, default=0)
+    m.add_argument("--seed", type=int, default=None)
+    m.add_argument("--bad-json-rate", type=float, default=0.0, help="share of malformed JSON answers")
+    a = ap.parse_args(argv)
+
+    srv = None
+    if a.mock:
+        from mock_llm_server import MockLLMServer, MockConfig
+        srv = MockLLMServer(MockConfig(a.latency_median, a.latency_sigma, 120.0, a.error_rate, a.burst_every,
+                                       a.burst_len, a.rpm, a.seed, bad_json_rate=a.bad_json_rate))
+        url = srv.start()
+        os.environ[GEMINI_BASE_URL_ENV] = url
+        os.environ["OPENAI_BASE_URL"] = url + "/v1"
+
+    def key(name):
+        return "mock" if a.mock else (os.getenv(API_KEY_ENVS[name]) or "")
+
+    primary = Provider(a.provider, key(a.provider), a.model or DEFAULT_MODELS[a.provider])
+    if not primary.api_key:
+        sys.exit(f"{API_KEY_ENVS[a.provider]} not set (or use --mock)")
+    fallback = Provider(a.fallback, key(a.fallback), DEFAULT_MODELS[a.fallback]) if a.fallback else None
+    route_cfg = RoutingConfig(primary.model, STRONG_MODELS[a.provider]) if a.route else None
+    policy = CallPolicy(timeout=a.timeout, attempts=a.attempts, hedge=not a.no_hedge)
+    stats = TierStats()
+
+    if a.inputs:
+        paths = sorted(os.path.join(a.inputs, f) for f in os.listdir(a.inputs) if f.lower().endswith((".pdf", ".docx")))
+        if not paths:
+            sys.exit(f"no PDF/DOCX files in {a.inputs}")
+        texts = [extract_text_any(_Upload(p)) for p in paths]
+        raws = [texts[i % len(texts)] for i in range(a.cvs)]
+    else:
+        from mock_llm_server import CANNED_CV
+        raws = [synthetic_cv_text(i, CANNED_CV) for i in range(a.cvs)]
+
+    done = [0]
+    lock = threading.Lock()
+
+    groups = [[(i, raw)] for i, raw in enumerate(raws)]
+    if a.pack:
+        # grouped on the text that will be sent; prepare() is repeated inside the timed run
+        packer, groups = Packer(PackConfig()), []
+        for i, raw in enumerate(raws):
+            it = prepare(i, raw, a.position, not a.no_filter)
+            if packable(it, packer.cfg, route_cfg):
+                g = packer.add(it)
+                if g:
+                    groups.append([(int(x.key), raws[int(x.key)]) for x in g])
+            else:
+                groups.append([(i, raw)])
+        groups.append([(int(x.key), raws[int(x.key)]) for x in packer.flush()])
+        groups = [g for g in groups if g]
+
+    def job(group):
+        rows = run_group(group, a.position, primary, fallback, route_cfg, policy, stats, not a.no_render, not a.no_filter)
+        with lock:
+            before = done[0]
+            done[0] += len(rows)
+            if not a.json and done[0] // max(1, a.cvs // 10) > before // max(1, a.cvs // 10):
+                print(f"  {done[0]}/{a.cvs}", file=sys.stderr)
+        return rows
+
+    prof = RunProfiler(bool(a.profile))
+    t0 = time.perf_counter()
+    with prof, ThreadPoolExecutor(max_workers=a.concurrency) as ex:
+        results = [r for rows in ex.map(job, groups) for r in rows]
+    wall = time.perf_counter() - t0
+    if srv is not None:
+        srv.stop()
+
+    ok = [r for r in results if r["ok"]]
+    tot = [r["total_s"] for r in ok]
+    llm = [r["llm_s"] for r in ok]
+    report = {
+        "cvs": len(results), "ok": len(ok), "failed": len(results) - len(ok), "concurrency": a.concurrency,
+        "groups": len(groups),
+        "wall_s": round(wall, 2), "throughput_cv_per_s": round(len(ok) / wall, 2) if wall else 0.0,
+        "total_s": {q: round(_pct(tot, v), 3) for q, v in (("p50", .5), ("p90", .9), ("p99", .99), ("max", 1.0))},
+        "llm_s": {q: round(_pct(llm, v), 3) for q, v in (("p50", .5), ("p90", .9), ("p99", .99), ("max", 1.0))},
+        "mean_total_s": round(statistics.mean(tot), 3) if tot else 0.0,
+        "attempts": sum(r["attempts"] for r in results), "hedged": sum(r["hedged"] for r in results),
+        "fallbacks": sum(1 for r in results if r["fallback"]),
+        "chars_in": sum(r["chars_in"] for r in results), "chars_out": sum(r["chars_out"] for r in results),
+        "tokens": totals(c for r in results for c in r["usage"]),
+        "tiers": stats.summary(), "breakers": breaker_states(),
+        "errors": sorted({r["error"] for r in results if r["error"]})[:5],
+    }
+    if srv is not None:
+        report["mock"] = dict(srv.stats.counts)
+    if prof.ran:
+        report["profile"] = {"files": prof.write(a.profile), "functions": prof.summary()}
+    if a.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['ok']}/{report['cvs']} CVs ok in {report['wall_s']}s at concurrency {a.concurrency} "
+              f"-> {report['throughput_cv_per_s']} CV/s" + (f" ({report['groups']} packed groups)" if a.pack else ""))
+        print("end-to-end s: " + "  ".join(f"{k} {v}" for k, v in report["total_s"].items()))
+        print("LLM s:        " + "  ".join(f"{k} {v}" for k, v in report["llm_s"].items()))
+        print(f"attempts {report['attempts']}, hedged {report['hedged']}, fallbacks {report['fallbacks']}, breakers {report['breakers']}")
+        print(f"prompt text: {report['chars_in']:,} chars extracted -> {report['chars_out']:,} sent")
+        t = report["tokens"]
+        print(f"tokens: {t['calls']} calls, in {t['input_tokens']:,} (cached {t['cached_tokens']:,}), out {t['output_tokens']:,}, ${t['usd']:.4f}")
+        if "mock" in report:
+            print("mock server: " + json.dumps(report["mock"]))
+        for e in report["errors"]:
+            print("error: " + e)
+        if "profile" in report:
+            for r in report["profile"]["functions"]:
+                print(f"  {r['function']:<28} sampled {r['sampled_s']:>8.3f}s")
+            print("profile: " + ", ".join(report["profile"]["files"]))
+    return report
+
+
+if __name__ == "__main__":
+    main()
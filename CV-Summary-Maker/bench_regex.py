@@ -0,0 +1,149 @@
+"""
+Worst-case regex audit: every module-level pattern of the pipeline modules is run over
+adversarial texts (long numeric tables, whitespace and separator runs, repeated bullets, dotted
+runs without an "@") at two sizes. A pattern whose time grows much faster than its input
+(quadratic backtracking) is flagged; the exit status is 1 when any is.
+
+    python bench_regex.py                       # 20k and 80k characters
+    python bench_regex.py --size 50000 --top 20 --json
+    python bench_regex.py --stages              # also the text stages on MAX_TEXT_CHARS of each input
+
+A pattern slower than --limit seconds at the smaller size is flagged without trying the larger one
+(Python cannot interrupt a running match).
+"""
+import argparse, importlib, json, re, sys, time
+from typing import Dict, List, Tuple
+
+MODULES = ["cv_pipeline", "cv_quantities", "cv_pagefilter", "cv_index", "cv_rank", "cv_router", "cv_llm", "cv_ingest",
+           "cv_ooxml"]
+GROWTH = 4          # the larger size is GROWTH x the smaller one
+SUPERLINEAR = 8.0   # time ratio flagged (linear ~4, quadratic ~16)
+MIN_SECONDS = 0.01  # below this the ratio is timer noise
+
+UNITS = {
+    "digits": "1 2 3 4 ",
+    "phone_like": "+44 (0) 7700 900 ",
+    "digit_table": "  ".join(f"{j * 37 % 997:>5}" for j in range(12)) + "\n",
+    "dotted_numbers": "1.2.3.4.5.6.",
+    "digits_only": "1234567890",
+    "dots": "a.",
+    "letters": "A",
+    "spaces": " ",
+    "ws_mix": " \t\n ",
+    "hyphens": "-\n",
+    "words": "tunnel ",
+    "upper_words": "EPB TBM ",
+    "bullets": "• Operated slurry EPB TBM with foam and face pressure control. ",
+    "at_signs": "x@",
+    "urls": "www.",
+    "page_of": "Page 1 of ",
+    "ranges": "1-2-3-4-5-6-7 ",
+    "lists": "6,6,6,6,6,6,6,6 m ",
+    "diameters": "Ø Ø Ø Ø 1 ",
+    "dates": "03/2019 - 04/2020 ",
+}
+
+
+def adversarial_inputs(n: int) -> Dict[str, str]:
+    return {name: (unit * (n // len(unit) + 1))[:n] for name, unit in UNITS.items()}
+
+
+def module_patterns(modules: List[str] = MODULES) -> List[Tuple[str, "re.Pattern"]]:
+    """(module.name, pattern) for compiled patterns held at module level, directly or in dicts/lists/tuples."""
+    out = []
+    for modname in modules:
+        mod = importlib.import_module(modname)
+        for name, v in vars(mod).items():
+            if isinstance(v, re.Pattern):
+                out.append((f"{modname}.{name}", v))
+            elif isinstance(v, dict):
+                out += [(f"{modname}.{name}[{k}]", x) for k, x in v.items() if isinstance(x, re.Pattern)]
+            elif isinstance(v, (list, tuple)):
+                for i, x in enumerate(v):
+                    if isinstance(x, tuple) and x and isinstance(x[0], re.Pattern):
+                        x = x[0]
+                    if isinstance(x, re.Pattern):
+                        out.append((f"{modname}.{name}[{i}]", x))
+    return out
+
+
+def _scan(rx: "re.Pattern", text: str) -> float:
+    """Seconds for finditer over text; best of three when a run is short enough for noise to matter."""
+    best = float("inf")
+    for _ in range(3):
+        t = time.perf_counter()
+        for _m in rx.finditer(text):
+            pass
+        best = min(best, time.perf_counter() - t)
+        if best > 10 * MIN_SECONDS:
+            break
+    return best
+
+
+def audit(size: int, limit: float, only: str = "") -> List[dict]:
+    """One row per (pattern, input): seconds at size and GROWTH*size, their ratio, and whether it is flagged."""
+    small, large = adversarial_inputs(size), adversarial_inputs(size * GROWTH)
+    rows = []
+    for name, rx in module_patterns():
+        if only and only not in name:
+            continue
+        for iname in UNITS:
+            for _ in range(2):   # a ratio over SUPERLINEAR is measured again before it counts
+                t1 = _scan(rx, small[iname])
+                t4 = _scan(rx, large[iname]) if t1 <= limit else None
+                ratio = t4 / max(t1, 1e-6) if t4 is not None else None
+                flagged = t4 is None or (t4 >= MIN_SECONDS and ratio > SUPERLINEAR)
+                if not flagged or t4 is None:
+                    break
+            rows.append({"pattern": name, "input": iname, "small_s": round(t1, 4),
+                         "large_s": None if t4 is None else round(t4, 4),
+                         "ratio": None if ratio is None else round(ratio, 1), "flagged": flagged})
+    return rows
+
+
+def stage_times() -> List[dict]:
+    """Seconds per text stage on MAX_TEXT_CHARS of each adversarial input (the size extraction lets through)."""
+    from cv_pipeline import MAX_TEXT_CHARS, canonicalize_text, scan_methods, strip_pii
+    from cv_pagefilter import filter_cv_text
+    from cv_quantities import scan_quantities
+    stages = [("filter_cv_text", lambda s: filter_cv_text(s)[0]), ("canonicalize_text", canonicalize_text),
+              ("strip_pii", strip_pii), ("scan_methods", scan_methods), ("scan_quantities", scan_quantities)]
+    rows = []
+    for iname, text in adversarial_inputs(MAX_TEXT_CHARS).items():
+        row = {"input": iname}
+        for sname, fn in stages:
+            t = time.perf_counter()
+            fn(text)
+            row[sname] = round(time.perf_counter() - t, 3)
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size", type=int, default=20000, help="smaller input size in characters")
+    ap.add_argument("--limit", type=float, default=2.0, help="seconds at the smaller size that flag a pattern outright")
+    ap.add_argument("--top", type=int, default=10, help="slowest rows to print")
+    ap.add_argument("--only", default="", help="patterns whose name contains this")
+    ap.add_argument("--stages", action="store_true", help="time the text stages on MAX_TEXT_CHARS inputs")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    a = ap.parse_args()
+
+    rows = audit(a.size, a.limit, a.only)
+    report = {"size": a.size, "growth": GROWTH, "patterns": len({r["pattern"] for r in rows}),
+              "flagged": [r for r in rows if r["flagged"]],
+              "slowest": sorted(rows, key=lambda r: -(r["large_s"] if r["large_s"] is not None else float("inf")))[:a.top]}
+    if a.stages:
+        report["stages"] = stage_times()
+    if a.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['patterns']} patterns x {len(UNITS)} inputs at {a.size:,} and {a.size * GROWTH:,} chars; "
+              f"{len(report['flagged'])} flagged")
+        for r in report["slowest"]:
+            large = "   n/a" if r["large_s"] is None else f"{r['large_s']:8.4f}s"
+            mark = "  SUPERLINEAR" if r["flagged"] else ""
+            print(f"  {r['small_s']:8.4f}s {large}  x{r['ratio'] or '?':<6} {r['pattern']} on {r['input']}{mark}")
+        for r in report.get("stages", []):
+            print(f"  {r['input']:<15} " + "  ".join(f"{k} {v}s" for k, v in r.items() if k != "input"))
+    sys.exit(1 if report["flagged"] else 0)
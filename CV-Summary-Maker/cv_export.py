@@ -0,0 +1,139 @@
+"""
+Structured export of batch results: one JSON record per processed CV, plus an optional flat CSV.
+
+    exp = BatchExport(out_dir, with_csv=True)
+    exp.write(build_record(name, identity, profile, work, edu, skills, courses, content_hash=h, ...))
+    exp.close()
+    exp.files()   # [(arcname, path)] for the download ZIP
+
+Records are built from what the pipeline already holds after ensure_schema (redacted identity,
+work items newest first, cv_facts), so an ATS import never has to parse the DOCX. Each record is
+appended and flushed as soon as its CV is done: a batch that dies halfway leaves a valid JSONL
+of everything before the failure. The CSV has one row per CV; list and per-method/country fields
+are joined with "; ".
+"""
+import csv, io, json, os, threading, time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cv_pipeline import cv_facts, sort_work
+
+EXPORT_VERSION = 1
+EXPORT_STEM = "cv_bot_records"
+CSV_FIELDS = ["batch", "source", "content_hash", "processed_at", "position", "name_initials", "nationality",
+              "year_of_birth", "languages", "months", "years", "methods", "oems", "countries", "sectors",
+              "diameters_m", "tunnel_m", "rings", "advance_m_day", "projects", "latest_role", "latest_project",
+              "model", "total_s"]
+
+
+def build_record(source: str, identity: dict, profile: str, work: list, edu: list, skills: list, courses: list, *,
+                 content_hash: str, batch: str = "", facts: Optional[dict] = None, timings: Optional[dict] = None,
+                 llm: Optional[dict] = None) -> dict:
+    """
+    JSON-ready record of one CV. `timings` is {stage: seconds}; `llm` is the provider/model that
+    answered (call_routed's info carries both).
+    """
+    return {
+        "version": EXPORT_VERSION,
+        "batch": batch,
+        "source": source,
+        "content_hash": content_hash,
+        "processed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "identity": identity,
+        "profile": profile,
+        "work": sort_work(work),
+        "education": edu,
+        "skills": skills,
+        "courses": courses,
+        "facts": facts if facts is not None else cv_facts(identity, work),
+        "llm": {k: (llm or {}).get(k) for k in ("provider", "model")},
+        "timings": {k: round(v, 3) for k, v in (timings or {}).items()},
+    }
+
+
+def _joined(v) -> str:
+    if isinstance(v, dict):
+        return "; ".join(f"{k}:{n}" for k, n in v.items())
+    if isinstance(v, (list, tuple)):
+        return "; ".join(str(x) for x in v)
+    return "" if v is None else str(v)
+
+
+def flatten(record: dict) -> Dict[str, object]:
+    """One CSV row (CSV_FIELDS) of a record."""
+    ident, facts, work = record.get("identity") or {}, record.get("facts") or {}, record.get("work") or []
+    latest = work[0] if work else {}
+    row = {"batch": record.get("batch"), "source": record.get("source"), "content_hash": record.get("content_hash"),
+           "processed_at": record.get("processed_at"), "projects": len(work),
+           "latest_role": latest.get("role"), "latest_project": latest.get("project"),
+           "model": (record.get("llm") or {}).get("model"), "total_s": (record.get("timings") or {}).get("total_s")}
+    for k in ("position", "name_initials", "nationality", "year_of_birth", "languages"):
+        row[k] = _joined(ident.get(k))
+    for k in ("months", "years", "methods", "oems", "countries", "sectors", "diameters_m", "tunnel_m", "rings",
+              "advance_m_day"):
+        row[k] = _joined(facts.get(k))
+    return row
+
+
+def jsonl_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+def csv_text(records: Iterable[dict]) -> str:
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=CSV_FIELDS)
+    w.writeheader()
+    w.writerows(flatten(r) for r in records)
+    return buf.getvalue()
+
+
+class BatchExport:
+    """
+    Append-only <stem>.jsonl (and <stem>.csv) in out_dir, flushed after every record. append=True
+    continues existing files (a long-running watcher across restarts) instead of starting them over.
+    """
+
+    def __init__(self, out_dir: str, with_csv: bool = False, stem: str = EXPORT_STEM, append: bool = False):
+        os.makedirs(out_dir, exist_ok=True)
+        self.jsonl_path = os.path.join(out_dir, f"{stem}.jsonl")
+        self.csv_path = os.path.join(out_dir, f"{stem}.csv") if with_csv else None
+        self.count = 0
+        self._lock = threading.Lock()
+        mode = "a" if append else "w"
+        self._jsonl = open(self.jsonl_path, mode, encoding="utf-8")
+        self._csv_fh = open(self.csv_path, mode, newline="", encoding="utf-8") if with_csv else None
+        self._csv = None
+        if self._csv_fh is not None:
+            self._csv = csv.DictWriter(self._csv_fh, fieldnames=CSV_FIELDS)
+            if not self._csv_fh.tell():
+                self._csv.writeheader()
+
+    def write(self, record: dict):
+        line = jsonl_line(record)
+        with self._lock:
+            self._jsonl.write(line)
+            self._jsonl.flush()
+            if self._csv is not None:
+                self._csv.writerow(flatten(record))
+                self._csv_fh.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            for fh in (self._jsonl, self._csv_fh):
+                if fh is not None and not fh.closed:
+                    fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def files(self) -> List[Tuple[str, str]]:
+        """(arcname, path) of the export files, for the batch ZIP; empty when nothing was written."""
+        if not self.count:
+            return []
+        paths = [self.jsonl_path] + ([self.csv_path] if self.csv_path else [])
+        return [(os.path.basename(p), p) for p in paths]
+
@@ -0,0 +1,206 @@
+"""
+Local searchable index of processed candidates (SQLite + FTS5).
+
+Every processed CV is stored once per content hash (cv_pipeline.upload_key, the SHA-1 of the
+uploaded file, the same key as the extraction cache and ZIP dedup): typed columns for filtering
+(years, max diameter), one row per method/OEM/country/sector/diameter in facet
+tables, and an FTS5 table over roles, projects, bullets, skills and courses.
+
+    python cv_index.py "EPB + Herrenknecht + >= 8 m + Qatar, >= 10 years"
+"""
+import json, os, re, sqlite3, time
+from typing import Dict, List, Optional
+
+from cv_pipeline import HERE, CANON_METHODS, NAME_REGEX, OEM_HINTS, ISO_COUNTRIES, ALIAS_TO_COUNTRY, cv_facts
+
+INDEX_DB_ENV = "CV_INDEX_DB"
+DEFAULT_INDEX_DB = os.path.join(HERE, "cv_index.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT UNIQUE NOT NULL,
+    source_name TEXT,
+    position TEXT,
+    name_initials TEXT,
+    nationality TEXT,
+    months INTEGER NOT NULL DEFAULT 0,
+    years INTEGER NOT NULL DEFAULT 0,
+    max_diameter_m REAL,
+    indexed_at REAL NOT NULL,
+    record_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cand_years ON candidates(years);
+CREATE INDEX IF NOT EXISTS ix_cand_months ON candidates(months);
+CREATE INDEX IF NOT EXISTS ix_cand_indexed ON candidates(indexed_at);
+CREATE INDEX IF NOT EXISTS ix_cand_diam ON candidates(max_diameter_m);
+CREATE TABLE IF NOT EXISTS cand_method (cand_id INTEGER NOT NULL, method TEXT NOT NULL, months INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (method, cand_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cand_oem (cand_id INTEGER NOT NULL, oem TEXT NOT NULL, PRIMARY KEY (oem, cand_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cand_country (cand_id INTEGER NOT NULL, country TEXT NOT NULL, months INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (country, cand_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cand_sector (cand_id INTEGER NOT NULL, sector TEXT NOT NULL, PRIMARY KEY (sector, cand_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cand_diameter (cand_id INTEGER NOT NULL, diameter_m REAL NOT NULL, PRIMARY KEY (diameter_m, cand_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_method_cand ON cand_method(cand_id);
+CREATE INDEX IF NOT EXISTS ix_oem_cand ON cand_oem(cand_id);
+CREATE INDEX IF NOT EXISTS ix_country_cand ON cand_country(cand_id);
+CREATE INDEX IF NOT EXISTS ix_sector_cand ON cand_sector(cand_id);
+CREATE INDEX IF NOT EXISTS ix_diameter_cand ON cand_diameter(cand_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS cand_fts USING fts5(position, work, skills, tokenize = 'unicode61 remove_diacritics 2');
+"""
+_FACET_TABLES = ("cand_method", "cand_oem", "cand_country", "cand_sector", "cand_diameter")
+
+
+def index_path() -> str:
+    return os.getenv(INDEX_DB_ENV) or DEFAULT_INDEX_DB
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    con = sqlite3.connect(path or index_path(), timeout=30)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript(SCHEMA)
+    return con
+
+
+def _fts_doc(identity: dict, work: list, skills: list, courses: list) -> tuple:
+    lines = []
+    for w in work or []:
+        lines.append(" ".join(str(w.get(k) or "") for k in ("role", "project", "city_country")))
+        lines.extend(str(b) for b in (w.get("bullets") or []) if b)
+    return (str(identity.get("position") or ""), "\n".join(lines),
+            "\n".join(str(x) for x in list(skills or []) + list(courses or []) if x))
+
+
+def index_candidate(con: sqlite3.Connection, content_hash: str, source_name: str, identity: dict, work: list,
+                    edu: list, skills: list, courses: list, facts: Optional[dict] = None) -> int:
+    """Insert or replace one candidate; returns its row id."""
+    facts = facts or cv_facts(identity, work)
+    record = {"identity": identity, "work": work, "education": edu, "skills": skills, "courses": courses, "facts": facts}
+    with con:
+        row = con.execute("SELECT id FROM candidates WHERE content_hash = ?", (content_hash,)).fetchone()
+        vals = (source_name, identity.get("position"), identity.get("name_initials"), identity.get("nationality"),
+                facts["months"], facts["years"], max(facts["diameters_m"]) if facts["diameters_m"] else None,
+                time.time(), json.dumps(record, ensure_ascii=False))
+        if row:
+            cid = row["id"]
+            con.execute("UPDATE candidates SET source_name=?, position=?, name_initials=?, nationality=?, months=?, years=?, "
+                        "max_diameter_m=?, indexed_at=?, record_json=? WHERE id=?", vals + (cid,))
+            for t in _FACET_TABLES:
+                con.execute(f"DELETE FROM {t} WHERE cand_id = ?", (cid,))
+            con.execute("DELETE FROM cand_fts WHERE rowid = ?", (cid,))
+        else:
+            cid = con.execute("INSERT INTO candidates (source_name, position, name_initials, nationality, months, years, "
+                              "max_diameter_m, indexed_at, record_json, content_hash) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                              vals + (content_hash,)).lastrowid
+        con.executemany("INSERT OR IGNORE INTO cand_method VALUES (?,?,?)", [(cid, k, v) for k, v in facts["methods"].items()])
+        con.executemany("INSERT OR IGNORE INTO cand_oem VALUES (?,?)", [(cid, o) for o in facts["oems"]])
+        con.executemany("INSERT OR IGNORE INTO cand_country VALUES (?,?,?)", [(cid, k, v) for k, v in facts["countries"].items()])
+        con.executemany("INSERT OR IGNORE INTO cand_sector VALUES (?,?)", [(cid, s) for s in facts["sectors"]])
+        con.executemany("INSERT OR IGNORE INTO cand_diameter VALUES (?,?)", [(cid, d) for d in facts["diameters_m"]])
+        con.execute("INSERT INTO cand_fts (rowid, position, work, skills) VALUES (?,?,?,?)",
+                    (cid,) + _fts_doc(identity, work, skills, courses))
+    return cid
+
+
+# ---------------- Query parsing ----------------
+_MIN_DIAM_RE = re.compile(r"^(?:>=|≥|min\.?|at\s+least)?\s*(\d+(?:[.,]\d+)?)\s*m(?:\s*(?:Ø|dia(?:meter)?))?$", re.I)
+_DIAM_RANGE_RE = re.compile(r"^(?:Ø\s*)?(\d+(?:[.,]\d+)?)\s*(?:-|–|to)\s*(\d+(?:[.,]\d+)?)\s*m$", re.I)
+_MIN_YEARS_RE = re.compile(r"^(?:>=|≥|min\.?|at\s+least)?\s*(\d+)\s*\+?\s*(?:y|yrs?|years?)$", re.I)
+_METHOD_ALIASES = {m.lower(): m for m in CANON_METHODS}
+_OEM_ALIASES = {o.lower(): o for o in OEM_HINTS}
+_COUNTRY_ALIASES = {**{c.lower(): c for c in ISO_COUNTRIES}, **{a.lower(): c for a, c in ALIAS_TO_COUNTRY.items()}}
+
+
+def parse_query(q: str) -> Dict:
+    """'EPB + Herrenknecht + >= 8 m + Qatar, >= 10 years' -> structured filters; leftovers become full-text terms."""
+    out = {"methods": [], "oems": [], "countries": [], "min_diameter": None, "max_diameter": None, "min_years": None, "text": []}
+    for tok in re.split(r"[+,;]|\s+AND\s+", q or "", flags=re.I):
+        tok = tok.strip()
+        if not tok:
+            continue
+        m = _MIN_YEARS_RE.match(tok)
+        if m:
+            out["min_years"] = int(m.group(1)); continue
+        m = _DIAM_RANGE_RE.match(tok)
+        if m:
+            lo, hi = sorted(float(x.replace(",", ".")) for x in m.groups())
+            out["min_diameter"], out["max_diameter"] = lo, hi; continue
+        m = _MIN_DIAM_RE.match(tok)
+        if m:
+            out["min_diameter"] = float(m.group(1).replace(",", ".")); continue
+        low = tok.lower()
+        if low in _METHOD_ALIASES:
+            out["methods"].append(_METHOD_ALIASES[low]); continue
+        meth = next((k for k, rx in NAME_REGEX.items() if rx.fullmatch(tok)), None)
+        if meth:
+            out["methods"].append(meth); continue
+        if low in _OEM_ALIASES:
+            out["oems"].append(_OEM_ALIASES[low]); continue
+        if low in _COUNTRY_ALIASES:
+            out["countries"].append(_COUNTRY_ALIASES[low]); continue
+        out["text"].append(tok)
+    return out
+
+
+def _fts_expr(terms: List[str]) -> str:
+    words = [w for t in terms for w in re.findall(r"\w+", t)]
+    return " ".join('"' + w.replace('"', '""') + '"' for w in words)
+
+
+def search(con: sqlite3.Connection, methods=(), oems=(), countries=(), min_diameter=None, min_years=None,
+           text=(), limit: int = 100, max_diameter=None) -> List[dict]:
+    """AND over all given filters; most experienced first. A diameter range needs one project inside it."""
+    where, args = [], []
+    if min_years is not None:
+        where.append("c.years >= ?"); args.append(int(min_years))
+    if max_diameter is not None:
+        where.append("EXISTS (SELECT 1 FROM cand_diameter x WHERE x.diameter_m BETWEEN ? AND ? AND x.cand_id = c.id)")
+        args.extend([float(min_diameter or 0), float(max_diameter)])
+    elif min_diameter is not None:
+        where.append("c.max_diameter_m >= ?"); args.append(float(min_diameter))
+    for m in methods:
+        where.append("EXISTS (SELECT 1 FROM cand_method x WHERE x.method = ? AND x.cand_id = c.id)"); args.append(m)
+    for o in oems:
+        where.append("EXISTS (SELECT 1 FROM cand_oem x WHERE x.oem = ? AND x.cand_id = c.id)"); args.append(o)
+    for k in countries:
+        where.append("EXISTS (SELECT 1 FROM cand_country x WHERE x.country = ? AND x.cand_id = c.id)"); args.append(k)
+    expr = _fts_expr(list(text or []))
+    if expr:
+        where.append("c.id IN (SELECT rowid FROM cand_fts WHERE cand_fts MATCH ?)"); args.append(expr)
+    # Filter and limit first, then decorate only the page that is returned.
+    sql = ("SELECT c.id, c.source_name, c.position, c.name_initials, c.nationality, c.years, c.months, c.max_diameter_m, "
+           "(SELECT group_concat(method, ', ') FROM cand_method WHERE cand_id = c.id) AS methods, "
+           "(SELECT group_concat(oem, ', ') FROM cand_oem WHERE cand_id = c.id) AS oems, "
+           "(SELECT group_concat(country, ', ') FROM cand_country WHERE cand_id = c.id) AS countries "
+           "FROM (SELECT c.id FROM candidates c" + (" WHERE " + " AND ".join(where) if where else "")
+           + " ORDER BY c.months DESC, c.id DESC LIMIT ?) hit JOIN candidates c ON c.id = hit.id "
+           "ORDER BY c.months DESC, c.id DESC")
+    return [dict(r) for r in con.execute(sql, args + [int(limit)])]
+
+
+def search_query(con: sqlite3.Connection, q: str, limit: int = 100) -> List[dict]:
+    f = parse_query(q)
+    return search(con, f["methods"], f["oems"], f["countries"], f["min_diameter"], f["min_years"], f["text"], limit,
+                  max_diameter=f["max_diameter"])
+
+
+def count(con: sqlite3.Connection) -> int:
+    return con.execute("SELECT count(*) FROM candidates").fetchone()[0]
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Search the local candidate index.")
+    ap.add_argument("query")
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--limit", type=int, default=20)
+    a = ap.parse_args()
+    con = connect(a.db)
+    t0 = time.perf_counter()
+    rows = search_query(con, a.query, a.limit)
+    dt = (time.perf_counter() - t0) * 1000
+    print(json.dumps(parse_query(a.query), ensure_ascii=False))
+    for r in rows:
+        print(f"{r['id']:6d} {r['years']:3d}y  Ø{r['max_diameter_m'] or 0:5.2f}  {r['position'] or '-':30.30s} "
+              f"{r['methods'] or '-':25.25s} {r['oems'] or '-':25.25s} {r['countries'] or '-'}")
+    print(f"{len(rows)} of {count(con)} candidates in {dt:.1f} ms")
@@ -0,0 +1,166 @@
+"""
+Streaming ingestion of uploads: PDF/DOCX files, folder uploads and ZIP archives (folders and
+nested ZIPs inside them included), yielded one CV at a time.
+
+    skipped = []
+    for item in iter_cvs(uploads, skipped):   # item.name keeps folders: "ClientA/CVs/Smith.pdf"
+        text = extract_text_any(item)
+    # skipped: [(name, reason)] for unsupported, duplicate, encrypted, oversized members
+
+A ZIP is opened on the uploaded file object and read through its central directory; a member
+is decompressed only when the consumer reaches it, so besides the archive itself memory holds
+one CV at a time. Duplicates are keyed by (CRC-32, size), which the central directory stores:
+a member with an unseen key is decompressed once and handed on, a member whose key was seen
+is decompressed once and compared by SHA-1 with the earlier one, never twice.
+"""
+import hashlib, io, os, posixpath, zipfile, zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SUPPORTED_EXTS = (".pdf", ".docx")
+MAX_MEMBER_BYTES = 50 * 1024 * 1024   # uncompressed; larger members are not CVs (or are ZIP bombs)
+MAX_ZIP_DEPTH = 3
+_JUNK_DIRS = {"__MACOSX", ".git", ".svn"}
+
+
+class CVItem:
+    """One CV ready for extract_text_any: .name (relative path), .getvalue(), .sha1."""
+
+    def __init__(self, name: str, data: bytes, sha1: str):
+        self.name, self._data, self.sha1 = name, data, sha1
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+    @property
+    def folder(self) -> str:
+        return posixpath.dirname(self.name)
+
+
+def safe_relpath(name: str) -> str:
+    """Archive/upload path as a relative POSIX path without '..', drive letters or empty parts."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    if parts and len(parts[0]) == 2 and parts[0][1] == ":":
+        parts = parts[1:]
+    return "/".join(parts)
+
+
+def docx_arcname(src_name: str) -> str:
+    """Output path for a source CV: same folder, "CV BOT - <stem>.docx"."""
+    rel = safe_relpath(src_name)
+    stem = posixpath.splitext(posixpath.basename(rel))[0]
+    return posixpath.join(posixpath.dirname(rel), f"CV BOT - {stem}.docx")
+
+
+def _skip_reason(rel: str) -> Optional[str]:
+    parts = rel.split("/")
+    if not rel or any(p in _JUNK_DIRS for p in parts[:-1]) or parts[-1].startswith(("._", "~$")) or parts[-1] == ".DS_Store":
+        return "system file"
+    if not rel.lower().endswith(SUPPORTED_EXTS + (".zip",)):
+        return "unsupported type"
+    return None
+
+
+class _Dedup:
+    def __init__(self):
+        self._seen: Dict[Tuple[int, int], List[Tuple[str, str]]] = {}   # (crc, size) -> [(sha1, name)]
+
+    def check(self, crc: int, size: int, data: bytes, name: str) -> Tuple[str, Optional[str]]:
+        """(sha1, name of the earlier identical file or None), remembering this one if it is new."""
+        sha = hashlib.sha1(data).hexdigest()
+        prev = self._seen.setdefault((crc, size), [])
+        for s, n in prev:
+            if s == sha:
+                return sha, n
+        prev.append((sha, name))
+        return sha, None
+
+
+def _iter_zip(fileobj, prefix: str, dedup: _Dedup, skipped: list, depth: int) -> Iterator[CVItem]:
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        skipped.append((prefix or "archive", "not a valid ZIP"))
+        return
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            rel = safe_relpath(posixpath.join(prefix, info.filename))
+            reason = _skip_reason(rel)
+            if reason is None and info.flag_bits & 0x1:
+                reason = "encrypted"
+            if reason is None and info.file_size > MAX_MEMBER_BYTES:
+                reason = f"larger than {MAX_MEMBER_BYTES // (1024 * 1024)} MB"
+            if reason is not None:
+                skipped.append((rel, reason))
+                continue
+            if rel.lower().endswith(".zip"):
+                if depth >= MAX_ZIP_DEPTH:
+                    skipped.append((rel, "ZIP nested too deeply"))
+                    continue
+                # nested archives need random access; this holds one inner ZIP at a time
+                yield from _iter_zip(io.BytesIO(zf.read(info)), posixpath.splitext(rel)[0], dedup, skipped, depth + 1)
+                continue
+            try:
+                data = zf.read(info)
+            except (zipfile.BadZipFile, NotImplementedError, RuntimeError, zlib.error) as e:
+                skipped.append((rel, f"unreadable: {e}"))
+                continue
+            sha, dup = dedup.check(info.CRC, info.file_size, data, rel)
+            if dup is not None:
+                skipped.append((rel, f"duplicate of {dup}"))
+                continue
+            yield CVItem(rel, data, sha)
+
+
+def iter_cvs(uploads: Iterable, skipped: Optional[list] = None) -> Iterator[CVItem]:
+    """
+    CVs from uploaded files (anything with .name and .getvalue(); ZIPs are read via .seek/.read
+    when present), in upload order, ZIP members in archive order. Skips go to `skipped`.
+    """
+    skipped = [] if skipped is None else skipped
+    dedup = _Dedup()
+    for up in uploads or []:
+        rel = safe_relpath(up.name)
+        reason = _skip_reason(rel)
+        if reason is not None:
+            skipped.append((rel, reason))
+            continue
+        if rel.lower().endswith(".zip"):
+            src = up if hasattr(up, "seek") and hasattr(up, "read") else io.BytesIO(up.getvalue())
+            src.seek(0)
+            yield from _iter_zip(src, posixpath.splitext(rel)[0], dedup, skipped, 1)
+            continue
+        data = up.getvalue()
+        sha, dup = dedup.check(zlib.crc32(data), len(data), data, rel)
+        if dup is not None:
+            skipped.append((rel, f"duplicate of {dup}"))
+            continue
+        yield CVItem(rel, data, sha)
+
+
+def describe_skipped(skipped: List[Tuple[str, str]], limit: int = 8) -> str:
+    """Caption listing skipped inputs; empty when nothing was skipped."""
+    if not skipped:
+        return ""
+    shown = "; ".join(f"{n} ({r})" for n, r in skipped[:limit])
+    return f"Skipped {len(skipped)}: {shown}" + (f"; … {len(skipped) - limit} more" if len(skipped) > limit else "")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    class _Upload(io.BytesIO):
+        def __init__(self, path: str):
+            with open(path, "rb") as fh:
+                super().__init__(fh.read())
+            self.name = os.path.basename(path)
+
+    ap = argparse.ArgumentParser(description="List the CVs a set of files/ZIPs would feed into a batch.")
+    ap.add_argument("paths", nargs="+")
+    a = ap.parse_args()
+    skips: list = []
+    for it in iter_cvs((_Upload(p) for p in a.paths), skips):
+        print(f"{it.sha1[:12]}  {len(it.getvalue()):>9,}  {it.name}")
+    for n, r in skips:
+        print(f"skipped  {n}: {r}")
@@ -0,0 +1,398 @@
+"""LLM plumbing for CV Summary Maker: prompt, compact wire schema, provider calls."""
+import json, os, re, time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from cv_usage import gemini_tokens, openai_tokens, record
+
+# ---------------- Compact wire schema ----------------
+# The provider returns short keys and positional arrays; expand_compact() turns that
+# back into the verbose structure ensure_schema() consumes. Derived fields
+# (experience totals, summary paragraph) are computed locally and never requested.
+IDENTITY_FIELDS = ["name_initials", "position", "nationality", "languages", "year_of_birth"]
+WORK_FIELDS = ["from", "to", "role", "project", "city_country", "bullets"]
+
+
+def _strong_prompt() -> str:
+    return (
+        "You are a specialized HR in the tunneling industry. "
+        "Return STRICT compact JSON with keys exactly:\n"
+        "i: [name_initials, position, nationality, [languages], year_of_birth]\n"
+        "w: array of [from, to, role, project, city_country, [bullets]] where from/to are 'YYYY-MM'|'Mon YYYY'|'-' and to may be 'Present'\n"
+        "e: education as strings 'degree — institution, city_country (year)'\n"
+        "s: skills as strings\n"
+        "c: courses as strings\n"
+        "Constraints: redact PII; initials for names; use '-' for unknown; no extra text outside JSON."
+    )
+
+
+def _packed_prompt() -> str:
+    # same prefix as the single-CV prompt, so provider-side prompt caching still applies
+    return _strong_prompt() + (
+        "\nINPUT holds several CVs as cvs: [{id, desired_position, resume_text}]. Return {\"r\": [...]} with one "
+        "object per CV in input order, each {\"id\": <its id>, \"i\", \"w\", \"e\", \"s\", \"c\"} in the format above "
+        "and built from that CV's resume_text only."
+    )
+
+
+def _row(v, fields: List[str]) -> dict:
+    if isinstance(v, dict):
+        return v
+    if not isinstance(v, (list, tuple)):
+        return {}
+    return {k: v[i] for i, k in enumerate(fields) if i < len(v)}
+
+
+def expand_compact(d) -> dict:
+    """Compact wire JSON -> verbose dict (identity/work_experiences/education/skills/courses).
+    Verbose responses pass through unchanged so older prompts keep working."""
+    if not isinstance(d, dict):
+        return {}
+    if "identity" in d or "work_experiences" in d:
+        return d
+    ident = _row(d.get("i"), IDENTITY_FIELDS)
+    langs = ident.get("languages")
+    if isinstance(langs, str):
+        ident["languages"] = [x.strip() for x in langs.split(",") if x.strip()]
+    work = []
+    for w in d.get("w") or []:
+        item = _row(w, WORK_FIELDS)
+        if not item:
+            continue
+        b = item.get("bullets")
+        item["bullets"] = [b] if isinstance(b, str) else list(b or [])
+        work.append(item)
+    return {
+        "identity": ident,
+        "work_experiences": work,
+        "education": list(d.get("e") or []),
+        "skills": list(d.get("s") or []),
+        "courses": list(d.get("c") or []),
+    }
+
+
+def compact_from_verbose(d: dict) -> dict:
+    """Inverse of expand_compact (used for size comparisons and fixtures)."""
+    ident = d.get("identity") or {}
+    edu = []
+    for e in d.get("education") or []:
+        if isinstance(e, dict):
+            edu.append(f"{e.get('degree') or '-'} — {e.get('institution') or '-'}, {e.get('city_country') or '-'} ({e.get('year') or '-'})")
+        else:
+            edu.append(str(e))
+    return {
+        "i": [ident.get(k) for k in IDENTITY_FIELDS],
+        "w": [[w.get(k) for k in WORK_FIELDS] for w in d.get("work_experiences") or []],
+        "e": edu,
+        "s": list(d.get("skills") or []),
+        "c": list(d.get("courses") or []),
+    }
+
+_YEAR_RE = re.compile(r"(?:19|20)\d\d")
+
+
+def schema_problems(d: dict) -> List[str]:
+    """Cheap plausibility checks on an expanded response; empty list = usable."""
+    if not isinstance(d, dict) or not d:
+        return ["empty response"]
+    out = []
+    if not isinstance(d.get("identity"), dict) or not any(d["identity"].values()):
+        out.append("no identity")
+    work = d.get("work_experiences")
+    if not isinstance(work, list) or not work:
+        out.append("no work experience")
+        return out
+    if any(not isinstance(w, dict) or not (w.get("role") or w.get("project")) for w in work):
+        out.append("work item without role/project")
+    undated = sum(1 for w in work if isinstance(w, dict) and not _YEAR_RE.search(str(w.get("from") or "")))
+    if undated * 2 > len(work):
+        out.append(f"{undated}/{len(work)} work items without a start year")
+    return out
+
+
+# ---------------- Response parsing ----------------
+# Models sometimes wrap the JSON in a markdown fence, leave trailing commas, or stop
+# mid-array at the output token limit. repair_json() fixes those in one pass;
+# parse_response() checks the compact keys, and the provider calls re-ask only for
+# what is still missing (for a cut-off "w", only the rows after the last complete one).
+COMPACT_KEYS = ["i", "w", "e", "s", "c"]
+_CLOSERS = {"{": "}", "[": "]"}
+_CTRL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _trim_comma(out: List[str]) -> bool:
+    """Drop trailing whitespace and one trailing comma from out; True if a comma went."""
+    while out and out[-1] in " \t\r\n":
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        return True
+    return False
+
+
+def repair_json(text: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Single left-to-right scan from the first '{' to its matching '}': drops text around
+    the object (prose, markdown fences), trailing commas and raw newlines in strings,
+    fixes mismatched closers, and on truncation cuts back to the last complete value
+    and closes every open container. Returns (json text or None, fixes applied).
+    """
+    start = (text or "").find("{")
+    if start < 0:
+        return None, ["no JSON object"]
+    fixes = ["text around JSON"] if text[:start].strip() else []
+    out: List[str] = []
+    stack = []  # per open container: [closer, length of out at its last complete value, awaiting an object value]
+    in_str = esc = False
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        i += 1
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+                out.append(ch)
+                top = stack[-1]
+                if top[0] == "]" or top[2]:  # a value, not an object key
+                    top[1], top[2] = len(out), False
+                continue
+            elif ch in _CTRL_ESCAPES:
+                out.append(_CTRL_ESCAPES[ch])
+                if "raw control character" not in fixes:
+                    fixes.append("raw control character")
+                continue
+            out.append(ch)
+        elif ch == '"':
+            in_str = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            out.append(ch)
+            stack.append([_CLOSERS[ch], len(out), False])
+        elif ch in "}]":
+            closer, safe, dangling = stack.pop()
+            if dangling:  # '"key": }'
+                del out[safe:]
+            if _trim_comma(out) and "trailing comma" not in fixes:
+                fixes.append("trailing comma")
+            if ch != closer and "mismatched bracket" not in fixes:
+                fixes.append("mismatched bracket")
+            out.append(closer)
+            if not stack:
+                if text[i:].strip() and "text around JSON" not in fixes:
+                    fixes.append("text around JSON")
+                break
+            stack[-1][1], stack[-1][2] = len(out), False
+        elif ch == ",":
+            stack[-1][1], stack[-1][2] = len(out), False
+            out.append(ch)
+        elif ch == ":":
+            stack[-1][2] = True
+            out.append(ch)
+        else:
+            if not ch.isspace():
+                stack[-1][2] = False  # number/literal value started; only ',' or a closer completes it
+            out.append(ch)
+    if stack:
+        fixes.append("truncated")
+        del out[stack[-1][1]:]
+        while stack:
+            _trim_comma(out)
+            out.append(stack.pop()[0])
+    return "".join(out), fixes
+
+
+class ParsedResponse(NamedTuple):
+    data: dict            # compact (or verbose) object, possibly partial
+    fixes: List[str]      # repairs applied, plus "invalid <key>" for dropped keys
+    missing: List[str]    # compact keys to re-ask for
+    w_after: Optional[list] = None  # last complete work row when "w" was cut off
+
+
+def _load_object(text: str) -> Tuple[dict, List[str]]:
+    """Strict json.loads first; otherwise repair_json(). ({} when nothing usable, fixes applied)."""
+    fixes: List[str] = []
+    try:
+        d = json.loads(text)
+    except (TypeError, ValueError):
+        fixed, fixes = repair_json(text or "")
+        try:
+            d = json.loads(fixed) if fixed is not None else {}
+        except ValueError:
+            d, fixes = {}, fixes + ["unparseable"]
+    return (d if isinstance(d, dict) else {}), fixes
+
+
+def parse_response(text: str) -> ParsedResponse:
+    """_load_object(), then check the compact keys."""
+    d, fixes = _load_object(text)
+    return _check_compact(d, fixes)
+
+
+def _check_compact(d: dict, fixes: List[str]) -> ParsedResponse:
+    if "identity" in d or "work_experiences" in d:
+        return ParsedResponse(d, fixes, [])
+    for k in ("e", "s", "c"):
+        if isinstance(d.get(k), str):
+            d[k] = [d[k]]
+    for k, ok in (("i", (list, dict)), ("w", list), ("e", list), ("s", list), ("c", list)):
+        if k in d and not isinstance(d[k], ok):
+            del d[k]
+            fixes.append(f"invalid {k}")
+    missing = [k for k in COMPACT_KEYS if k not in d]
+    w_after = None
+    if "truncated" in fixes and d:
+        last = list(d)[-1]  # the key being written when the output stopped
+        if last == "w" and len(d["w"]) > 1:
+            d["w"] = d["w"][:-1]  # the last row may be cut short
+            w_after = d["w"][-1]
+        if last not in missing:
+            missing.insert(COMPACT_KEYS.index(last) if last in COMPACT_KEYS else 0, last)
+    return ParsedResponse(d, fixes, [k for k in COMPACT_KEYS if k in missing], w_after)
+
+
+def parse_packed(text: str) -> Dict[str, ParsedResponse]:
+    """
+    Packed answer {"r": [{"id", compact keys...}]} -> {id: ParsedResponse}. When the answer was
+    cut off, the last item is dropped: its keys may look complete with a list cut short.
+    """
+    d, fixes = _load_object(text)
+    items = d.get("r") if isinstance(d.get("r"), list) else []
+    items = [x for x in items if isinstance(x, dict) and x.get("id") is not None]
+    if "truncated" in fixes and items:
+        items = items[:-1]
+    fixes = [f for f in fixes if f != "truncated"]
+    out = {}
+    for x in items:
+        key = str(x.pop("id"))
+        out.setdefault(key, _check_compact(x, list(fixes)))
+    return out
+
+
+def _reask_prompt(missing: List[str], w_after: Optional[list]) -> str:
+    msg = ("Your previous answer was incomplete. Return ONLY a compact JSON object with the keys "
+           + ", ".join(missing) + " in the formats above.")
+    if w_after is not None:
+        msg += (" For w, return only the work experiences listed after this one: "
+                + json.dumps(list(w_after[:5]), ensure_ascii=False))
+    return msg
+
+
+def _same_row(a, b) -> bool:
+    return isinstance(a, list) and isinstance(b, list) and a[:4] == b[:4]
+
+
+def merge_reask(first: ParsedResponse, second: ParsedResponse) -> dict:
+    """first.data with the re-asked keys filled in; continuation rows already present are skipped."""
+    d = dict(first.data)
+    for k in first.missing:
+        if k not in second.data:
+            continue
+        if k == "w" and first.w_after is not None and isinstance(second.data["w"], list):
+            have = d.get("w") or []
+            d["w"] = have + [r for r in second.data["w"] if not any(_same_row(r, h) for h in have)]
+        else:
+            d[k] = second.data[k]
+    return d
+
+
+def _parse_or_reask(text: str, ask) -> dict:
+    """Parse a JSON answer; when keys are missing or cut off, ask(instruction) once for just those."""
+    first = parse_response(text)
+    if not first.missing:
+        return expand_compact(first.data)
+    second = parse_response(ask(_reask_prompt(first.missing, first.w_after)) or "")
+    return expand_compact(merge_reask(first, second))
+
+
+# ---------------- Provider calls ----------------
+# Endpoint overrides (e.g. mock_llm_server.py): OPENAI_BASE_URL is read by the OpenAI SDK itself.
+GEMINI_BASE_URL_ENV = "GEMINI_BASE_URL"
+
+
+def configure_gemini(api_key: str):
+    """genai configured for api_key; GEMINI_BASE_URL switches to the REST transport against that endpoint."""
+    import google.generativeai as genai
+    base = os.getenv(GEMINI_BASE_URL_ENV)
+    if base:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": base})
+    else:
+        genai.configure(api_key=api_key)
+    return genai
+
+
+
+
+def call_gemini_json(api_key: str, model: str, payload: dict, timeout: Optional[float] = None) -> dict:
+    genai = configure_gemini(api_key)
+    gmodel = genai.GenerativeModel(model)
+    inp = "\nINPUT:\n" + json.dumps(payload, ensure_ascii=False)
+
+    def ask(extra: str = "") -> str:
+        t0 = time.monotonic()
+        resp = gmodel.generate_content(
+            _strong_prompt() + ("\n" + extra if extra else "") + inp,
+            generation_config={"temperature": 0, "response_mime_type": "application/json"},
+            request_options={"timeout": timeout, "retry": None} if timeout else None,  # retries: see call_openai_json
+        )
+        record("gemini", model, "reask" if extra else "extract", gemini_tokens(resp), time.monotonic() - t0)
+        return resp.text or ""
+
+    return _parse_or_reask(ask(), ask)
+
+
+def _packed_results(text: str) -> Dict[str, dict]:
+    """Complete items of a packed answer, expanded; incomplete ones are left to the caller to re-ask."""
+    return {k: expand_compact(p.data) for k, p in parse_packed(text).items() if not p.missing}
+
+
+def call_gemini_packed(api_key: str, model: str, payload: dict, timeout: Optional[float] = None) -> Dict[str, dict]:
+    """payload {"cvs": [{id, desired_position, resume_text}]} -> {id: verbose result} for the items answered in full."""
+    genai = configure_gemini(api_key)
+    t0 = time.monotonic()
+    resp = genai.GenerativeModel(model).generate_content(
+        _packed_prompt() + "\nINPUT:\n" + json.dumps(payload, ensure_ascii=False),
+        generation_config={"temperature": 0, "response_mime_type": "application/json"},
+        request_options={"timeout": timeout, "retry": None} if timeout else None,
+    )
+    record("gemini", model, "packed", gemini_tokens(resp), time.monotonic() - t0)
+    return _packed_results(resp.text or "")
+
+
+def call_openai_json(api_key: str, model: str, payload: dict, timeout: Optional[float] = None) -> dict:
+    from openai import OpenAI
+    # retries are handled by cv_llm_client; the SDK's own would hide latency and errors from it
+    client = OpenAI(api_key=api_key, timeout=timeout, max_retries=0) if timeout else OpenAI(api_key=api_key)
+    user = json.dumps(payload, ensure_ascii=False)
+
+    def ask(extra: str = "") -> str:
+        t0 = time.monotonic()
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": _strong_prompt() + ("\n" + extra if extra else "")},
+                      {"role": "user", "content": user}],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        record("openai", model, "reask" if extra else "extract", openai_tokens(resp), time.monotonic() - t0)
+        return resp.choices[0].message.content or ""
+
+    return _parse_or_reask(ask(), ask)
+
+
+def call_openai_packed(api_key: str, model: str, payload: dict, timeout: Optional[float] = None) -> Dict[str, dict]:
+    """See call_gemini_packed."""
+    from openai import OpenAI
+    client = OpenAI(api_key=api_key, timeout=timeout, max_retries=0) if timeout else OpenAI(api_key=api_key)
+    t0 = time.monotonic()
+    resp = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "system", "content": _packed_prompt()},
+                  {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}],
+        response_format={"type": "json_object"},
+        temperature=0
+    )
+    record("openai", model, "packed", openai_tokens(resp), time.monotonic() - t0)
+    return _packed_results(resp.choices[0].message.content or "")
@@ -0,0 +1,274 @@
+"""
+Resilient LLM calls for batch runs: per-attempt timeouts, retries with exponential
+backoff and full jitter on 429/5xx/timeouts, an optional hedged second request once
+an attempt runs past the provider's observed latency percentile, fallback to a second
+provider, and one circuit breaker per provider.
+
+Breakers and latency windows are module-level, so they persist across Streamlit reruns
+(and across files in a batch) within one server process.
+"""
+import contextvars, os, random, re, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from cv_llm import call_gemini_json, call_gemini_packed, call_openai_json, call_openai_packed
+from cv_usage import collect
+
+PROVIDERS = {"gemini": call_gemini_json, "openai": call_openai_json}
+# several CVs per request (cv_pack): payload {"cvs": [...]} -> {id: result}
+PACKED_PROVIDERS = {"gemini": call_gemini_packed, "openai": call_openai_packed}
+DEFAULT_MODELS = {"gemini": "gemini-2.5-flash", "openai": "gpt-4o-mini"}
+API_KEY_ENVS = {"gemini": "GEMINI_API_KEY", "openai": "OPENAI_API_KEY"}
+# provider name -> callable that blocks until another request may be sent (cv_worker_service
+# installs its host-wide rate limiters here); consulted before every attempt
+RATE_GATES: Dict[str, Callable[[], None]] = {}
+
+
+class Provider(NamedTuple):
+    name: str      # key of PROVIDERS
+    api_key: str
+    model: str
+
+
+class CallPolicy(NamedTuple):
+    timeout: float = 60.0          # per attempt, hedge leg included
+    attempts: int = 3              # per provider
+    backoff_base: float = 1.0
+    backoff_max: float = 20.0
+    hedge: bool = True
+    hedge_quantile: float = 0.95   # hedge once an attempt is slower than this share of recent successes
+    hedge_min_samples: int = 8
+    hedge_floor: float = 5.0       # never hedge earlier than this many seconds
+    breaker_failures: int = 5      # consecutive retryable failures that open a provider's breaker
+    breaker_cooldown: float = 60.0
+
+
+class LLMCallError(RuntimeError):
+    def __init__(self, message: str, info: dict):
+        super().__init__(message)
+        self.info = info
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open (one probe) after the cooldown."""
+
+    def __init__(self, failures: int, cooldown: float):
+        self.failures, self.cooldown = failures, cooldown
+        self._fails = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            st = self.state
+            if st == "closed":
+                return True
+            if st == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._fails, self._opened_at = 0, None
+                return
+            self._fails += 1
+            if self._opened_at is not None or self._fails >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+class LatencyWindow:
+    """Recent successful call latencies for one provider."""
+
+    def __init__(self, size: int = 200):
+        self._d = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._d.append(seconds)
+
+    def __len__(self):
+        return len(self._d)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            xs = sorted(self._d)
+        if not xs:
+            return None
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+_LOCK = threading.Lock()
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_LATENCY: Dict[str, LatencyWindow] = {}
+# attempts and hedge legs run here; size it above the number of CVs processed concurrently
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("CV_LLM_THREADS", "32")), thread_name_prefix="llm")
+
+
+def breaker(name: str, policy: CallPolicy = CallPolicy()) -> CircuitBreaker:
+    with _LOCK:
+        if name not in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker(policy.breaker_failures, policy.breaker_cooldown)
+        return _BREAKERS[name]
+
+
+def latency(name: str) -> LatencyWindow:
+    with _LOCK:
+        return _LATENCY.setdefault(name, LatencyWindow())
+
+
+def _status(e: BaseException) -> Optional[int]:
+    for obj in (e, getattr(e, "response", None)):
+        for attr in ("status_code", "code", "status"):
+            v = getattr(obj, attr, None)
+            if isinstance(v, int):
+                return v
+    return None
+
+
+_RETRYABLE_NAMES = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+                    "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "TooManyRequests"}
+
+
+def is_retryable(e: BaseException) -> bool:
+    """Timeouts, connection errors, 408/429 and 5xx; everything else (auth, bad request, bad JSON) is final."""
+    if isinstance(e, (TimeoutError, ConnectionError)) or type(e).__name__ in _RETRYABLE_NAMES:
+        return True
+    s = _status(e)
+    return s is not None and (s in (408, 429) or s >= 500)
+
+
+_SIZE_ERROR_RE = re.compile(r"context (?:length|window)|too (?:long|large)|too many tokens|maximum (?:context|number of tokens)|"
+                            r"token limit|max_tokens|payload size", re.I)
+
+
+def is_size_error(e: BaseException) -> bool:
+    """413, or a provider message saying the request (or the answer it needs) is too large."""
+    return _status(e) == 413 or bool(_SIZE_ERROR_RE.search(str(e)))
+
+
+def is_rate_limited(e: BaseException) -> bool:
+    return _status(e) == 429 or type(e).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+
+def _retry_after(e: BaseException) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def backoff_delay(attempt: int, policy: CallPolicy, e: Optional[BaseException] = None) -> float:
+    """Full jitter: uniform(0, min(max, base * 2**attempt)), but at least the server's Retry-After."""
+    d = random.uniform(0, min(policy.backoff_max, policy.backoff_base * (2 ** attempt)))
+    return min(policy.backoff_max, max(d, _retry_after(e) if e is not None else 0.0))
+
+
+def _timed(provider: Provider, payload: dict, timeout: float, calls: Dict[str, Callable]):
+    t0 = time.monotonic()
+    out = calls[provider.name](provider.api_key, provider.model, payload, timeout=timeout)
+    return out, time.monotonic() - t0
+
+
+def _attempt(provider: Provider, payload: dict, policy: CallPolicy, info: dict, calls: Dict[str, Callable]) -> dict:
+    """One attempt, hedged with a second identical request when it outlives the latency quantile."""
+    lat = latency(provider.name)
+    hedge_after = None
+    if policy.hedge and len(lat) >= policy.hedge_min_samples:
+        hedge_after = max(policy.hedge_floor, lat.quantile(policy.hedge_quantile) or 0.0)
+    t0 = time.monotonic()
+    # each leg runs in a copy of the caller's context so cv_usage records reach its scopes
+    pending = {_POOL.submit(contextvars.copy_context().run, _timed, provider, payload, policy.timeout, calls)}
+    legs, err = 1, None
+    while pending:
+        now = time.monotonic()
+        wait_for = t0 + policy.timeout - now
+        if hedge_after is not None and legs == 1:
+            wait_for = min(wait_for, t0 + hedge_after - now)
+        done, pending = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                out, dt = f.result()
+            except Exception as e:
+                err = e
+                continue
+            lat.add(dt)
+            return out
+        now = time.monotonic()
+        if pending and now - t0 >= policy.timeout:
+            # abandoned legs finish in the background; the SDK timeout bounds them
+            raise TimeoutError(f"{provider.name} did not answer within {policy.timeout:g}s")
+        if pending and hedge_after is not None and legs == 1 and now - t0 >= hedge_after:
+            pending.add(_POOL.submit(contextvars.copy_context().run, _timed, provider, payload, policy.timeout, calls))
+            legs += 1
+            info["hedged"] += 1
+    raise err
+
+
+def call_llm_json(payload: dict, providers: List[Provider], policy: CallPolicy = CallPolicy(),
+                  calls: Dict[str, Callable] = PROVIDERS) -> Tuple[dict, dict]:
+    """
+    Try providers in order (primary first, then fallbacks) and return (response, info).
+    info: provider, model, attempts, hedged, fallback (bool), errors (list of str), failures (kind of
+    each failure: retryable | size | final | circuit), seconds, usage (cv_usage.Call per provider request). `calls` maps provider name to the request
+    function (PACKED_PROVIDERS for several CVs at once).
+    Raises LLMCallError when every provider failed or had its breaker open.
+    """
+    with collect() as usage:
+        info = {"provider": None, "model": None, "attempts": 0, "hedged": 0, "fallback": False, "errors": [],
+                "failures": [], "seconds": 0.0, "usage": usage}
+        return _call_chain(payload, providers, policy, info, calls)
+
+
+def _call_chain(payload: dict, providers: List[Provider], policy: CallPolicy, info: dict,
+                calls: Dict[str, Callable]) -> Tuple[dict, dict]:
+    t0 = time.monotonic()
+    for rank, prov in enumerate(providers):
+        br = breaker(prov.name, policy)
+        for attempt in range(policy.attempts):
+            if not br.allow():
+                info["errors"].append(f"{prov.name}: circuit open")
+                info.setdefault("failures", []).append("circuit")
+                break
+            gate = RATE_GATES.get(prov.name)
+            if gate is not None:
+                gate()
+            info["attempts"] += 1
+            try:
+                out = _attempt(prov, payload, policy, info, calls)
+            except Exception as e:
+                info["errors"].append(f"{prov.name}: {type(e).__name__}: {e}")
+                info.setdefault("failures", []).append(
+                    "size" if is_size_error(e) else "retryable" if is_retryable(e) else "final")
+                if not is_retryable(e):
+                    br.record(True)  # provider answered; the request itself is bad
+                    break
+                # 429 is back-pressure from a healthy provider: back off, but do not trip the breaker
+                br.record(is_rate_limited(e))
+                if is_rate_limited(e) and rank + 1 < len(providers):
+                    break  # rate-limited: another provider answers sooner than waiting out Retry-After
+                if attempt + 1 < policy.attempts:
+                    time.sleep(backoff_delay(attempt, policy, e))
+                continue
+            br.record(True)
+            info.update(provider=prov.name, model=prov.model, fallback=rank > 0, seconds=time.monotonic() - t0)
+            return out, info
+    info["seconds"] = time.monotonic() - t0
+    raise LLMCallError("; ".join(info["errors"]) or "no provider configured", info)
+
+
+def breaker_states() -> Dict[str, str]:
+    with _LOCK:
+        return {k: b.state for k, b in _BREAKERS.items()}
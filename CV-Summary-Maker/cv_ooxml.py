@@ -0,0 +1,160 @@
+"""
+Direct OOXML renderer for the fixed CV layout.
+
+Builds the word/document.xml body as a string straight from cv_layout() and splices it
+into the template package, instead of creating python-docx proxy objects run by run.
+The template is prepared once (body cleared like _clear_body, other parts pre-zipped),
+so each render is string assembly plus one deflate of document.xml.
+Output matches render_docx_from_template paragraph for paragraph.
+"""
+import hashlib, io, os, re, zipfile
+from typing import List
+from xml.sax.saxutils import escape
+
+from cv_pipeline import cv_layout, COLON_TAB_INCH, TOP_FONT, BODY_FONT
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+DOC_PART = "word/document.xml"
+
+# Characters lxml refuses in text nodes; dropped instead of failing the whole render.
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_RUN_SPLIT_RE = re.compile(r"(\t|\r|\n)")
+
+
+def _rpr(font: str, half_pts: int, bold: bool = False, italic: bool = False) -> str:
+    return (f'<w:rPr><w:rFonts w:ascii="{font}" w:hAnsi="{font}"/>'
+            + ("<w:b/>" if bold else "") + ("<w:i/>" if italic else "")
+            + f'<w:sz w:val="{half_pts}"/></w:rPr>')
+
+
+RPR_HEADING = _rpr(TOP_FONT, 32, bold=True, italic=True)
+RPR_IDENTITY = _rpr(TOP_FONT, 20, bold=True)
+RPR_BOLD = _rpr(BODY_FONT, 20, bold=True)
+RPR_TEXT = _rpr(BODY_FONT, 20)
+
+P_BLANK = "<w:p/>"
+P_RULE = ('<w:p><w:pPr><w:pBdr><w:bottom w:val="single" w:sz="8" w:space="1" w:color="000000"/>'
+          '</w:pBdr></w:pPr></w:p>')
+PPR_IDENTITY = ('<w:pPr><w:tabs><w:tab w:val="left" w:pos="%d" w:leader="underscore"/></w:tabs>'
+                '<w:spacing w:before="0" w:after="0" w:line="240" w:lineRule="auto"/>'
+                '<w:ind w:left="0" w:firstLine="0"/></w:pPr>' % int(COLON_TAB_INCH * 1440))
+PPR_CENTER = '<w:pPr><w:jc w:val="center"/></w:pPr>'
+PPR_BULLET_FALLBACK = '<w:pPr><w:ind w:left="360"/></w:pPr>'
+
+
+def _run(text, rpr: str) -> str:
+    """One w:r with python-docx text semantics: \\t -> w:tab, \\n/\\r -> w:br."""
+    text = _XML_INVALID_RE.sub("", str(text))
+    out = ["<w:r>", rpr]
+    for piece in _RUN_SPLIT_RE.split(text):
+        if not piece:
+            continue
+        if piece == "\t":
+            out.append("<w:tab/>")
+        elif piece in ("\r", "\n"):
+            out.append("<w:br/>")
+        elif len(piece.strip()) < len(piece):
+            out.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+        else:
+            out.append(f"<w:t>{escape(piece)}</w:t>")
+    out.append("</w:r>")
+    return "".join(out)
+
+
+class OoxmlTemplate:
+    """Template package split into document prefix/suffix plus a pre-built zip of all other parts."""
+
+    def __init__(self, data: bytes):
+        from lxml import etree  # python-docx dependency; only needed once per template
+        with zipfile.ZipFile(io.BytesIO(data)) as zin:
+            root = etree.fromstring(zin.read(DOC_PART))
+            styles = zin.read("word/styles.xml") if "word/styles.xml" in zin.namelist() else b""
+            base = io.BytesIO()
+            with zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename != DOC_PART:
+                        zout.writestr(info.filename, zin.read(info.filename))
+        self.base_zip = base.getvalue()
+
+        if root.nsmap.get("w") != W_NS:
+            raise ValueError("template document.xml does not use the 'w' prefix for WordprocessingML")
+        body = root.find(f"{{{W_NS}}}body")
+        for child in list(body):
+            if child.tag in (f"{{{W_NS}}}p", f"{{{W_NS}}}tbl"):  # same as _clear_body
+                body.remove(child)
+        xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True).decode("utf-8")
+        cut = xml.rfind("<w:sectPr")
+        if cut < 0 or cut < xml.rfind("<w:body"):
+            cut = xml.rfind("</w:body>")
+        self.prefix, self.suffix = xml[:cut], xml[cut:]
+        self.bullet_style_id = self._style_id(styles, "List Bullet")
+
+    @staticmethod
+    def _style_id(styles_xml: bytes, name: str):
+        if not styles_xml:
+            return None
+        from lxml import etree
+        for st in etree.fromstring(styles_xml).iter(f"{{{W_NS}}}style"):
+            nm = st.find(f"{{{W_NS}}}name")
+            if st.get(f"{{{W_NS}}}type") == "paragraph" and nm is not None and nm.get(f"{{{W_NS}}}val") == name:
+                return st.get(f"{{{W_NS}}}styleId")
+        return None
+
+    def body_xml(self, identity: dict, work: List[dict], edu: List, skills: List[str], courses: List[str]) -> str:
+        parts = []
+        add = parts.append
+        for kind, val in cv_layout(identity, work, edu, skills, courses):
+            if kind == "blank":
+                add(P_BLANK)
+            elif kind == "heading":
+                add("<w:p>" + PPR_CENTER + _run(val, RPR_HEADING) + "</w:p>")
+            elif kind == "identity":
+                label, value = val
+                add("<w:p>" + PPR_IDENTITY + _run(label + " ", RPR_IDENTITY) + _run("\t", RPR_IDENTITY)
+                    + _run(": ", RPR_IDENTITY) + _run(value, RPR_IDENTITY) + "</w:p>")
+            elif kind == "rule":
+                add(P_RULE)
+            elif kind == "bold":
+                add("<w:p>" + _run(val, RPR_BOLD) + "</w:p>")
+            elif kind == "text":
+                add("<w:p>" + _run(val, RPR_TEXT) + "</w:p>")
+            elif kind == "bullet":
+                if self.bullet_style_id:
+                    add(f'<w:p><w:pPr><w:pStyle w:val="{self.bullet_style_id}"/></w:pPr>' + _run(val, RPR_TEXT) + "</w:p>")
+                else:
+                    # _add_bullet's python-docx path inserts the paragraph before the missing
+                    # 'List Bullet' style raises, leaving an empty paragraph; keep layouts identical.
+                    add(P_BLANK + "<w:p>" + PPR_BULLET_FALLBACK + _run("• " + str(val), RPR_TEXT) + "</w:p>")
+        return "".join(parts)
+
+    def render(self, identity: dict, work: List[dict], edu: List, skills: List[str], courses: List[str]) -> bytes:
+        xml = self.prefix + self.body_xml(identity, work, edu, skills, courses) + self.suffix
+        buf = io.BytesIO(self.base_zip)
+        buf.seek(0, io.SEEK_END)
+        with zipfile.ZipFile(buf, "a", zipfile.ZIP_DEFLATED) as z:
+            z.writestr(DOC_PART, xml.encode("utf-8"))
+        return buf.getvalue()
+
+
+_TEMPLATES = {}
+
+
+def load_template(template) -> OoxmlTemplate:
+    """Cached OoxmlTemplate for a path (keyed by mtime/size), bytes or a binary stream."""
+    if isinstance(template, (str, os.PathLike)):
+        stt = os.stat(template)
+        key = (os.fspath(template), stt.st_mtime_ns, stt.st_size)
+        if key not in _TEMPLATES:
+            with open(template, "rb") as fh:
+                _TEMPLATES[key] = OoxmlTemplate(fh.read())
+        return _TEMPLATES[key]
+    data = template.read() if hasattr(template, "read") else bytes(template)
+    key = hashlib.sha1(data).hexdigest()
+    if key not in _TEMPLATES:
+        _TEMPLATES[key] = OoxmlTemplate(data)
+    return _TEMPLATES[key]
+
+
+def render_docx_ooxml(template, identity: dict, profile: str, work: List[dict], edu: List, skills: List[str], courses: List[str], full_text: str) -> bytes:
+    """Drop-in replacement for render_docx_from_template (same signature and layout)."""
+    return load_template(template).render(identity, work, edu, skills, courses)
@@ -0,0 +1,138 @@
+"""
+Several short CVs per LLM request.
+
+A one-page CV spends most of its request on overhead: round trip, queueing and the prompt,
+which is resent with every file. Packer groups short canonical texts in batch order up to a
+token budget; call_pack() sends a group as one request through cv_llm_client (retries,
+hedging, fallback, breakers and rate gates apply as to any call) and returns one result per CV:
+
+    packer = Packer(PackConfig())
+    for item in items:                                   # PackItem(key, payload, raw, ctx)
+        group = packer.add(item) if packable(item, cfg, route_cfg) else [item]
+        for res in call_pack(group, primary, fallback, route_cfg, policy, stats): ...
+    for res in call_pack(packer.flush(), ...): ...
+
+A pack request that fails on timeouts, server errors, rate limits or its size is split in half
+and each half sent again; after a final error (auth, bad request) or an open breaker every CV
+gets that error, since smaller requests would fail the same way. A CV missing
+from the packed answer, or whose result fails schema_problems(), goes through call_routed()
+alone, where the usual re-ask and strong-model escalation apply. A pack's token usage is
+shared across its CVs by text length (cv_usage.split_usage), so file and batch totals add up.
+"""
+from typing import Any, List, NamedTuple, Optional
+
+from cv_llm import _packed_prompt, schema_problems
+from cv_llm_client import PACKED_PROVIDERS, CallPolicy, LLMCallError, Provider, call_llm_json
+from cv_router import RoutingConfig, TierStats, _chain, _cost, call_routed, cv_features, route
+from cv_usage import split_usage
+
+CHARS_PER_TOKEN = 4   # same estimate as cv_router.approx_cost
+
+
+class PackConfig(NamedTuple):
+    max_item_tokens: int = 1500    # longer CVs are sent alone
+    max_pack_tokens: int = 6000    # resume text per packed request
+    max_items: int = 6             # bounds the answer too: ~1k output tokens per CV
+
+
+class PackItem(NamedTuple):
+    key: str
+    payload: dict        # build_payload() output
+    raw: str             # pre-canonicalisation text, for routing features
+    ctx: Any = None      # caller's state, handed back with the result
+
+
+class PackResult(NamedTuple):
+    item: PackItem
+    resp: Optional[dict]
+    info: Optional[dict]                  # call_routed-style info, plus pack (group size) and unpacked (reasons)
+    error: Optional[LLMCallError] = None
+
+
+def est_tokens(item: PackItem) -> int:
+    return len(item.payload.get("resume_text") or "") // CHARS_PER_TOKEN + 1
+
+
+def packable(item: PackItem, cfg: PackConfig, route_cfg: Optional[RoutingConfig] = None) -> bool:
+    """Short enough, and (when routing) a CV the router would give the fast model anyway."""
+    if est_tokens(item) > cfg.max_item_tokens:
+        return False
+    return route_cfg is None or route(cv_features(item.raw, item.payload.get("resume_text") or ""), route_cfg)[0] == "fast"
+
+
+class Packer:
+    """Collects packable items; add() hands back the previous group once the new item would overflow it."""
+
+    def __init__(self, cfg: PackConfig = PackConfig()):
+        self.cfg = cfg
+        self._group: List[PackItem] = []
+        self._tokens = 0
+
+    def add(self, item: PackItem) -> List[PackItem]:
+        t = est_tokens(item)
+        out = []
+        if self._group and (self._tokens + t > self.cfg.max_pack_tokens or len(self._group) >= self.cfg.max_items):
+            out = self.flush()
+        self._group.append(item)
+        self._tokens += t
+        return out
+
+    def flush(self) -> List[PackItem]:
+        out, self._group, self._tokens = self._group, [], 0
+        return out
+
+
+def _single(item: PackItem, primary: Provider, fallback: Optional[Provider], route_cfg: Optional[RoutingConfig],
+            policy: CallPolicy, stats: Optional[TierStats]) -> PackResult:
+    try:
+        resp, info = call_routed(item.payload, item.raw, primary, fallback, route_cfg, policy, stats)
+    except LLMCallError as e:
+        return PackResult(item, None, None, e)
+    return PackResult(item, resp, info)
+
+
+def _worth_splitting(e: LLMCallError) -> bool:
+    """Whether halves of the pack could succeed: some failure was retryable or about size."""
+    return any(k in ("retryable", "size") for k in e.info.get("failures") or [])
+
+
+def _charge(res: PackResult, calls: list, note: Optional[str] = None) -> PackResult:
+    """Add a share of an earlier shared request (and why the CV left it) to a result's info."""
+    info = res.error.info if res.error is not None else res.info
+    info["usage"] = list(calls) + list(info.get("usage") or [])
+    if note:
+        info.setdefault("unpacked", []).append(note)
+    return res
+
+
+def call_pack(group: List[PackItem], primary: Provider, fallback: Optional[Provider], route_cfg: Optional[RoutingConfig],
+              policy: CallPolicy = CallPolicy(), stats: Optional[TierStats] = None) -> List[PackResult]:
+    """One PackResult per item, in group order. Groups of one go straight to call_routed()."""
+    if len(group) <= 1:
+        return [_single(it, primary, fallback, route_cfg, policy, stats) for it in group]
+    model = route_cfg.fast_model if route_cfg is not None else primary.model
+    payload = {"cvs": [{"id": str(i), **it.payload} for i, it in enumerate(group)]}
+    weights = [est_tokens(it) for it in group]
+    try:
+        results, info = call_llm_json(payload, _chain(model, primary, fallback, None), policy, PACKED_PROVIDERS)
+    except LLMCallError as e:
+        shares = split_usage(e.info.get("usage") or [], weights)
+        if not _worth_splitting(e):
+            return [PackResult(it, None, None, LLMCallError(str(e), dict(e.info, usage=s, pack=len(group))))
+                    for it, s in zip(group, shares)]
+        mid = len(group) // 2
+        out = (call_pack(group[:mid], primary, fallback, route_cfg, policy, stats)
+               + call_pack(group[mid:], primary, fallback, route_cfg, policy, stats))
+        return [_charge(r, s, f"pack of {len(group)} failed") for r, s in zip(out, shares)]
+    if stats is not None:
+        stats.record("packed", info["seconds"], _cost(info, sum(weights) * CHARS_PER_TOKEN + len(_packed_prompt()), results))
+    out = []
+    for i, (it, share) in enumerate(zip(group, split_usage(info["usage"], weights))):
+        resp = results.get(str(i))
+        problems = ["missing from the packed answer"] if resp is None else schema_problems(resp)
+        if problems:
+            out.append(_charge(_single(it, primary, fallback, route_cfg, policy, stats), share, "; ".join(problems)))
+            continue
+        out.append(PackResult(it, resp, dict(info, usage=share, tier="packed", route_reasons=[], escalated=[],
+                                             pack=len(group), unpacked=[])))
+    return out
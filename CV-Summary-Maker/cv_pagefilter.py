@@ -0,0 +1,230 @@
+"""
+Pre-LLM page and section filter.
+
+Uploads often carry scanned certificates, reference letters, consent declarations and photo
+pages after the CV itself. filter_cv_text() splits extracted text into pages (form feeds, as
+both PDF extractors emit them) and then into heading-led sections, and:
+  - drops header/footer lines repeated across pages (the first occurrence stays),
+  - drops empty pages (scans and photos with no text layer: not a single word),
+  - reduces certificate and reference-letter pages to a one-line note (course titles survive),
+  - drops boilerplate sections (declarations, data-processing consent, hobbies, "references
+    on request") up to the next heading, dated line or personal-field line ("Date of birth: …");
+    a section holding a date range is kept.
+A dropped or reduced unit is put back when it held a fact that appears nowhere in the kept
+text: a method, OEM or diameter, a language, the nationality or the year of birth.
+"""
+import re
+from typing import Dict, List, Set, Tuple
+
+from cv_pipeline import LANG_HINTS, _diameters_m, _oems, method_families, scan_methods
+
+EDGE_LINES = 3           # lines at the top/bottom of a page checked for running headers/footers
+NOTE_CHARS = 160
+
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"[^\W\d_]{2,}")   # a page without one is a scan/photo without a text layer
+_DATE_RANGE_RE = re.compile(r"(?:19|20)\d\d(?:[-/.]\d{1,2})?\s*(?:-|–|—|to|until)\s*(?:(?:\w{3,9}\s+)?(?:19|20)\d\d|present|current|now|date)", re.I)
+_CV_HEAD_RE = re.compile(
+    r"^\W*(?:(?:work|professional|employment|relevant)\s+(?:experience|history)|experience|career(?:\s+history)?|"
+    r"projects?|education(?:al background)?|qualifications?|skills|technical skills|languages?|"
+    r"personal (?:details|information|data)|profile|summary|courses|training|certifications?)\W*$", re.I)
+_CERT_RE = re.compile(
+    r"\b(?:certificate|certification|this is to certify|certif(?:y|ies) that|has (?:successfully )?(?:completed|attended|passed)|"
+    r"awarded to|is hereby|valid (?:until|to|thru|through)|date of (?:issue|expiry)|expiry date|certificate (?:no|number)|attestato)\b", re.I)
+_LETTER_RE = re.compile(
+    r"\b(?:to whom it may concern|reference letter|letter of (?:reference|recommendation)|recommend (?:him|her|them)|"
+    r"yours (?:sincerely|faithfully)|dear (?:sir|madam|sirs)|(?:kind|best) regards|was employed by|worked for us)\b", re.I)
+_BOILER_START_RE = re.compile(
+    r"^\W*(?:declaration|privacy|consent|hobbies(?: and interests)?|interests|references)\W*$|"
+    r"\bI (?:hereby )?(?:declare|authori[sz]e|consent)\b|processing of (?:my )?personal data|\bGDPR\b|2016/679|"
+    r"D\.?\s?Lgs\.?\s?(?:n\.?\s?)?196|references (?:are )?available (?:up)?on request", re.I)
+# "Label: value" lines of the personal details / CV header; they end a boilerplate run
+_FIELD_LINE_RE = re.compile(
+    r"^\W*(?:(?:date|year|place) of birth|d\.?o\.?b\.?|birth\s?date|born|age|nationality|citizenship|"
+    r"languages?(?: spoken)?|marital status|gender|sex|name|full name|address|phone|mobile|tel(?:ephone)?|e-?mail|"
+    r"passport(?: no\.?)?|visa(?: status)?|driving licen[cs]e|position|current (?:position|employer)|"
+    r"years of experience|total experience|education|qualifications?)\s*[:–-]\s*\S", re.I)
+_LANG_RE = re.compile(r"\b(?:" + "|".join(LANG_HINTS) + r")\b", re.I)
+_NATIONALITY_RE = re.compile(r"\b(?:nationality|citizenship)\s*[:–-]\s*([^\n]{1,40})", re.I)
+_BIRTH_YEAR_RE = re.compile(r"\b(?:(?:date|year) of birth|d\.?o\.?b\.?|birth\s?date|born)\b[^\n\d]{0,20}"
+                            r"(?:\d{1,2}[-/. ]\w{1,9}[-/. ])?((?:19|20)\d\d)\b", re.I)
+_HEADING_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'’-]*")
+_HEADING_SMALL = {"and", "of", "the", "in", "&", "for"}
+_NOTE_LINE_RE = re.compile(r"\b(?:certificate|certification|course|training|diploma|licen[cs]e|award|qualification)\b", re.I)
+
+
+def _facts(text: str) -> Set[str]:
+    """Facts no filtering may lose: methods, OEMs, diameters, languages, nationality, year of birth."""
+    out = {f"method:{label}" for label in method_families(scan_methods(text))}
+    out.update(f"oem:{o}" for o in _oems(text))
+    out.update(f"dia:{d:g}" for d in _diameters_m(text))
+    out.update(f"lang:{m.group(0).lower()}" for m in _LANG_RE.finditer(text))
+    out.update(f"nat:{w.lower()}" for m in _NATIONALITY_RE.finditer(text) for w in _WORD_RE.findall(m.group(1)))
+    out.update(f"yob:{m.group(1)}" for m in _BIRTH_YEAR_RE.finditer(text))
+    return out
+
+
+def _edge_key(line: str) -> str:
+    return _DIGITS_RE.sub("#", " ".join(line.lower().split()))
+
+
+def _repeated_edges(pages: List[List[str]]) -> Set[str]:
+    """Normalised lines found at the top or bottom of at least half the pages (min. 2)."""
+    if len(pages) < 2:
+        return set()
+    seen: Dict[str, int] = {}
+    for lines in pages:
+        body = [ln for ln in lines if ln.strip()]
+        for key in {_edge_key(ln) for ln in body[:EDGE_LINES] + body[-EDGE_LINES:]}:
+            if key and len(key) <= 120:
+                seen[key] = seen.get(key, 0) + 1
+    need = max(2, (len(pages) + 1) // 2)
+    return {k for k, n in seen.items() if n >= need}
+
+
+def classify_page(text: str, first: bool) -> str:
+    """'cv' | 'certificate' | 'reference' | 'empty'."""
+    if not _WORD_RE.search(text):
+        return "empty"
+    if first:
+        return "cv"
+    lines = text.splitlines()
+    cv = len(_DATE_RANGE_RE.findall(text)) + sum(1 for ln in lines if _CV_HEAD_RE.match(ln))
+    cert, letter = len(_CERT_RE.findall(text)), len(_LETTER_RE.findall(text))
+    if cert >= 2 and cert > cv:
+        return "certificate"
+    if letter >= 2 and letter > cv:
+        return "reference"
+    return "cv"
+
+
+def _note(kind: str, text: str) -> str:
+    """One line standing in for a certificate/reference page: its title-like lines."""
+    lines = [" ".join(ln.split()) for ln in text.splitlines() if ln.strip()]
+    picked = [ln for ln in lines if _NOTE_LINE_RE.search(ln)][:3] or lines[:1]
+    return f"[{kind}: {'; '.join(picked)[:NOTE_CHARS]}]"
+
+
+def _heading_like(line: str) -> bool:
+    """
+    A short line that reads as a section title, recognised or not ("Employment Record",
+    "KEY PROJECTS", "Site Experience:"): capitals only, two or more title-case words, or a
+    trailing colon. Single title-case words ("Football") are not, as hobby lists are made of them.
+    """
+    s = line.strip().strip("•-–—*#").strip()
+    if not s or len(s) > 48 or not re.fullmatch(r"[A-Za-z'’&/ -]+:?", s):
+        return False
+    words = _HEADING_WORD_RE.findall(s)
+    if not words or len(words) > 6:
+        return False
+    if s.endswith(":") or (s.isupper() and sum(map(len, words)) >= 4):
+        return True
+    return len(words) >= 2 and all(w[0].isupper() or w.lower() in _HEADING_SMALL for w in words)
+
+
+def _split_boilerplate(lines: List[str]) -> List[Tuple[bool, str]]:
+    """
+    (is_boilerplate, text) runs: a boilerplate run lasts until the next heading (known or
+    heading-like), line with a date range or personal-field line ("Languages: English"), so a
+    section or field after it is never swallowed.
+    """
+    runs: List[Tuple[bool, List[str]]] = []
+    skipping = False
+    for ln in lines:
+        if skipping and not _BOILER_START_RE.search(ln) and (
+                _CV_HEAD_RE.match(ln) or _heading_like(ln) or _DATE_RANGE_RE.search(ln) or _FIELD_LINE_RE.match(ln)):
+            skipping = False
+        elif not skipping and _BOILER_START_RE.search(ln):
+            skipping = True
+        if runs and runs[-1][0] == skipping:
+            runs[-1][1].append(ln)
+        else:
+            runs.append((skipping, [ln]))
+    return [(b, "\n".join(ls)) for b, ls in runs]
+
+
+def filter_cv_text(raw: str) -> Tuple[str, dict]:
+    """
+    Filtered text plus stats: chars_in, chars_out, pages, kinds (per page),
+    removed (chars per reason) and restored (units put back for their facts).
+    """
+    raw = raw or ""
+    pages = [p.splitlines() for p in raw.split("\f")]
+    edges = _repeated_edges(pages)
+    removed: Dict[str, int] = {}
+    units: List[list] = []  # [reason or None, original text, replacement]
+    first_seen: Set[str] = set()
+    kinds = []
+    for pno, lines in enumerate(pages):
+        if edges:
+            kept = []
+            for ln in lines:
+                key = _edge_key(ln)
+                if key in edges:
+                    if key in first_seen:
+                        removed["headers/footers"] = removed.get("headers/footers", 0) + len(ln) + 1
+                        continue
+                    first_seen.add(key)
+                kept.append(ln)
+            lines = kept
+        text = "\n".join(lines)
+        kind = classify_page(text, pno == 0)
+        kinds.append(kind)
+        if kind == "empty":
+            units.append(["empty page", text, ""])
+        elif kind != "cv":
+            units.append([kind, text, _note(kind.capitalize(), text)])
+        else:
+            for boiler, chunk in _split_boilerplate(lines):
+                # a dated line is work history, whatever section it sits in
+                units.append(["boilerplate" if boiler and not _DATE_RANGE_RE.search(chunk) else None, chunk, ""])
+        units.append([None, "\f", "\f"])
+
+    restored = 0
+    out = "\n".join(u[1] if u[0] is None else u[2] for u in units[:-1])
+    lost = _facts(raw) - _facts(out)
+    for u in units:
+        if u[0] is not None and lost and _facts(u[1]) & lost:
+            lost -= _facts(u[1])
+            u[0], restored = None, restored + 1
+    if restored:
+        out = "\n".join(u[1] if u[0] is None else u[2] for u in units[:-1])
+    for reason, text, repl in units:
+        if reason is not None:
+            removed[reason] = removed.get(reason, 0) + max(0, len(text) - len(repl))
+    return out, {"chars_in": len(raw), "chars_out": len(out), "pages": len(pages), "kinds": kinds,
+                 "removed": {k: v for k, v in removed.items() if v}, "restored": restored}
+
+
+def describe_filter(stats: dict) -> str:
+    """Caption for filter_cv_text stats; empty when nothing was removed."""
+    if not stats["removed"]:
+        return ""
+    cin, cout = stats["chars_in"], stats["chars_out"]
+    parts = ", ".join(f"{k} {v:,}" for k, v in sorted(stats["removed"].items(), key=lambda kv: -kv[1]))
+    return (f"Filtered {cin:,} → {cout:,} chars (−{1 - cout / cin:.0%}): {parts}"
+            + (f" · {stats['restored']} section(s) kept for their facts" if stats["restored"] else ""))
+
+
+if __name__ == "__main__":
+    import argparse, json, os
+    from cv_pipeline import extract_text_any
+
+    class _Upload:
+        def __init__(self, path: str):
+            self.name = os.path.basename(path)
+            with open(path, "rb") as fh:
+                self._data = fh.read()
+
+        def getvalue(self) -> bytes:
+            return self._data
+
+    ap = argparse.ArgumentParser(description="Show what the pre-LLM filter removes from CV files.")
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("--show", action="store_true", help="print the filtered text")
+    a = ap.parse_args()
+    for p in a.paths:
+        txt, st = filter_cv_text(extract_text_any(_Upload(p)))
+        print(f"{os.path.basename(p)}: {json.dumps(st)}")
+        if a.show:
+            print(txt)
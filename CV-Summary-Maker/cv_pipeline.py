@@ -0,0 +1,1550 @@
+"""CV Summary Maker pipeline: extraction, canonicalisation, fact extraction, DOCX rendering.
+
+No UI code here so it can be imported by worker processes and command-line tools.
+"""
+import re
+# ====== THIRD-PERSON SUMMARY (HR style, tunnelling-specific; evidence-only) ======
+def _years_only(total_months: int, work: list) -> int:
+    """Return years as an integer (floor). Fallback by deriving from work durations."""
+    try:
+        m = int(total_months or 0)
+    except Exception:
+        m = 0
+    if m <= 0 and work:
+        # derive from the union of work intervals (overlapping roles counted once)
+        m = experience_months(work)["total"]
+    return max(0, m // 12)
+
+_SECTOR_PATTERNS = [
+    (re.compile(r'\b(metro|subway|rail|underground|lrt|mrt|stations?)\b', re.I), "metro/rail"),
+    (re.compile(r'\b(road|highway|expressway|tunnel\b(?! boring))\b', re.I), "road"),
+    (re.compile(r'\b(sewer|sewage|wastewater|storm|drain|water(?!\s*stop)|pipeline|culvert)\b', re.I), "water/sewer"),
+    (re.compile(r'\b(power|cable|utility|utilities|electrical)\b', re.I), "utilities/power"),
+    (re.compile(r'\b(airport|runway|airfield)\b', re.I), "airport"),
+]
+
+def _infer_sectors(text: str) -> list:
+    seen = []
+    for rx, label in _SECTOR_PATTERNS:
+        if rx.search(text or ""):
+            seen.append(label)
+    # de-dupe preserving order
+    out, seen_set = [], set()
+    for s in seen:
+        if s not in seen_set:
+            out.append(s); seen_set.add(s)
+    return out
+
+def _collect_methods_oems_diams_countries(raw_text: str, work: list) -> tuple:
+    """
+    Collect methods, OEMs, diameters and countries from text/work.
+    Falls back to regex-based extraction if the global helpers (_methods/_oems/_diameters_m/_countries)
+    are not available in this file.
+    """
+    blob = raw_text or ""
+    for w in work or []:
+        parts = [w.get("role",""), w.get("project",""), w.get("city_country","")]
+        parts += [b for b in (w.get("bullets") or []) if b]
+        blob += " " + " ".join(map(str, parts))
+
+    # METHODS
+    try:
+        methods = [m.upper() for m in _methods(blob)]
+    except Exception:
+        # Fallback: use METHOD_HINTS if present
+        methods = []
+        try:
+            for m in METHOD_HINTS:
+                rx = r"" + m.replace(" ", "[- ]?") + r""
+                if re.search(rx, blob, re.I):
+                    methods.append(m.upper())
+        except Exception:
+            methods = []
+
+    # OEMS
+    try:
+        oems = _oems(blob)
+    except Exception:
+        oems = []
+        try:
+            for o in OEM_HINTS:
+                if re.search(r""+re.escape(o)+r"", blob, re.I):
+                    oems.append(o)
+        except Exception:
+            oems = []
+
+    # DIAMETERS
+    try:
+        diams = _diameters_m(blob)
+    except Exception:
+        diams = []
+
+    # COUNTRIES
+    try:
+        countries = _countries(blob)
+    except Exception:
+        countries = []
+        try:
+            for c in COUNTRY_HINTS:
+                if re.search(r""+c+r"", blob, re.I):
+                    countries.append(c.replace("\\",""))
+            # de-dupe preserve order
+            seen=set(); countries=[x for x in countries if not (x in seen or seen.add(x))]
+        except Exception:
+            countries = []
+
+    return methods, oems, diams, countries
+
+def build_summary_third_person(ident: dict, work: list, raw_text: str, fallback_position: str) -> str:
+    """
+    Compose a 3–4 sentence paragraph in third person, HR tone.
+    Uses only evidenced facts (methods, max diameter, OEMs, sectors, countries).
+    Role is taken from fallback_position (UI), with a fallback to identity.position.
+    """
+    role = (fallback_position or ident.get("position") or "Tunnelling Professional").strip()
+    years = _years_only(ident.get("total_experience_months"), work)
+    methods, oems, diams, countries = _collect_methods_oems_diams_countries(raw_text, work)
+    sectors = _infer_sectors(raw_text + " " + " ".join([str(b) for it in (work or []) for b in (it.get('bullets') or [])]))
+
+    # sentence 1
+    s1 = f"Highly experienced {role} with over {years} years in mechanized tunnelling." if years > 0 else f"Highly experienced {role} in mechanized tunnelling."
+
+    # sentence 2 (methods + diameter + OEMs), only if any present
+    clauses = []
+    if methods:
+        clauses.append(", ".join(sorted(set(methods), key=lambda x: methods.index(x))[:3]))
+    if diams:
+        mx = diams[0]
+        try:
+            if mx >= 1.0:
+                clauses.append(f"up to {mx:.0f} m")
+            else:
+                clauses.append(f"up to {mx:.2f} m")
+        except Exception:
+            pass
+    s2 = ""
+    if clauses:
+        s2 = "Demonstrated capability across " + clauses[0]
+        if len(clauses) >= 2:
+            s2 += f", {', '.join(clauses[1:])}"
+        s2 += "."
+    if oems:
+        s2 = (s2 + " " if s2 else "") + "Experience with OEMs such as " + ", ".join(oems[:3]) + "."
+
+    # sentence 3 (sectors + countries)
+    s3 = ""
+    if sectors and countries:
+        s3 = f"Track record across {', '.join(sectors[:3])} projects in {', '.join(countries[:5])}."
+    elif countries:
+        s3 = f"International project exposure in {', '.join(countries[:5])}."
+    elif sectors:
+        s3 = f"Project background spans {', '.join(sectors[:3])}."
+
+    # Merge sentences (3–4 sentences; we have up to 3 deterministic ones)
+    parts = [s for s in [s1, s2, s3] if s]
+    paragraph = " ".join(parts).strip()
+
+    # guard: force third person (no first-person pronouns)
+    if re.search(r'\b(I|my|me|mine)\b', paragraph, re.I):
+        paragraph = re.sub(r'\b(I|my|me|mine)\b', 'the candidate', paragraph, flags=re.I)
+
+    return paragraph
+# ====== /THIRD-PERSON SUMMARY ======
+
+import os, io, re, bisect, contextlib, hashlib, itertools, unicodedata, datetime, time
+from typing import Dict, List, Optional, Tuple
+
+from cv_quantities import combine_facts, diameters_m, fmt_length, quantity_facts, scan_quantities
+
+try:
+    import streamlit as st  # optional here: extraction caches only; workers/CLIs run without it
+    _cache_data = st.cache_data(show_spinner=False)
+except Exception:
+    def _cache_data(fn):
+        return fn
+
+# ---------------- Ingestion deps ----------------
+try:
+    import fitz  # PyMuPDF for PDF
+    HAVE_PYMUPDF = True
+except Exception:
+    HAVE_PYMUPDF = False
+
+try:
+    from pdfminer_high_level import extract_text as pdfminer_extract_text  # fallback alias if user has different import
+    HAVE_PDFMINER = True
+except Exception:
+    try:
+        from pdfminer.high_level import extract_text as pdfminer_extract_text
+        HAVE_PDFMINER = True
+    except Exception:
+        HAVE_PDFMINER = False
+
+try:
+    from docx import Document as DocxReader  # python-docx for reading .docx text
+    HAVE_DOXC_READ = True
+except Exception:
+    HAVE_DOXC_READ = False
+
+# ---------------- Word export deps ----------------
+from docx import Document
+from docx.shared import Pt, Inches
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+# ---------------- Fonts & layout ----------------
+COLON_TAB_INCH = 1.60  # tab stop for colon alignment
+TOP_FONT = 'Cambria'    # For heading + top identity block
+BODY_FONT = 'Verdana'   # For everything else
+
+HERE = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+DEFAULT_TEMPLATE_PATH = os.path.join(HERE, "template", "CURRICULUM VITAE.docx")
+if not os.path.exists(DEFAULT_TEMPLATE_PATH):
+    alt = os.path.join(HERE, "CURRICULUM VITAE.docx")
+    if os.path.exists(alt):
+        DEFAULT_TEMPLATE_PATH = alt
+
+# ---------------- Regexes & hints ----------------
+SPACE_RE = re.compile(r"\s+")
+HEADER_FOOTER_RE = re.compile(r"Page\s+\d+\s+of\s+\d+", re.I)
+# The local part is bounded at 64 characters (RFC 5321's limit): unbounded, a long "a.b.c..." run
+# without an "@" (dotted number tables, pasted hashes) is rescanned from every one of its
+# characters, quadratic in its length.
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+URL_RE = re.compile(r"https?://\S+|www\.\S+", re.I)
+PHONE_RE = re.compile(r"\+?\d[\d \-\(\)]{7,}\d")
+# One alternation for all PII kinds: a single scan per string instead of three passes (in this
+# order: an email or URL wins over the digits inside it).
+PII_RE = re.compile("|".join(f"(?P<{kind}>{rx.pattern})" for kind, rx in
+                             (("email", EMAIL_RE), ("url", URL_RE), ("phone", PHONE_RE))), re.I)
+PII_TOKENS = {"email": "[REDACTED_EMAIL]", "url": "[REDACTED_URL]", "phone": "[REDACTED_PHONE]"}
+
+ISO_COUNTRIES = ["Afghanistan", "Albania", "Algeria", "Andorra", "Angola", "Antigua and Barbuda", "Argentina", "Armenia", "Australia", "Austria", "Azerbaijan", "Bahamas", "Bahrain", "Bangladesh", "Barbados", "Belarus", "Belgium", "Belize", "Benin", "Bhutan", "Bolivia", "Bosnia and Herzegovina", "Botswana", "Brazil", "Brunei", "Bulgaria", "Burkina Faso", "Burundi", "Cabo Verde", "Cambodia", "Cameroon", "Canada", "Central African Republic", "Chad", "Chile", "China", "Colombia", "Comoros", "Congo", "Costa Rica", "Côte d’Ivoire", "Croatia", "Cuba", "Cyprus", "Czechia", "Democratic Republic of the Congo", "Denmark", "Djibouti", "Dominica", "Dominican Republic", "Ecuador", "Egypt", "El Salvador", "Equatorial Guinea", "Eritrea", "Estonia", "Eswatini", "Ethiopia", "Fiji", "Finland", "France", "Gabon", "Gambia", "Georgia", "Germany", "Ghana", "Greece", "Grenada", "Guatemala", "Guinea", "Guinea-Bissau", "Guyana", "Haiti", "Honduras", "Hungary", "Iceland", "India", "Indonesia", "Iran", "Iraq", "Ireland", "Israel", "Italy", "Jamaica", "Japan", "Jordan", "Kazakhstan", "Kenya", "Kiribati", "Korea, North", "Korea, South", "Kuwait", "Kyrgyzstan", "Laos", "Latvia", "Lebanon", "Lesotho", "Liberia", "Libya", "Liechtenstein", "Lithuania", "Luxembourg", "Madagascar", "Malawi", "Malaysia", "Maldives", "Mali", "Malta", "Marshall Islands", "Mauritania", "Mauritius", "Mexico", "Micronesia", "Moldova", "Monaco", "Mongolia", "Montenegro", "Morocco", "Mozambique", "Myanmar", "Namibia", "Nauru", "Nepal", "Netherlands", "New Zealand", "Nicaragua", "Niger", "Nigeria", "North Macedonia", "Norway", "Oman", "Pakistan", "Palau", "Panama", "Papua New Guinea", "Paraguay", "Peru", "Philippines", "Poland", "Portugal", "Qatar", "Romania", "Russia", "Rwanda", "Saint Kitts and Nevis", "Saint Lucia", "Saint Vincent and the Grenadines", "Samoa", "San Marino", "Sao Tome and Principe", "Saudi Arabia", "Senegal", "Serbia", "Seychelles", "Sierra Leone", "Singapore", "Slovakia", "Slovenia", "Solomon Islands", "Somalia", "South Africa", "South Sudan", "Spain", "Sri Lanka", "Sudan", "Suriname", "Sweden", "Switzerland", "Syria", "Taiwan", "Tajikistan", "Tanzania", "Thailand", "Timor-Leste", "Togo", "Tonga", "Trinidad and Tobago", "Tunisia", "Turkey", "Turkmenistan", "Tuvalu", "Uganda", "Ukraine", "United Arab Emirates", "United Kingdom", "United States", "Uruguay", "Uzbekistan", "Vanuatu", "Vatican City", "Venezuela", "Vietnam", "Yemen", "Zambia", "Zimbabwe", "Hong Kong", "Macau", "Palestine"]
+ALIAS_TO_COUNTRY = {"UK": "United Kingdom", "Great Britain": "United Kingdom", "GB": "United Kingdom", "UAE": "United Arab Emirates", "U.A.E": "United Arab Emirates", "U.A.E.": "United Arab Emirates", "USA": "United States", "U.S.A": "United States", "U.S.A.": "United States", "US": "United States", "U.S.": "United States", "United States of America": "United States", "KSA": "Saudi Arabia", "PRC": "China", "People's Republic of China": "China", "Mainland China": "China", "South Korea": "Korea, South", "Republic of Korea": "Korea, South", "ROK": "Korea, South", "North Korea": "Korea, North", "DPRK": "Korea, North", "Czech Republic": "Czechia", "Ivory Coast": "Côte d’Ivoire", "Cote d'Ivoire": "Côte d’Ivoire", "Burma": "Myanmar", "Lao PDR": "Laos", "Viet Nam": "Vietnam", "Russian Federation": "Russia", "Swaziland": "Eswatini", "Cape Verde": "Cabo Verde", "Taipei, Taiwan": "Taiwan"}
+COUNTRY_HINTS = ISO_COUNTRIES  # keep prior inference paths working
+LANG_HINTS = ["English","Thai","Hindi","Malay","Tamil","Arabic","Italian","French","German","Spanish","Chinese","Cantonese","Mandarin","Vietnamese","Korean","Japanese"]
+OEM_HINTS = ["Herrenknecht","Robbins","Terratec","CREG","Iseki","RASA","Kawasaki","Hitachi Zosen"]
+
+MONTHS = ["JAN","FEB","MAR","APR","MAY","JUN","JUL","AUG","SEP","OCT","NOV","DEC"]
+MONTH_MAP = {m:i+1 for i,m in enumerate(MONTHS)}
+
+# ---------------- Utils ----------------
+# Uploads are read through memoryviews / streams and keyed by one SHA-1 per upload (cv_ingest items
+# carry it already); the extraction caches take the key and skip hashing the payload (st.cache_data
+# leaves underscore-prefixed arguments out of its key).
+@contextlib.contextmanager
+def upload_view(uploaded_file):
+    """Zero-copy memoryview of an upload's bytes (BytesIO/UploadedFile buffer, or the bytes object)."""
+    mv = uploaded_file.getbuffer() if hasattr(uploaded_file, "getbuffer") else memoryview(uploaded_file.getvalue())
+    try:
+        yield mv
+    finally:
+        mv.release()
+
+def upload_stream(uploaded_file):
+    """Seekable binary stream over the upload without copying it."""
+    if hasattr(uploaded_file, "seek") and hasattr(uploaded_file, "read"):
+        uploaded_file.seek(0)
+        return uploaded_file
+    return io.BytesIO(uploaded_file.getvalue())  # BytesIO shares a bytes object's buffer until written
+
+def upload_key(uploaded_file) -> str:
+    """SHA-1 of the upload's content, computed once per upload object and reused as the cache key."""
+    key = getattr(uploaded_file, "sha1", None)
+    if not key:
+        with upload_view(uploaded_file) as mv:
+            key = hashlib.sha1(mv).hexdigest()
+        try:
+            uploaded_file.sha1 = key
+        except AttributeError:
+            pass
+    return key
+
+# A CV is a few pages. Every stage after extraction (page filter, canonicalisation, PII and
+# method scans, the LLM prompt) grows with the text, so a 900-page export or a DOCX holding a
+# megabyte table is cut at extraction: MAX_TEXT_CHARS characters, MAX_PDF_PAGES pages, or
+# EXTRACT_BUDGET_S seconds of extraction, whichever comes first. What was read so far is kept
+# and extract_text_any() reports the cut in `notes`.
+MAX_TEXT_CHARS = int(os.getenv("CV_MAX_TEXT_CHARS", "200000"))
+MAX_PDF_PAGES = int(os.getenv("CV_MAX_PDF_PAGES", "60"))
+EXTRACT_BUDGET_S = float(os.getenv("CV_EXTRACT_BUDGET_S", "20"))
+
+class _TextBudget:
+    """Collects extracted parts until the character or time budget runs out; .cut says why it stopped."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.chars = 0
+        self.cut = ""
+        self._t0 = time.monotonic()
+
+    def add(self, part: str) -> bool:
+        """Keep part (trimmed to what fits); False once the budget is spent."""
+        room = MAX_TEXT_CHARS - self.chars
+        if len(part) > room:
+            self.parts.append(part[:room])
+            self.chars = MAX_TEXT_CHARS
+            self.cut = f"text cut at {MAX_TEXT_CHARS:,} characters"
+            return False
+        self.parts.append(part)
+        self.chars += len(part) + 1
+        if time.monotonic() - self._t0 > EXTRACT_BUDGET_S:
+            self.cut = f"extraction stopped after {EXTRACT_BUDGET_S:g} s"
+            return False
+        return True
+
+@_cache_data
+def _extract_text_pymupdf(key: str, _data) -> Tuple[str, str]:
+    try:
+        import fitz as _fitz
+        budget = _TextBudget()
+        with _fitz.open(stream=_data, filetype="pdf") as doc:
+            for i, p in enumerate(doc):
+                if i >= MAX_PDF_PAGES:
+                    budget.cut = f"read the first {MAX_PDF_PAGES} of {doc.page_count} pages"
+                    break
+                if not budget.add(p.get_text("text")):
+                    break
+        return "\f".join(budget.parts), budget.cut  # page breaks as form feeds, like pdfminer
+    except Exception:
+        return "", ""
+
+@_cache_data
+def _extract_text_pdfminer(key: str, _stream) -> Tuple[str, str]:
+    try:
+        budget = _TextBudget()
+        txt = pdfminer_extract_text(_stream, maxpages=MAX_PDF_PAGES) or ""  # no per-page hook for the clock
+        budget.add(txt)
+        if not budget.cut and txt.count("\f") >= MAX_PDF_PAGES:   # pdfminer ends every page with \f
+            budget.cut = f"read the first {MAX_PDF_PAGES} pages"
+        return "".join(budget.parts), budget.cut
+    except Exception:
+        return "", ""
+
+@_cache_data
+def _extract_text_docx(key: str, _stream) -> Tuple[str, str]:
+    if not HAVE_DOXC_READ: return "", ""
+    from docx import Document as _Doc
+    try:
+        d = _Doc(_stream)
+        budget = _TextBudget()
+        paras = (p.text for p in d.paragraphs)
+        rows = (" | ".join([c.text for c in row.cells]) for tbl in d.tables for row in tbl.rows)
+        for line in itertools.chain(paras, rows):
+            if not budget.add(line):
+                break
+        return "\n".join(budget.parts), budget.cut
+    except Exception:
+        return "", ""
+
+def extract_text_any(uploaded_file, notes: Optional[list] = None) -> str:
+    """Text of a PDF/DOCX upload ("" when unreadable); a size/time cut is appended to notes."""
+    name = uploaded_file.name.lower()
+    txt, cut = "", ""
+    if name.endswith(".pdf"):
+        key = upload_key(uploaded_file)
+        if HAVE_PYMUPDF:
+            with upload_view(uploaded_file) as mv:
+                txt, cut = _extract_text_pymupdf(key, mv)
+        if (not txt or len(txt.strip()) < 100) and HAVE_PDFMINER:
+            txt, cut = _extract_text_pdfminer(key, upload_stream(uploaded_file))
+    elif name.endswith(".docx"):
+        txt, cut = _extract_text_docx(upload_key(uploaded_file), upload_stream(uploaded_file))
+    if cut and notes is not None:
+        notes.append(f"Oversized file: {cut}; the rest was not read.")
+    return (txt or "").strip()
+
+# Symbol/bullet mapping table. Applied as guarded str.replace: a membership scan is near-free and
+# skips the copy when the symbol is absent (str.translate with a dict is far slower in CPython).
+CANON_SYMBOLS = [("\u2300", "Ø"), ("Φ", "Ø"), ("φ", "Ø"),
+                 ("\u2022", " • "), ("\u25CF", " • "), ("\u25A0", " • "), ("\u00B7", " • ")]
+# Hyphen wraps and "dia" markers fused into one scan. The pattern leads with a plain character
+# class so the regex engine can skip ahead between candidates; lookbehinds do the word-boundary
+# checks (a "dia" that a hyphen wrap glues onto the previous word is not a marker). Headers/footers
+# are removed first so text that abutted them still sees a boundary.
+CANON_RE = re.compile(r"[-Dd](?:(?P<hy>(?<=\w-)\n(?=\w))|(?P<dia>(?<=[Dd])(?<!\w[Dd])(?<!\w-\n[Dd])[Ii][Aa]\.?))")
+_CANON_TOKENS = {"hy": "", "dia": " Ø "}
+
+def _canon_sub(m) -> str:
+    return _CANON_TOKENS[m.lastgroup]
+
+def canonicalize_text(raw: str) -> str:
+    s = HEADER_FOOTER_RE.sub(" ", unicodedata.normalize("NFKC", raw or ""))
+    for ch, rep in CANON_SYMBOLS:
+        if ch in s:
+            s = s.replace(ch, rep)
+    s = CANON_RE.sub(_canon_sub, s)
+    if "\r" in s:
+        s = s.replace("\r", "")
+    return " ".join(s.split())  # same as SPACE_RE collapse + strip, without the regex
+
+def redact_pii(s: str, counts: Optional[dict] = None) -> str:
+    """Replace emails, URLs and phone numbers in one pass; tally hits per kind into counts."""
+    if not s:
+        return s
+    def _sub(m):
+        kind = m.lastgroup
+        if counts is not None:
+            counts[kind] = counts.get(kind, 0) + 1
+        return PII_TOKENS[kind]
+    return PII_RE.sub(_sub, s)
+
+def redact_structure(obj, counts: Optional[dict] = None):
+    """Walk dicts/lists in place, redacting string values only (keys and numbers untouched)."""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if isinstance(v, str):
+                obj[k] = redact_pii(v, counts)
+            elif isinstance(v, (dict, list)):
+                redact_structure(v, counts)
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            if isinstance(v, str):
+                obj[i] = redact_pii(v, counts)
+            elif isinstance(v, (dict, list)):
+                redact_structure(v, counts)
+    return obj
+
+def strip_pii(s: str, counts: Optional[dict] = None) -> str:
+    return redact_pii(s, counts)
+
+TBM_TERMS = ["tbm operator","tbm pilot","epb","slurry","mixshield","herrenknecht","robbins","terratec","creg","natm","drill & blast","drill and blast"]
+def role_from_text(t: str) -> str:
+    tl = t.lower()
+    if sum(tl.count(k) for k in TBM_TERMS) > 0:
+        return "TBM OPERATOR"
+    return "Tunneling Professional"
+
+
+def _fmt_period(s: Optional[str]) -> str:
+    """Normalize to 'Month YYYY'. Accept 'YYYY-MM', 'MM/YYYY', 'Mon YYYY', 'Present'."""
+    import calendar, re
+    if not s or s in ["-","null","None"]:
+        return "-"
+    s = str(s).strip()
+    if re.search(r"present|current|ongoing", s, re.I):
+        return "Present"
+    m = re.match(r"^(\d{4})[-/](\d{1,2})$", s)  # YYYY-MM
+    if m:
+        y, mo = int(m.group(1)), int(m.group(2))
+        mo = calendar.month_name[mo] if 1 <= mo <= 12 else "--"
+        return f"{mo} {y}"
+    m = re.match(r"^(\d{1,2})[-/](\d{4})$", s)  # MM/YYYY
+    if m:
+        mo, y = int(m.group(1)), int(m.group(2))
+        mo = calendar.month_name[mo] if 1 <= mo <= 12 else "--"
+        return f"{mo} {y}"
+    m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", s)  # Mon YYYY or Month YYYY
+    if m:
+        token = m.group(1)
+        try:
+            from calendar import month_name, month_abbr
+            lookup = {ab.lower():month_name[i] for i,ab in enumerate(month_abbr) if ab}
+            lookup.update({mn.lower():mn for mn in month_name if mn})
+            return f"{lookup.get(token.lower(), token.title())} {m.group(2)}"
+        except Exception:
+            return f"{token.title()} {m.group(2)}"
+    return s
+
+def _parse_to_key(s: Optional[str]) -> Tuple[int,int,int]:
+    if not s: return (0,0,0)
+    ss = str(s).strip()
+    if re.search(r"present|current|ongoing", ss, re.I): return (9999,12,1)
+    m = re.match(r"^(\d{4})[-/](\d{1,2})$", ss)
+    if m: return (int(m.group(1)), int(m.group(2)), 0)
+    m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", ss)
+    if m:
+        y=int(m.group(2)); mo=MONTH_MAP.get(m.group(1)[:3].upper(), 12)
+        return (y, mo, 0)
+    m = re.search(r"(\d{4})", ss)
+    if m: return (int(m.group(1)), 12, 0)
+    return (0,0,0)
+
+def sort_work(work: List[dict]) -> List[dict]:
+    return sorted(work or [], key=lambda x: _parse_to_key(x.get("to")), reverse=True)
+
+def months_to_ym(m) -> str:
+    try: m=int(float(m))
+    except Exception: return "0m"
+    if m<=0: return "0m"
+    y=m//12; mo=m%12
+    return (f"{y}y " if y else "") + (f"{mo}m" if mo else "")
+
+# ------- Identity helpers -------
+def infer_identity(text: str, position_fallback: str) -> dict:
+    name_initials = "—"
+    m = re.search(r"\b([A-Z])[a-zA-Z]+\s+([A-Z])[a-zA-Z]+", text)
+    if m: name_initials = f"{m.group(1)}.{m.group(2)}."
+    nat = "—"
+    for c in COUNTRY_HINTS:
+        if re.search(r"\b"+c+r"\b", text, re.I): nat = c.replace("\\",""); break
+    langs_found = [L for L in LANG_HINTS if re.search(r"\b"+L+r"\b", text, re.I)]
+    yob = "-"
+    m = re.search(r"\b(19|20)\d{2}\b", text)
+    if m: yob = m.group(0)
+    return {
+        "name_initials": name_initials,
+        "position": position_fallback,
+        "nationality": nat,
+        "languages": langs_found or ["English"],
+        "year_of_birth": yob,
+        "total_experience_months": 0
+    }
+
+def _diameters_m(text: str) -> List[float]:
+    """Distinct diameters in metres, largest first (ranges and "6.2 m ID" included; see cv_quantities)."""
+    return diameters_m(scan_quantities(text))
+
+def _work_quantities(work: list) -> dict:
+    """cv_quantities facts summed over projects: diameters_m, tunnel_m, rings, advance_m_day."""
+    return combine_facts(quantity_facts(_work_blob([w], "\n")) for w in work or [])
+
+def _oems(text: str) -> List[str]:
+    found = []
+    for o in OEM_HINTS:
+        if re.search(r"\b"+re.escape(o)+r"\b", text, re.I):
+            found.append(o)
+    return sorted(set(found))
+
+
+def _countries(text: str) -> list:
+    # ISO coverage + aliases; case-insensitive whole-word-ish matching.
+    t = text or ""
+    found = set()
+    # Normalize common dotted abbreviations
+    norm = t.replace("U.A.E.", "UAE").replace("U.S.A.", "USA")
+    # 1) alias matches
+    for alias, canonical in ALIAS_TO_COUNTRY.items():
+        pat = r'(?<![A-Za-z])' + re.escape(alias) + r'(?![A-Za-z])'
+        if re.search(pat, norm, flags=re.IGNORECASE):
+            found.add(canonical)
+    # 2) direct ISO country names
+    for cname in ISO_COUNTRIES:
+        pat = r'(?<![A-Za-z])' + re.escape(cname) + r'(?![A-Za-z])'
+        if re.search(pat, norm, flags=re.IGNORECASE):
+            found.add(cname)
+    return sorted(found)
+
+
+def _parse_date_any(s: Optional[str]) -> Optional[datetime.date]:
+    if not s: return None
+    s = str(s).strip()
+    if re.search(r"present|current|ongoing", s, re.I):
+        today = datetime.date.today()
+        return datetime.date(today.year, today.month, 1)
+    m = re.match(r"^(\d{4})[-/](\d{1,2})$", s)
+    if m:
+        return datetime.date(int(m.group(1)), int(m.group(2)), 1)
+    m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", s)
+    if m:
+        mo = MONTH_MAP.get(m.group(1)[:3].upper(), 1)
+        return datetime.date(int(m.group(2)), mo, 1)
+    m = re.search(r"(\d{4})", s)
+    if m:
+        return datetime.date(int(m.group(1)), 1, 1)
+    return None
+
+def _dur_ym(a: Optional[str], b: Optional[str]) -> str:
+    da = _parse_date_any(a); db = _parse_date_any(b)
+    if not da or not db: return ""
+    total = (db.year - da.year)*12 + (db.month - da.month)
+    if total < 0: total = 0
+    y = total // 12; mo = total % 12
+    if y and mo: return f"{y}y {mo}m"
+    if y: return f"{y}y"
+    if mo: return f"{mo}m"
+    return "0m"
+
+# -------- Experience totals (interval union; deterministic, not asked from the LLM) --------
+
+def _month_ord(d: datetime.date) -> int:
+    return d.year * 12 + (d.month - 1)
+
+def _work_interval(item: dict) -> Optional[Tuple[int,int]]:
+    """[start, end) in month ordinals, same arithmetic as _dur_ym. None if undated/empty."""
+    da = _parse_date_any(item.get("from")); db = _parse_date_any(item.get("to"))
+    if not da or not db:
+        return None
+    a, b = _month_ord(da), _month_ord(db)
+    return (a, b) if b > a else None
+
+def _union_months(intervals: List[Tuple[int,int]]) -> int:
+    """Sweep over sorted intervals, merging overlaps; returns covered months."""
+    total = 0
+    cur_a = cur_b = None
+    for a, b in sorted(intervals):
+        if cur_b is None or a > cur_b:
+            if cur_b is not None:
+                total += cur_b - cur_a
+            cur_a, cur_b = a, b
+        elif b > cur_b:
+            cur_b = b
+    if cur_b is not None:
+        total += cur_b - cur_a
+    return total
+
+def experience_months(work: List[dict]) -> dict:
+    """
+    Total months of experience plus per-method / per-country months.
+    Each group is the union of its own intervals, so concurrent roles never double-count.
+    """
+    spans = []
+    by_method, by_country = {}, {}
+    for it in work or []:
+        iv = _work_interval(it)
+        if not iv:
+            continue
+        spans.append(iv)
+        blob = " ".join([str(it.get("role") or ""), str(it.get("project") or ""), str(it.get("city_country") or "")]
+                        + [str(b) for b in (it.get("bullets") or []) if b])
+        meth = detect_method_project_local(blob)
+        if meth:
+            by_method.setdefault(meth, []).append(iv)
+        for c in _countries(str(it.get("city_country") or "")):
+            by_country.setdefault(c, []).append(iv)
+    return {
+        "total": _union_months(spans),
+        "by_method": {k: _union_months(v) for k, v in by_method.items()},
+        "by_country": {k: _union_months(v) for k, v in by_country.items()},
+    }
+
+# -------- Evidence-gated METHOD detection (project-local) --------
+
+CANON_METHODS = [
+    "EPB","SLURRY","MIXSHIELD","NATM","DRILL & BLAST","HARD ROCK","OPEN TBM","SINGLE SHIELD","DOUBLE SHIELD","MICROTUNNELLING","ROADHEADER","RAISE BORING"
+]
+
+NAME_SYNONYMS = {
+    "EPB": [r"epb\b", r"earth\s*pressure\s*balance", r"epbm\b"],
+    "SLURRY": [r"\bslurry\b(?!.*mix)", r"slurry\s*(shield|tbm)", r"bentonite"],
+    "MIXSHIELD": [r"mix[-\s]?shield", r"mixshield"],
+    "NATM": [r"\bnatm\b", r"\bsem\b", r"sprayed\s*concrete\s*lining", r"\bscl\b"],
+    "DRILL & BLAST": [r"\bdrill(?:\s*&\s*| and )blast\b", r"\bd&b\b"],
+    "HARD ROCK": [r"hard[-\s]?rock\s*(tbm)?"],
+    "OPEN TBM": [r"open\s*(mode|face)\s*tbm", r"\bopen\s*mode\b"],
+    "SINGLE SHIELD": [r"single\s*shield"],
+    "DOUBLE SHIELD": [r"double\s*shield"],
+    "MICROTUNNELLING": [r"\bmicrotunnel", r"\bmtbm\b", r"\bavn\b", r"pipe\s*jacking"],
+    "ROADHEADER": [r"\broadheader\b", r"boom\s*header"],
+    "RAISE BORING": [r"raise\s*bor(e|ing)"]
+}
+
+TRAIT_SYNONYMS = {
+    "EPB": [r"face\s*pression|face\s*pressure", r"screw\s*conveyor", r"foam|polymer", r"bulkhead"],
+    "SLURRY": [r"separation\s*plant", r"slurry\s*density|viscosity", r"bentonite", r"slurry\s*pump"],
+    "MIXSHIELD": [r"air\s*cushion", r"submerged\s*wall", r"compressed\s*air"],
+    "NATM": [r"shotcrete", r"lattice\s*girder", r"rock\s*bolt", r"convergence\s*monitor"],
+    "DRILL & BLAST": [r"charging", r"initiation", r"stemming", r"blast\s*round"],
+    "HARD ROCK": [r"disc\s*cutter", r"penetration\s*rate", r"torque|thrust", r"abrasiv"],
+    "OPEN TBM": [r"gripper\s*pads?", r"no\s*pressure\s*control", r"immediate\s*support"],
+    "SINGLE SHIELD": [r"shield\s*tail", r"annular\s*grout|tail\s*grout", r"thrust\s*jacks"],
+    "DOUBLE SHIELD": [r"telescopic\s*shield", r"simultaneous\s*excavation", r"gripper\s*mode"],
+    "MICROTUNNELLING": [r"jacking\s*frame", r"intermediate\s*jacking", r"guidance\s*system"],
+    "ROADHEADER": [r"cutter\s*picks?", r"boom", r"profil(?:e|ing)"],
+    "RAISE BORING": [r"pilot\s*hole", r"ream(?:er|ing)"]
+}
+
+def _regex_any(patterns: List[str]):
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.I)
+
+# A trailing (?!.*word) ("slurry, unless mix follows on the line") rescans the rest of the line at
+# every match: quadratic on canonical text, which is one line. scan_methods() matches the head and
+# checks the veto against per-scan word/newline positions instead. Under fullmatch (NAME_REGEX, on
+# index query tokens) the veto cannot fire, so the heads alone are equivalent there.
+_TAIL_VETO_RE = re.compile(r"\(\?!\.\*([A-Za-z]+)\)$")
+
+def _tail_veto(pat: str) -> Tuple[str, Optional[str]]:
+    """r"head(?!.*word)" -> (head, word); other patterns -> (pat, None)."""
+    m = _TAIL_VETO_RE.search(pat)
+    return (pat[:m.start()], m.group(1)) if m else (pat, None)
+
+NAME_REGEX = {k: _regex_any([_tail_veto(p)[0] for p in v]) for k,v in NAME_SYNONYMS.items()}
+TRAIT_REGEX = {k: _regex_any(v) for k,v in TRAIT_SYNONYMS.items()}
+
+SPECIFICITY = {"MIXSHIELD":3,"SLURRY":2,"EPB":2,"SINGLE SHIELD":2,"DOUBLE SHIELD":2,"OPEN TBM":2,"NATM":2,"DRILL & BLAST":2,"HARD ROCK":2,"MICROTUNNELLING":2,"ROADHEADER":2,"RAISE BORING":2}
+
+# summary method families (labels of cv_facts method_mentions, cv_rank and the summary's method ranking)
+METHOD_FAMILIES = {
+    "EPB": r"\b(EPB|earth\s*pressure\s*balance|balance\s*shield)\b",
+    "Slurry": r"\b(slurry|bentonite\s*slurry)\b",
+    "Mixshield": r"\b(mix\s*shield|mixshield)\b",
+    "Double Shield TBM": r"\b(double\s*shield|DS\b|DSTS)\b",
+    "Single Shield TBM": r"\b(single\s*shield|SS\b)\b",
+    "Open TBM": r"\b(open\s*(?:tbm|gripper|tunnel\s*borer)|gripper\s*tbm)\b",
+    "Hard Rock": r"\b(hard\s*rock)\b",
+    "NATM/SEM": r"\b(NATM|SEM|drill\s*(?:&|and)\s*blast|D&B)\b",
+}
+
+# -------- Method scanner: names, traits and summary families in one traversal --------
+# Every pattern above starts with a literal, so the text is walked once word by word and a word is only
+# tried against the patterns whose leading literal it starts with ("screw" -> r"screw\s*conveyor").
+# Patterns without a leading \b also match inside a word ("discharging" -> r"charging"); for them,
+# and for positions after an "&" inside a word, the positions where a lead starts mid-word are
+# tried too (_METHOD_MIDWORD_RE). Each pattern keeps its own non-overlapping matches, as re.findall would.
+def _split_top(pat: str) -> List[str]:
+    out, depth, cur, i = [], 0, "", 0
+    while i < len(pat):
+        c = pat[i]
+        if c == "\\":
+            cur += pat[i:i+2]; i += 2; continue
+        depth += (c == "(") - (c == ")")
+        if c == "|" and depth == 0:
+            out.append(cur); cur = ""
+        else:
+            cur += c
+        i += 1
+    return out + [cur]
+
+def _lead_words(pat: str, unbounded: Optional[list] = None, bounded: bool = False) -> Optional[set]:
+    """
+    Literal word prefixes a match of pat can start with; None when pat does not start with one.
+    A lead not behind a \b is also appended to unbounded (it can start inside a word).
+    """
+    branches = _split_top(pat)
+    if len(branches) > 1:
+        leads = [_lead_words(b, unbounded, bounded) for b in branches]
+        return None if any(x is None for x in leads) else set().union(*leads)
+    while pat.startswith("\\b"):
+        pat, bounded = pat[2:], True
+    if pat.startswith("("):
+        inner = pat[1:]
+        depth, end = 1, 0
+        for end, c in enumerate(inner):
+            depth += (c == "(") - (c == ")")
+            if depth == 0:
+                break
+        inner = inner[:end]
+        if inner.startswith("?") and not inner.startswith("?:"):
+            return None
+        return _lead_words(inner[2:] if inner.startswith("?:") else inner, unbounded, bounded)
+    m = re.match(r"[A-Za-z&]+", pat)
+    if not m:
+        return None
+    lead = m.group().lower()
+    if pat[m.end():m.end()+1] in ("?", "*", "{"):
+        lead = lead[:-1]  # quantifier on the last letter
+    if len(lead) < 2:
+        return None
+    if not bounded and unbounded is not None:
+        unbounded.append(lead)
+    return {lead}
+
+def _method_patterns() -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """Distinct patterns -> [(kind, label)] for kind in name | trait | family."""
+    pats = {}
+    for kind, table in (("name", NAME_SYNONYMS), ("trait", TRAIT_SYNONYMS)):
+        for label, ps in table.items():
+            for pat in ps:
+                pats.setdefault(pat, []).append((kind, label))
+    for label, pat in METHOD_FAMILIES.items():
+        pats.setdefault(pat, []).append(("family", label))
+    return list(pats.items())
+
+def _method_index(pats) -> Tuple[Dict[str, List[Tuple[str, int]]], List[int], set, List[str]]:
+    """
+    first two letters of a lead word -> [(lead, pattern no.)], the patterns without a lead word,
+    the patterns that can start inside a word and the leads they can start with there.
+    """
+    index, unindexed, midword, midword_leads = {}, [], set(), set()
+    for i, (pat, _targets) in enumerate(pats):
+        unbounded: List[str] = []
+        leads = _lead_words(pat, unbounded)
+        if leads is None:
+            unindexed.append(i)
+        if unbounded:
+            midword.add(i)
+            midword_leads.update(unbounded)
+        for lead in sorted(leads or ()):
+            index.setdefault(lead[:2], []).append((lead, i))
+    return index, unindexed, midword, sorted(midword_leads)
+
+_METHOD_PATTERN_SRC = _method_patterns()
+# unindexed patterns are searched in full; midword ones are also tried where a lead starts inside a word
+_METHOD_INDEX, _METHOD_UNINDEXED, _METHOD_MIDWORD, _METHOD_MIDWORD_LEADS = _method_index(_METHOD_PATTERN_SRC)
+_METHOD_MIDWORD_RE = re.compile("(?<=[a-z&])(?:(?=" + "|".join(_METHOD_MIDWORD_LEADS) + ")|(?<=&))", re.I)
+# indexed patterns with a tail veto are compiled without it: pattern no. -> lookahead finding every start of the word
+_METHOD_VETO = {i: re.compile(f"(?=(?:{_tail_veto(pat)[1]}))", re.I)
+                for i, (pat, _t) in enumerate(_METHOD_PATTERN_SRC) if _tail_veto(pat)[1] and i not in _METHOD_UNINDEXED}
+_METHOD_PATTERNS = [(re.compile(_tail_veto(pat)[0] if i in _METHOD_VETO else pat, re.I), targets)
+                    for i, (pat, targets) in enumerate(_METHOD_PATTERN_SRC)]
+METHOD_WORD_RE = re.compile(r"[a-z&]+", re.I)
+_METHOD_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz&")
+
+def _vetoed(text: str, end: int, word_rx, memo: dict) -> bool:
+    """(?!.*word) failing at end: word starts somewhere in text[end:] before the next newline."""
+    got = memo.get(word_rx)
+    if got is None:
+        got = memo[word_rx] = ([m.start() for m in word_rx.finditer(text)], [m.start() for m in re.finditer("\n", text)])
+    starts, newlines = got
+    j = bisect.bisect_left(starts, end)
+    if j == len(starts):
+        return False
+    k = bisect.bisect_left(newlines, end)
+    return k == len(newlines) or newlines[k] > starts[j]
+
+def _midword_starts(text: str) -> List[int]:
+    """Positions inside a word where a mid-word lead starts or an "&" ends, ascending."""
+    low = text.lower()
+    if len(low) != len(text):   # lowercasing changed offsets: let the regex find them
+        return [m.start() for m in _METHOD_MIDWORD_RE.finditer(text)]
+    out = set()
+    for lead in itertools.chain(_METHOD_MIDWORD_LEADS, "&"):
+        k = low.find(lead, 0 if lead == "&" else 1)
+        while k != -1:
+            if lead == "&":
+                out.add(k + 1)
+            elif low[k - 1] in _METHOD_WORD_CHARS:
+                out.add(k)
+            k = low.find(lead, k + 1)
+    return sorted(out)
+
+def scan_methods(text: str) -> Dict[Tuple[str, str], int]:
+    """{(kind, label): hits} for kind in name | trait | family, from one pass over text."""
+    text = text or ""
+    counts: Dict[Tuple[str, str], int] = {}
+    last_end: Dict[int, int] = {}
+    veto_memo: dict = {}
+    mid = _midword_starts(text)
+    j = 0
+    for w in METHOD_WORD_RE.finditer(text):
+        starts = [w.start()]
+        while j < len(mid) and mid[j] < w.end():   # mid-word starts of this word, if any
+            if mid[j] > w.start():
+                starts.append(mid[j])
+            j += 1
+        for pos in starts:
+            cands = _METHOD_INDEX.get(text[pos:pos + 2].lower())
+            if not cands:
+                continue
+            word = text[pos:w.end()].lower()
+            after_amp = pos > w.start() and text[pos - 1] == "&"   # \b holds there, as at a word start
+            for lead, i in cands:
+                if pos < last_end.get(i, 0) or not word.startswith(lead):
+                    continue
+                if pos > w.start() and not after_amp and i not in _METHOD_MIDWORD:
+                    continue
+                m = _METHOD_PATTERNS[i][0].match(text, pos)
+                if m and i in _METHOD_VETO and _vetoed(text, m.end(), _METHOD_VETO[i], veto_memo):
+                    m = None
+                if m:
+                    last_end[i] = max(m.end(), pos + 1)
+                    for t in _METHOD_PATTERNS[i][1]:
+                        counts[t] = counts.get(t, 0) + 1
+    for i in _METHOD_UNINDEXED:
+        rx, targets = _METHOD_PATTERNS[i]
+        n = sum(1 for _ in rx.finditer(text))
+        if n:
+            for t in targets:
+                counts[t] = counts.get(t, 0) + n
+    return counts
+
+def method_families(hits: Dict[Tuple[str, str], int]) -> Dict[str, int]:
+    """METHOD_FAMILIES label -> mentions, from scan_methods()."""
+    return {label: n for (kind, label), n in hits.items() if kind == "family"}
+
+def best_method(hits: Dict[Tuple[str, str], int]) -> Optional[str]:
+    """Project method from scan_methods(): name + trait beats name only, then SPECIFICITY."""
+    scores = []
+    for label in CANON_METHODS:
+        if hits.get(("name", label)):
+            score = 2 if hits.get(("trait", label)) else 1
+            scores.append((score, SPECIFICITY.get(label,1), label))
+    if not scores:
+        return None
+    scores.sort(reverse=True)
+    best = scores[0][2]
+    if best == "SLURRY":
+        if any(lab == "MIXSHIELD" and sc >= scores[0][0] for sc,sp,lab in scores):
+            best = "MIXSHIELD"
+    return best
+
+def detect_method_project_local(text: str) -> Optional[str]:
+    if not text or not text.strip():
+        return None
+    return best_method(scan_methods(text))
+
+# -------- Bullets rewrite (sentence-aware, soft 18-40 words target, 3-6 bullets) --------
+
+ADMIN_NOISE = re.compile(r"\b(email|microsoft (office|windows)|excel|word|ppt|powerpoint|outlook|generic reporting|documentation)\b", re.I)
+TUNNEL_SIGNALS = re.compile(r"\b(EPB|slurry|mix[- ]?shield|NATM|drill(?:\s*&\s*blast| and blast)|ring build|VMT|foam|polymer|face pressure|screw conveyor|hyperbaric|cutterhead|convergence|shotcrete|rock bolt|separation plant|slurry density|viscosity|settlement|annular grout|thrust|torque|advance rate|downtime)\b", re.I)
+
+CONJ_SPLIT = re.compile(r"(?<!\s)\s+(and|which|that|while|whereas|as well as)\s+", re.I)
+
+def _normalize_whitespace(s: str) -> str:
+    return SPACE_RE.sub(" ", (s or "")).strip(" .;,-")
+
+def _word_count(s: str) -> int:
+    return 0 if not s else len(_normalize_whitespace(s).split())
+
+def _split_long_sentence(s: str, max_words=42) -> List[str]:
+    s = _normalize_whitespace(s)
+    if _word_count(s) <= max_words:
+        return [s]
+    # heuristic split
+    tokens = s.split()
+    mid = len(tokens)//2
+    return [" ".join(tokens[:mid]), " ".join(tokens[mid:])]
+
+SAFETY_KEEP = re.compile(r"\b(RAMS|permit|confined|hyperbaric|H2S|CH4|gas|TBM rescue)\b", re.I)
+DIGIT_RE = re.compile(r"\d")
+SHINGLE_WORD_RE = re.compile(r"[a-z0-9ø]+")
+BULLETS_MIN, BULLETS_MAX = 3, 6
+NEAR_DUP_JACCARD = 0.6   # word-trigram overlap at which two bullets count as the same statement
+
+def _shingles(s: str) -> frozenset:
+    w = SHINGLE_WORD_RE.findall(s.lower())
+    return frozenset(zip(w, w[1:], w[2:])) if len(w) >= 3 else frozenset([tuple(w)])
+
+def _clean_bullets(raw_bullets: List[str]) -> List[str]:
+    cleaned = []
+    for b in raw_bullets or []:
+        t = _normalize_whitespace(str(b))
+        if not t:
+            continue
+        if ADMIN_NOISE.search(t) and not SAFETY_KEEP.search(t):
+            continue
+        for p in _split_long_sentence(t, max_words=42):
+            if _word_count(p) >= 8:
+                cleaned.append(p)
+    return cleaned
+
+def rewrite_cv_bullets(bullets_per_project: List[List[str]]) -> List[List[str]]:
+    """
+    Bullets for every project of a CV in one pass. Each bullet is cleaned, scored and shingled
+    once; within a project they are ranked (tunnelling signal, has a number, close to 28 words,
+    shorter). A bullet that nearly repeats one already kept (here or in an earlier project, i.e.
+    boilerplate copied across jobs) is dropped, even if the project then keeps fewer than
+    BULLETS_MIN; only a project left with no bullet at all keeps its best such repeat.
+    At most BULLETS_MAX per project.
+    """
+    kept_shingles: List[frozenset] = []
+    by_shingle: dict = {}  # shingle -> indices into kept_shingles
+    out = []
+    for raw in bullets_per_project:
+        scored = []
+        for x in _clean_bullets(raw):
+            key = (-bool(TUNNEL_SIGNALS.search(x)), -bool(DIGIT_RE.search(x)), abs(_word_count(x) - 28), len(x))
+            scored.append((key, x, _shingles(x)))
+        scored.sort(key=lambda t: t[0])
+        picked, dups = [], []  # (rank, text, shingles)
+        for rank, (_key, x, sh) in enumerate(scored):
+            if len(picked) >= BULLETS_MAX:
+                break
+            if any(len(sh & o) / len(sh | o) >= NEAR_DUP_JACCARD for _r, _x, o in picked):
+                continue  # near-repeat inside this project: never kept
+            cands = {i for g in sh for i in by_shingle.get(g, ())}
+            if any(len(sh & kept_shingles[i]) / len(sh | kept_shingles[i]) >= NEAR_DUP_JACCARD for i in cands):
+                dups.append((rank, x, sh))
+                continue
+            picked.append((rank, x, sh))
+        picked = sorted(picked or dups[:1])
+        for _r, _x, sh in picked:
+            for g in sh:
+                by_shingle.setdefault(g, []).append(len(kept_shingles))
+            kept_shingles.append(sh)
+        out.append([x for _r, x, _sh in picked])
+    return out
+
+def rewrite_project_bullets(raw_bullets: List[str]) -> List[str]:
+    # Evidence-only, grammar-preserving bullets. Target 18-40 words; 3-6 bullets.
+    return rewrite_cv_bullets([raw_bullets])[0]
+
+# -------- Summary paragraph (richer: 2-3 sentences) --------
+
+
+
+def build_summary_paragraph(full_text: str, work: List[dict], ident: dict) -> str:
+    """Evidence-only summary paragraph using ONE primary role and years-only experience."""
+    import re
+
+    # --- helper: canonicalise and choose ONE primary role ---
+    role_syn = {
+        "tbm pilot": "TBM Operator",
+        "tbm op": "TBM Operator",
+        "tbm operator": "TBM Operator",
+        "shift engineer": "TBM Shift Engineer",
+        "tbm shift engineer": "TBM Shift Engineer",
+        "natm engineer": "NATM Engineer",
+        "scl engineer": "NATM Engineer",
+        "blasting engineer": "Blasting Engineer",
+        "blast engineer": "Blasting Engineer",
+        "tunnelling engineer": "Tunnel Engineer",
+        "tunnel engineer": "Tunnel Engineer",
+        "senior tunnel engineer": "Senior Tunnel Engineer",
+        "site engineer": "Tunnel Site Engineer",
+        "geotechnical engineer": "Geotechnical Engineer",
+        "construction manager": "Construction Manager",
+        "tunnel construction manager": "Tunnel Construction Manager",
+        "project manager": "Project Manager",
+        "project director": "Project Director"
+    }
+    seniority_order = [
+        "Project Director",
+        "Construction Manager",
+        "Tunnel Construction Manager",
+        "Project Manager",
+        "Senior Tunnel Engineer",
+        "NATM Engineer",
+        "TBM Shift Engineer",
+        "Geotechnical Engineer",
+        "Tunnel Site Engineer",
+        "Tunnel Engineer",
+        "TBM Operator",
+    ]
+    rank = {r:i for i,r in enumerate(seniority_order)}
+
+    def norm_role(r):
+        rl = (r or "").strip()
+        low = rl.lower()
+        return role_syn.get(low, rl)
+
+    # parse dates for recency scoring
+    def _parse_date_any(sv):
+        if not sv: return None
+        sv = str(sv).strip()
+        if re.search(r"present|current|ongoing", sv, re.I):
+            today = datetime.date.today()
+            return datetime.date(today.year, today.month, 1)
+        m = re.match(r"^(\d{4})[-/](\d{1,2})$", sv)
+        if m:
+            return datetime.date(int(m.group(1)), int(m.group(2)), 1)
+        m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", sv)
+        if m:
+            MONTH_MAP = {"JAN":1,"FEB":2,"MAR":3,"APR":4,"MAY":5,"JUN":6,"JUL":7,"AUG":8,"SEP":9,"OCT":10,"NOV":11,"DEC":12}
+            mo = MONTH_MAP.get(m.group(1)[:3].upper(), 1)
+            return datetime.date(int(m.group(2)), mo, 1)
+        m = re.search(r"(\d{4})", sv)
+        if m:
+            return datetime.date(int(m.group(1)), 1, 1)
+        return None
+
+    roles = []
+    for it in work or []:
+        r = norm_role(it.get("role",""))
+        if r: roles.append((r, _parse_date_any(it.get("to")), _parse_date_any(it.get("from"))))
+    # choose best: seniority -> recency -> frequency
+    if roles:
+        # frequency map
+        freq = {}
+        for r,_,_ in roles:
+            freq[r] = freq.get(r,0)+1
+        # pick max by (seniority rank, recency date, frequency)
+        def key_fn(tup):
+            r, to, _ = tup
+            s_rank = -(100 - rank.get(r, 100))  # lower better; invert for max
+            rec = to or datetime.date(1900,1,1)
+            return (s_rank, rec, freq.get(r,0))
+        best = max(roles, key=key_fn)[0]
+        primary_role = best
+    else:
+        primary_role = ident.get("position") or "Tunnelling Professional"
+
+    # --- collect evidence from work blocks (evidence-only) ---
+    OEM_HINTS = ["Herrenknecht","Robbins","Terratec","CREG","Iseki","RASA","Kawasaki","Hitachi Zosen"]
+    # recognise but do not force—presence only if text contains it
+    METHOD_HINTS = [
+        "EPB","SLURRY","MIXSHIELD","SINGLE SHIELD","DOUBLE SHIELD",
+        "OPEN TBM","HARD ROCK","MICROTUNNELLING","NATM","DRILL & BLAST","SCL"
+    ]
+    COUNTRY_HINTS = [
+        "Qatar","U\\.A\\.E","UAE","United Arab Emirates","Bahrain","Saudi","Oman","Kuwait",
+        "Malaysia","Thailand","Singapore","Italy","India","Australia","United Kingdom","UK",
+        "Germany","France","Spain","Turkey","Indonesia","Philippines","Vietnam","China",
+        "Hong Kong","Taiwan","Japan","Korea","Norway","Poland"
+    ]
+
+    methods, oems, diams, countries = [], [], [], []
+    sectors = set()
+
+    for item in work or []:
+        role  = str(item.get("role",""))
+        proj  = str(item.get("project",""))
+        place = str(item.get("city_country",""))
+        rb    = [str(b) for b in (item.get("bullets") or []) if b]
+        blob  = " ".join([role, proj, place] + rb)
+
+        for mh in METHOD_HINTS:
+            if re.search(rf"\b{mh}\b", blob, re.I):
+                methods.append(mh)
+        oems.extend([o for o in OEM_HINTS if re.search(rf"\b{o}\b", blob, re.I)])
+        diams.extend(_diameters_m(blob))
+        for c in COUNTRY_HINTS:
+            if re.search(rf"\b{c}\b", blob, re.I):
+                countries.append(c.replace("\\",""))
+        if re.search(r"\bmetro|rail|station\b", blob, re.I): sectors.add("metro/rail")
+        if re.search(r"\bwater|sewage|utility\b", blob, re.I): sectors.add("utility/water")
+        if re.search(r"\bhighway|road\b", blob, re.I): sectors.add("highway")
+        if re.search(r"\bcavern|station box|underground station\b", blob, re.I): sectors.add("caverns/stations")
+
+    # de-dup and trim evidence
+    def _uniq(seq): 
+        out=[]; 
+        [out.append(x) for x in seq if x not in out]; 
+        return out
+
+    methods   = _uniq(methods)
+    oems      = _uniq(oems)[:3]
+    countries = _uniq(countries)[:6]
+    diams     = sorted(set(diams))
+    qty       = _work_quantities(work)
+    years_total = ident.get("total_experience_months") or 0
+    try:
+        years_total = int(float(years_total))
+    except Exception:
+        years_total = 0
+    years = years_total // 12
+    rem = years_total % 12
+    years_phrase = f"over {years} years" if rem >= 6 and years>0 else (f"{years} years" if years>0 else "years")
+
+    # deterministic paragraph (short, evidence-only)
+    parts = []
+    if years>0:
+        parts.append(f"{primary_role} with {years_phrase} in tunnelling.")
+    else:
+        parts.append(f"{primary_role} in tunnelling.")
+    if methods:
+        parts.append("Experience with " + ", ".join(m for m in methods[:4]) + ".")
+    if diams:
+        dmin, dmax = min(diams), max(diams)
+        if dmin != dmax:
+            parts.append(f"Worked across diameters Ø {dmin:.0f}–{dmax:.0f} m.")
+        else:
+            parts.append(f"Worked up to Ø {dmax:.0f} m.")
+    if qty["tunnel_m"]:
+        parts.append(f"Delivered {fmt_length(qty['tunnel_m'])} of tunnel" + (f" ({qty['rings']:,} rings)." if qty["rings"] else "."))
+    if oems:
+        parts.append("OEMs: " + ", ".join(oems) + ".")
+    if countries:
+        parts.append("Countries: " + ", ".join(countries) + ".")
+    if sectors:
+        parts.append("Sectors: " + ", ".join(sorted(sectors)) + ".")
+    return " ".join(parts)
+
+def _clear_body(doc: Document):
+    for para in list(doc.paragraphs):
+        p = para._element; p.getparent().remove(p)
+    for tbl in list(doc.tables):
+        t = tbl._element; t.getparent().remove(t)
+
+def _add_heading(doc: Document, text: str, size=16, bold=True, italic=True, align_center=True):
+    p=doc.add_paragraph()
+    r=p.add_run(str(text))
+    r.font.name = TOP_FONT
+    r.font.size = Pt(size)
+    r.bold = bold
+    r.italic = italic
+    if align_center: p.alignment = 1
+    return p
+
+def _add_bold_line(doc: Document, text, size=10):
+    p=doc.add_paragraph()
+    r=p.add_run(str(text))
+    r.bold=True
+    r.font.name = BODY_FONT
+    r.font.size = Pt(size)
+
+def _add_text(doc: Document, text, size=10):
+    p=doc.add_paragraph()
+    r=p.add_run(str(text))
+    r.font.name = BODY_FONT
+    r.font.size = Pt(size)
+
+def _add_bullet(doc: Document, text, size=10):
+    try:
+        p = doc.add_paragraph(style='List Bullet')
+        r = p.add_run(str(text))
+    except Exception:
+        p = doc.add_paragraph()
+        try: 
+            p.paragraph_format.left_indent = Inches(0.25)
+        except Exception: 
+            pass
+        r = p.add_run("• " + str(text))
+    r.font.name = BODY_FONT
+    r.font.size = Pt(size)
+
+def _add_horizontal_rule(doc: Document):
+    p = doc.add_paragraph()
+    p_par = p._element
+    p_pr = p_par.get_or_add_pPr()
+    p_borders = OxmlElement('w:pBdr')
+    bottom = OxmlElement('w:bottom')
+    bottom.set(qn('w:val'), 'single')
+    bottom.set(qn('w:sz'), '8')
+    bottom.set(qn('w:space'), '1')
+    bottom.set(qn('w:color'), '000000')
+    p_borders.append(bottom)
+    p_pr.append(p_borders)
+
+def _add_identity_line(doc: Document, label: str, value: str, tab_pos_in=COLON_TAB_INCH):
+    p = doc.add_paragraph()
+    pf = p.paragraph_format
+    pf.left_indent = Pt(0); pf.first_line_indent = Pt(0)
+    pf.space_before = Pt(0); pf.space_after = Pt(0)
+    pf.line_spacing = 1.0
+
+    pPr = p._p.get_or_add_pPr()
+    tabs = pPr.find(qn('w:tabs'))
+    if tabs is None:
+        tabs = OxmlElement('w:tabs'); pPr.append(tabs)
+    tab = OxmlElement('w:tab')
+    tab.set(qn('w:val'), 'left')
+    tab.set(qn('w:pos'), str(int(tab_pos_in * 1440)))
+    tab.set(qn('w:leader'), 'underscore')
+    tabs.append(tab)
+
+    r1 = p.add_run(label + " ")
+    r1.font.name = TOP_FONT; r1.font.size = Pt(10); r1.bold = True
+
+    rtab = p.add_run('\t')
+    rtab.font.name = TOP_FONT; rtab.font.size = Pt(10); rtab.bold = True
+
+    r2 = p.add_run(': ')
+    r2.font.name = TOP_FONT; r2.font.size = Pt(10); r2.bold = True
+
+    r3 = p.add_run(str(value))
+    r3.font.name = TOP_FONT; r3.font.size = Pt(10); r3.bold = True
+
+def _add_top_identity_paragraphs(doc: Document, pos: str, name_i: str, nat: str, langs: str, yob: str, exp: str):
+    labels = ["POSITION","NAME","NATIONALITY","LANGUAGES","YEAR OF BIRTH","EXPERIENCE"]
+    values = [pos, name_i, nat, langs, yob, exp]
+    for L, V in zip(labels, values):
+        _add_identity_line(doc, L, V, tab_pos_in=COLON_TAB_INCH)
+        doc.add_paragraph("")  # blank line under each label line
+
+def build_payload(text: str, fallback_position: str) -> dict:
+    # UI fallback position is the single source of truth; only if it's empty do we infer.
+    role = (fallback_position or "").strip()
+    if not role:
+        role = role_from_text(text)
+    return {"desired_position": role, "resume_text": text}
+
+def sanitize_cv_json(data: dict, counts: Optional[dict] = None) -> dict:
+    # Redact in place on the parsed structure; no dumps/loads round trip that a match could corrupt.
+    return redact_structure(data if isinstance(data, dict) else {}, counts)
+
+def ensure_schema(d: dict, position: str, raw_text: str):
+    d = d or {}
+    ident = d.get("identity") or {}
+    if not ident or (ident.get("name_initials") in [None,"-","—",""] and ident.get("nationality") in [None,"-","—",""]):
+        ident = {**infer_identity(raw_text, position), **ident}
+    # Experience is derived locally from the work intervals; a model-supplied value is only a fallback.
+    exp = experience_months(d.get("work_experiences") or [])
+    months = exp["total"]
+    if months <= 0:
+        try: months = int(float(ident.get("total_experience_months") or 0))
+        except Exception: months = 0
+    ident["total_experience_months"] = months
+    ident["experience_by_method"] = exp["by_method"]
+    ident["experience_by_country"] = exp["by_country"]
+    langs = ident.get("languages") or ["English"]
+    if isinstance(langs, list) and not langs:
+        ident["languages"] = ["English"]
+    if isinstance(langs, str) and not langs.strip():
+        ident["languages"] = ["English"]
+    profile = d.get("profile_summary") or ""
+    # Force UI fallback position as single source of truth
+    if position and str(position).strip():
+        ident["position"] = str(position).strip()
+    work = d.get("work_experiences") or []
+    edu = d.get("education") or []
+    skills = d.get("skills") or []
+    courses = d.get("courses") or []
+    return ident, profile, work, edu, skills, courses
+
+def project_specs(role, proj, place, bullets) -> str:
+    blob = " ".join([str(role or ""), str(proj or ""), str(place or "")] + [str(b) for b in (bullets or []) if b])
+    meth = detect_method_project_local(blob)
+    q = quantity_facts("\n".join([str(role or ""), str(proj or ""), str(place or "")] + [str(b) for b in (bullets or []) if b]))
+    ds = q["diameters_m"]
+    os_ = _oems(blob)
+    parts = []
+    if meth: parts.append("Method: " + meth)
+    if ds: parts.append("Ø: " + ", ".join(f"{d:.2f} m" for d in ds[:3]))
+    if q["length_m"]: parts.append("Length: " + fmt_length(q["length_m"]))
+    if q["rings"]: parts.append(f"Rings: {q['rings']:,}")
+    if q["advance_m_day"]: parts.append(f"Best advance: {q['advance_m_day']:g} m/day")
+    if os_: parts.append("OEM: " + ", ".join(os_[:3]))
+    return " | ".join(parts)
+
+
+# ---------- Summary helpers (synonym-aware; summary-only) ----------
+SECTOR_PATTERNS = [
+    (re.compile(r"\b(metro|subway|rail|underground|lrt|mrt|stations?)\b", re.I), "metro/rail"),
+    (re.compile(r"\b(road|highway|expressway)\b", re.I), "road"),
+    (re.compile(r"\b(water|sewer|wastewater|drainage)\b", re.I), "water/sewer"),
+    (re.compile(r"\b(airport|runway|terminal)\b", re.I), "airport"),
+    (re.compile(r"\b(mining|mine)\b", re.I), "mining"),
+    (re.compile(r"\b(hydro|power\s*plant)\b", re.I), "power/hydro"),
+    (re.compile(r"\b(utility|cable|pipe\s*jacking)\b", re.I), "utilities"),
+]
+
+def _extract_methods_synonyms(text: str) -> list:
+    scores = method_families(scan_methods(text))
+    # sort by frequency desc, keep top 3
+    ordered = [k for k, _ in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0].lower()))]
+    return ordered[:3]
+
+def _extract_sectors(text: str) -> list:
+    buf = text or ""
+    found = []
+    for rx, label in SECTOR_PATTERNS:
+        if rx.search(buf):
+            found.append(label)
+    # preserve order, dedupe
+    seen = set(); out = []
+    for x in found:
+        if x not in seen:
+            out.append(x); seen.add(x)
+    return out[:3]
+
+def _collect_summary_facts(identity: dict, work: list, raw_text: str) -> dict:
+    # Combine text from work items and full text
+    blob_parts = [raw_text or ""]
+    for w in work or []:
+        blob_parts.extend([str(w.get("role","")), str(w.get("project","")), str(w.get("city_country",""))])
+        for b in (w.get("bullets") or []):
+            if b: blob_parts.append(str(b))
+    blob = " ".join(blob_parts)
+
+    # Methods: use synonym-aware first, fallback to existing helpers if present
+    methods = _extract_methods_synonyms(blob)
+    if not methods:
+        try:
+            methods = [m.upper() for m in _methods(blob)]
+        except Exception:
+            methods = []
+
+    # OEMs
+    try:
+        oems = _oems(blob)
+    except Exception:
+        oems = []
+        for o in OEM_HINTS:
+            if re.search(r"\b"+re.escape(o)+r"\b", blob, re.I):
+                oems.append(o)
+    # cap
+    oems = list(dict.fromkeys(oems))[:3]
+
+    # Sectors
+    sectors = _extract_sectors(blob)
+
+    # Countries
+    try:
+        countries = _countries(blob)
+    except Exception:
+        countries = []
+        for c in COUNTRY_HINTS:
+            if re.search(r"\b"+c+r"\b", blob, re.I):
+                countries.append(c.replace("\\\\",""))
+    countries = list(dict.fromkeys(countries))[:5]
+
+    # Years (not months)
+    months = int(identity.get("total_experience_months") or 0)
+    years = months // 12 if months > 0 else 0
+
+    qty = _work_quantities(work)
+    return {"methods": methods, "oems": oems, "sectors": sectors, "countries": countries, "years": years,
+            "diameters_m": qty["diameters_m"], "tunnel_m": qty["tunnel_m"]}
+
+def build_summary_third_person(identity: dict, work: list, raw_text: str, fallback_position: str) -> str:
+    # Resolve position: prefer forced identity.position (caller ensures override)
+    position = (identity.get("position") or fallback_position or "Tunneling Professional").strip()
+
+    facts = _collect_summary_facts(identity, work, raw_text)
+    years = facts["years"]
+    methods = facts["methods"]
+    oems = facts["oems"]
+    sectors = facts["sectors"]
+    countries = facts["countries"]
+
+    parts = []
+
+    # Sentence 1
+    if years > 0:
+        parts.append(f"Highly experienced {position} with over {years} years in mechanized tunnelling.")
+    else:
+        parts.append(f"Highly experienced {position} in mechanized tunnelling.")
+
+    # Sentence 2 (methods + OEMs) — methods are MUST-HAVE if any evidence
+    if methods:
+        if oems:
+            parts.append(f"Proficient in {', '.join(methods)} and experienced with OEMs such as {', '.join(oems)}.")
+        else:
+            parts.append(f"Proficient in {', '.join(methods)}.")
+    elif oems:
+        parts.append(f"Experienced with OEMs such as {', '.join(oems)}.")
+
+    # Sentence 2b (diameters + tunnel length), evidence-only
+    ds, tunnel = facts["diameters_m"], facts["tunnel_m"]
+    if ds or tunnel:
+        span = (f"Ø {ds[-1]:g}–{ds[0]:g} m" if len(ds) > 1 else f"Ø {ds[0]:g} m") if ds else ""
+        if tunnel:
+            parts.append(f"Delivered {fmt_length(tunnel)} of tunnel" + (f" at {span}." if span else "."))
+        else:
+            parts.append(f"Worked on tunnels of {span}.")
+
+    # Sentence 3 (sectors)
+    if sectors:
+        parts.append(f"Track record across {', '.join(sectors)} projects.")
+
+    # Sentence 4 (countries)
+    if countries:
+        parts.append(f"International experience in {', '.join(countries)}.")
+
+    return " ".join(parts)
+
+
+# ---------- Structured facts per candidate (index, ranking, export) ----------
+def _work_blob(work: list, sep: str = " ") -> str:
+    """Role, project, place and bullets of work items as one text; sep="\n" keeps fields apart as clauses."""
+    parts = []
+    for w in work or []:
+        parts.extend([str(w.get("role") or ""), str(w.get("project") or ""), str(w.get("city_country") or "")])
+        parts.extend(str(b) for b in (w.get("bullets") or []) if b)
+    return sep.join(parts)
+
+def cv_facts(identity: dict, work: list) -> dict:
+    """Evidence-only facts from the sanitised work history, using the same extractors as the summary."""
+    blob = _work_blob(work)
+    by_method = identity.get("experience_by_method")
+    by_country = identity.get("experience_by_country")
+    if by_method is None or by_country is None:
+        exp = experience_months(work)
+        by_method, by_country = exp["by_method"], exp["by_country"]
+    methods = dict(by_method)
+    mentions = {}
+    for w in work or []:
+        hits = scan_methods(_work_blob([w]))
+        meth = best_method(hits)
+        if meth:
+            methods.setdefault(meth, 0)  # evidenced on an undated project: listed with 0 months
+        for label, n in method_families(hits).items():
+            mentions[label] = mentions.get(label, 0) + n
+    countries = dict(by_country)
+    for c in _countries(blob):
+        countries.setdefault(c, 0)
+    months = int(identity.get("total_experience_months") or 0)
+    qty = _work_quantities(work)
+    return {
+        "months": months,
+        "years": months // 12,
+        "methods": methods,
+        "method_mentions": mentions,
+        "diameters_m": qty["diameters_m"],
+        "tunnel_m": qty["tunnel_m"],
+        "rings": qty["rings"],
+        "advance_m_day": qty["advance_m_day"],
+        "oems": _oems(blob),
+        "countries": countries,
+        "sectors": [label for rx, label in SECTOR_PATTERNS if rx.search(blob)],
+    }
+
+
+def cv_layout(identity: dict, work: List[dict], edu: List, skills: List[str], courses: List[str]):
+    """
+    Paragraph plan for the fixed CV layout as (kind, value) pairs, shared by both renderers.
+    kinds: heading, blank, identity (value = (label, text)), rule, bold, text, bullet.
+    """
+    yield "heading", "CURRICULUM VITAE"
+    yield "blank", ""
+
+    pos = identity.get("position") or "Tunneling Professional"
+    name_i = identity.get("name_initials") or "—"
+    nat = identity.get("nationality") or "—"
+    langs_field = identity.get("languages") or ["English"]
+    if isinstance(langs_field, str): 
+        langs = langs_field or "English"
+    else: 
+        langs = ", ".join([str(x) for x in langs_field]) or "English"
+    yob = identity.get("year_of_birth") or "—"
+    exp = months_to_ym(identity.get("total_experience_months") or 0)
+
+    labels = ["POSITION","NAME","NATIONALITY","LANGUAGES","YEAR OF BIRTH","EXPERIENCE"]
+    for L, V in zip(labels, [pos, name_i, nat, langs, yob, exp]):
+        yield "identity", (L, V)
+        yield "blank", ""  # blank line under each label line
+
+    yield "rule", ""
+    yield "blank", ""
+
+    yield "bold", "SUMMARY OF EXPERIENCE"
+    yield "text", build_summary_third_person(identity, work, "", identity.get("position"))
+    yield "blank", ""
+    yield "bold", "WORK EXPERIENCES"
+    items = sort_work(work)
+    bullets = rewrite_cv_bullets([[b for b in (it.get("bullets") or []) if b and str(b).strip()] for it in items])
+    for item, item_bullets in zip(items, bullets):
+        period = _fmt_period(item.get("from")) + " – " + _fmt_period(item.get("to"))
+        dur = _dur_ym(item.get("from"), item.get("to"))
+        if dur: period = f"{period} — {dur}"
+        yield "bold", period
+
+        role = (item.get("role") or "").strip()
+        proj = (item.get("project") or "").strip()
+        place = (item.get("city_country") or "").strip()
+        yield "text", " — ".join([t for t in [role, f"{proj}, {place}".strip(', ')] if t])
+
+        raw_bullets = [b for b in (item.get("bullets") or []) if b and str(b).strip()]
+        spec_line = project_specs(role, proj, place, raw_bullets)
+        if spec_line:
+            yield "text", spec_line
+
+        for b in item_bullets:
+            yield "bullet", b
+        yield "blank", ""
+
+    if edu:
+        cleaned_edu = [e for e in edu if (isinstance(e, dict) and any([e.get("degree"), e.get("institution"), e.get("city_country"), e.get("year")])) or (isinstance(e, str) and e.strip())]
+        if cleaned_edu:
+            yield "bold", "EDUCATION"
+            for e in cleaned_edu:
+                if isinstance(e, dict):
+                    deg = e.get("degree") or "-"
+                    inst = e.get("institution") or "-"
+                    cc = e.get("city_country") or "-"
+                    yr = e.get("year") or "-"
+                    yield "bullet", f"{deg} — {inst}, {cc} ({yr})"
+                else:
+                    yield "bullet", str(e)
+            yield "blank", ""
+
+    if skills:
+        cleaned_sk = [s for s in skills if s and str(s).strip()]
+        if cleaned_sk:
+            yield "bold", "SKILLS"
+            for s in cleaned_sk[:10]:
+                yield "bullet", s
+            yield "blank", ""
+
+    if courses:
+        cleaned_c = [c for c in courses if c and str(c).strip()]
+        if cleaned_c:
+            yield "bold", "COURSES & SEMINARS"
+            for t in cleaned_c[:10]:
+                yield "bullet", t
+
+
+def render_docx_from_template(template_path, identity: dict, profile: str, work: List[dict], edu: List, skills: List[str], courses: List[str], full_text: str) -> bytes:
+    doc = Document(template_path)
+    _clear_body(doc)
+
+    for kind, val in cv_layout(identity, work, edu, skills, courses):
+        if kind == "blank":
+            doc.add_paragraph()
+        elif kind == "heading":
+            _add_heading(doc, val, size=16)
+        elif kind == "identity":
+            _add_identity_line(doc, val[0], val[1], tab_pos_in=COLON_TAB_INCH)
+        elif kind == "rule":
+            _add_horizontal_rule(doc)
+        elif kind == "bold":
+            _add_bold_line(doc, val, size=10)
+        elif kind == "text":
+            _add_text(doc, val, size=10)
+        elif kind == "bullet":
+            _add_bullet(doc, val, size=10)
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
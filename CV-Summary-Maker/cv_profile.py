@@ -0,0 +1,163 @@
+"""
+On-demand profiling of a generate run.
+
+    prof = RunProfiler(enabled)      # disabled: start()/stop() do nothing
+    prof.start(); ...run the batch...; prof.stop()
+    prof.pstats_bytes()   # cProfile (pstats / snakeviz); b"" when it could not run
+    prof.collapsed()      # sampled stacks of every pipeline thread, "a;b;c N" (flamegraph.pl, speedscope)
+    prof.summary()        # time per pipeline function
+
+Up to Python 3.11 cProfile only sees the thread that enabled it (the Streamlit script thread),
+while provider calls and hedge legs run on cv_llm_client's pool, so a sampler thread also walks
+sys._current_frames() every `interval` seconds, keeping threads that are inside this
+repo's code. From 3.12 cProfile is per interpreter: it sees every thread, other sessions'
+included, and only one can be enabled at a time. A run that starts while another holds it
+(or while another profiler is active) profiles with the sampler alone; `cprofiled` says which.
+Render worker processes are not covered; their time shows up as waiting.
+CV_PROFILE=1 ticks the app's toggle by default; bench_load.py --profile DIR is the CLI form.
+"""
+import cProfile, marshal, os, pstats, re, sys, threading, time
+from collections import Counter
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROFILE_ENV = "CV_PROFILE"
+
+# functions reported by summary(), in pipeline order
+FOCUS = ["extract_text_any", "filter_cv_text", "canonicalize_text", "strip_pii", "call_pack", "call_routed", "call_gemini_json",
+         "call_openai_json", "sanitize_cv_json", "ensure_schema", "_countries", "rewrite_cv_bullets",
+         "index_candidate", "render_docx_from_template", "render_docx_ooxml"]
+# innermost repo frames of a thread that is idle, not working
+IDLE_FRAMES = {("cv_worker_service.py", "get")}
+# one enabled cProfile per process: required from Python 3.12, and keeps concurrent runs apart before it
+_CPROFILE_LOCK = threading.Lock()
+
+
+def profile_default() -> bool:
+    return os.getenv(PROFILE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class StackSampler(threading.Thread):
+    """Counts collapsed stacks of the threads running repo code, one sample per interval."""
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name="cv-profile-sampler", daemon=True)
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._halt.wait(self.interval):
+            names = {t.ident: re.sub(r"[-_]\d+$", "", t.name) for t in threading.enumerate()}
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack, inner_repo = [], None
+                while frame is not None:
+                    co = frame.f_code
+                    fname = os.path.basename(co.co_filename)
+                    if inner_repo is None and co.co_filename.startswith(HERE):
+                        inner_repo = (fname, co.co_name)
+                    stack.append(f"{co.co_name} ({fname}:{co.co_firstlineno})")
+                    frame = frame.f_back
+                if inner_repo is None or inner_repo in IDLE_FRAMES:
+                    continue
+                stack.append(names.get(tid, "thread"))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class RunProfiler:
+    def __init__(self, enabled: bool = True, interval: float = 0.005):
+        self.enabled, self.interval = enabled, interval
+        self._prof: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self.seconds = 0.0
+        self._t0 = 0.0
+
+    def start(self):
+        if not self.enabled:
+            return self
+        self._sampler = StackSampler(self.interval)
+        self._sampler.start()
+        if _CPROFILE_LOCK.acquire(blocking=False):
+            self._prof = cProfile.Profile()
+            try:
+                self._prof.enable()
+            except ValueError:   # another profiling tool is active (Python 3.12+)
+                self._prof = None
+                _CPROFILE_LOCK.release()
+        self._t0 = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self._sampler is None or self.seconds:
+            return
+        if self._prof is not None:
+            self._prof.disable()
+            _CPROFILE_LOCK.release()
+        self.seconds = time.perf_counter() - self._t0
+        self._sampler.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def ran(self) -> bool:
+        return self._sampler is not None and bool(self.seconds)
+
+    @property
+    def cprofiled(self) -> bool:
+        """False when the run was sampled only (cProfile was already in use)."""
+        return self._prof is not None
+
+    def pstats_bytes(self) -> bytes:
+        """Marshalled pstats, loadable with pstats.Stats(path) once written to a file; b"" without cProfile."""
+        return marshal.dumps(pstats.Stats(self._prof).stats) if self._prof is not None else b""
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self._sampler.counts.most_common())
+
+    def summary(self) -> List[Dict[str, object]]:
+        """FOCUS functions: cProfile calls / cumulative / own seconds (None when sampled only) and sampled seconds (all threads)."""
+        prof: Dict[str, list] = {}
+        stats = pstats.Stats(self._prof).stats if self._prof is not None else {}
+        for (path, _line, name), (_cc, ncalls, tt, ct, _callers) in stats.items():
+            if name in FOCUS and path.startswith(HERE):
+                row = prof.setdefault(name, [0, 0.0, 0.0])
+                row[0] += ncalls
+                row[1] += ct
+                row[2] += tt
+        sampled: Counter = Counter()
+        for stack, n in self._sampler.counts.items():
+            for name in {re.sub(r" \(.*$", "", f) for f in stack.split(";")} & set(FOCUS):
+                sampled[name] += n
+        per_sample = self.seconds / max(1, self._sampler.samples)  # the sampler falls behind its interval under load
+        out = []
+        for name in FOCUS:
+            if name in prof or name in sampled:
+                calls, ct, tt = prof.get(name, [0, 0.0, 0.0]) if self._prof is not None else (None, None, None)
+                out.append({"function": name, "calls": calls, "cum_s": None if ct is None else round(ct, 3),
+                            "own_s": None if tt is None else round(tt, 3), "sampled_s": round(sampled[name] * per_sample, 3)})
+        return out
+
+    def write(self, out_dir: str, stem: str = "cv_run") -> List[str]:
+        os.makedirs(out_dir, exist_ok=True)
+        paths = [os.path.join(out_dir, f"{stem}.collapsed.txt")]
+        with open(paths[0], "w", encoding="utf-8") as fh:
+            fh.write(self.collapsed())
+        if self._prof is not None:
+            paths.insert(0, os.path.join(out_dir, f"{stem}.pstats"))
+            with open(paths[0], "wb") as fh:
+                fh.write(self.pstats_bytes())
+        return paths
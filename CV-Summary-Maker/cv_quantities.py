@@ -0,0 +1,155 @@
+"""
+Numeric facts from CV text in one pass.
+
+scan_quantities() walks the text once with a single tokenizer pattern (optional marker,
+number or range, unit, optional trailing word) and emits typed, normalised quantities:
+
+    diameter   m        "Ø 6.6 m", "dia 3200 mm", "Ø 6–11 m", "6.2m ID", "internal diameter of 7,1 m"
+    length     m        "2.1 km drive", "850 m long", "length: 1,200 m"
+    rings      count    "1,450 rings"
+    advance    m/day, m/shift, rings/day, rings/shift   "up to 25 m/day", "12 rings per shift"
+
+A plain "120 m" with no marker stays untyped (depth, chainage, shaft...) and is not emitted; so
+does a "120 km" unless a tunnel word (tunnel, drive, bore, TBM, excavation...) is in its clause,
+as road and rail lengths and distances ("15 km from site") are stated in km too.
+"1,450" is a thousands separator, "6,6" a decimal comma. Weekly/monthly rates are converted
+to per day; per-shift rates are kept as they are, since shifts per day vary by site.
+"""
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DIAMETER_RANGE_M = (0.1, 20.0)   # outside this a "diameter" is a misread (chainage, part number)
+LENGTH_RANGE_M = (1.0, 200000.0)
+
+_NUM = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:[.,]\d+)?"
+_PER = r"(?:/\s*|\s+per\s+)(?P<per>day|d|shift|week|wk|month|mo)\b"
+_SCAN_RE = re.compile(rf"""
+    (?:(?<!\w)(?:(?P<dia>Ø|ø|⌀|diam(?:eter)?\.?|dia\.?|I\.?D\.?|O\.?D\.?|bore)
+              |(?P<len>length|long))
+       \s*(?:of\s+|[:=]\s*)?)?
+    (?<![\d.,A-Za-z])(?P<a>{_NUM})
+    (?:\s*(?:mm|m)(?![\w/]))?                      # unit repeated on the low end: "6 m – 11 m"
+    (?:\s*(?:-|–|—|to)\s*(?P<b>{_NUM}))?
+    \s*(?:(?P<unit>mm|km|m|rings?)(?:{_PER})?)(?![\w/])
+    (?:[\s,]*(?P<post>internal\s+diameter|external\s+diameter|diameter|dia|I\.?D|O\.?D|bore
+                      |long|length|drive|alignment|tunnel)\b)?
+""", re.I | re.X)
+# km lengths need a tunnel word in the same clause, looked for within CLAUSE_WINDOW chars each side
+CLAUSE_WINDOW = 120
+_CLAUSE_END_RE = re.compile(r"[;\n•]|\.(?!\d)")
+_TUNNEL_WORD_RE = re.compile(r"\b(?:tunnel\w*|drives?|drove|driven|bor(?:e|ed|ing)s?|tbms?|excavat\w*|alignment)\b", re.I)
+_POST_DIA = ("internal", "external", "diameter", "dia", "id", "i.d", "od", "o.d", "bore")
+_PER_DAY = {"day": 1.0, "d": 1.0, "week": 7.0, "wk": 7.0, "month": 30.0, "mo": 30.0}
+
+
+class Quantity(NamedTuple):
+    kind: str              # diameter | length | rings | advance
+    value: float           # low end, in unit
+    high: float            # high end (== value unless a range)
+    unit: str              # m | count | m/day | m/shift | rings/day | rings/shift
+    span: Tuple[int, int]  # position in the scanned text
+
+
+def _num(s: str) -> float:
+    if re.fullmatch(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?", s):
+        return float(s.replace(",", ""))
+    return float(s.replace(",", "."))
+
+
+def _tunnel_clause(m: "re.Match") -> bool:
+    """A tunnel/drive/bore word in the clause around m (bounded window, so the scan stays linear)."""
+    text, start, end = m.string, m.start(), m.end()
+    before = text[max(0, start - CLAUSE_WINDOW):start]
+    after = text[end:end + CLAUSE_WINDOW]
+    cuts = [x.end() for x in _CLAUSE_END_RE.finditer(before)]
+    before = before[cuts[-1]:] if cuts else before
+    cut = _CLAUSE_END_RE.search(after)
+    after = after[:cut.start()] if cut else after
+    return bool(_TUNNEL_WORD_RE.search(before) or _TUNNEL_WORD_RE.search(after))
+
+
+def _classify(m: "re.Match") -> Optional[Quantity]:
+    unit = m.group("unit").lower()
+    post = (m.group("post") or "").lower().split()
+    per = (m.group("per") or "").lower()
+    lo = _num(m.group("a"))
+    hi = _num(m.group("b")) if m.group("b") else lo
+    if hi < lo:
+        return None
+    if unit.startswith("ring"):
+        if per:
+            if per == "shift":
+                return Quantity("advance", lo, hi, "rings/shift", m.span())
+            return Quantity("advance", lo / _PER_DAY[per], hi / _PER_DAY[per], "rings/day", m.span())
+        if lo != int(lo) or hi != int(hi):
+            return None
+        return Quantity("rings", lo, hi, "count", m.span())
+    scale = {"mm": 0.001, "m": 1.0, "km": 1000.0}[unit]
+    if per:
+        if unit == "mm":
+            return None
+        if per == "shift":
+            return Quantity("advance", lo * scale, hi * scale, "m/shift", m.span())
+        return Quantity("advance", lo * scale / _PER_DAY[per], hi * scale / _PER_DAY[per], "m/day", m.span())
+    if m.group("dia") or (post and post[0] in _POST_DIA):
+        if unit == "km":
+            return None
+        lo, hi = round(lo * scale, 2), round(hi * scale, 2)
+        if not (DIAMETER_RANGE_M[0] <= lo and hi <= DIAMETER_RANGE_M[1]):
+            return None
+        return Quantity("diameter", lo, hi, "m", m.span())
+    if m.group("len") or (post and post[0] in ("long", "length", "drive", "alignment", "tunnel")) or (
+            unit == "km" and _tunnel_clause(m)):
+        lo, hi = lo * scale, hi * scale
+        if not (LENGTH_RANGE_M[0] <= lo and hi <= LENGTH_RANGE_M[1]):
+            return None
+        return Quantity("length", lo, hi, "m", m.span())
+    return None
+
+
+def scan_quantities(text: str) -> List[Quantity]:
+    out = []
+    for m in _SCAN_RE.finditer(text or ""):
+        q = _classify(m)
+        if q is not None:
+            out.append(q)
+    return out
+
+
+def diameters_m(quantities: Iterable[Quantity]) -> List[float]:
+    """Distinct diameters in metres, largest first; both ends of a range count."""
+    ds = set()
+    for q in quantities:
+        if q.kind == "diameter":
+            ds.update((q.value, q.high))
+    return sorted(ds, reverse=True)
+
+
+def quantity_facts(text: str) -> Dict[str, object]:
+    """
+    One scan of a project's text: diameters_m (largest first), length_m (longest stated length),
+    rings (largest ring count), advance_m_day (best daily advance), or None where absent.
+    """
+    qs = scan_quantities(text)
+    facts: Dict[str, object] = {"diameters_m": diameters_m(qs), "length_m": None, "rings": None, "advance_m_day": None}
+    for q in qs:
+        key = {"length": "length_m", "rings": "rings", "advance": "advance_m_day" if q.unit == "m/day" else None}.get(q.kind)
+        if key and (facts[key] is None or q.high > facts[key]):
+            facts[key] = int(q.high) if key == "rings" else round(q.high, 2)
+    return facts
+
+
+def combine_facts(per_project: Iterable[Dict[str, object]]) -> Dict[str, object]:
+    """Candidate-level facts from quantity_facts() per project: lengths and rings add up, the rest is max/union."""
+    ds, tunnel, rings, adv = set(), 0.0, 0, None
+    for f in per_project:
+        ds.update(f["diameters_m"])
+        tunnel += f["length_m"] or 0.0
+        rings += f["rings"] or 0
+        if f["advance_m_day"] is not None and (adv is None or f["advance_m_day"] > adv):
+            adv = f["advance_m_day"]
+    return {"diameters_m": sorted(ds, reverse=True), "tunnel_m": round(tunnel, 1), "rings": rings, "advance_m_day": adv}
+
+
+def fmt_length(m: float) -> str:
+    return f"{m / 1000:.1f} km" if m >= 1000 else f"{m:.0f} m"
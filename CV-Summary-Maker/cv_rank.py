@@ -0,0 +1,283 @@
+"""
+Vectorised ranking of the whole candidate index against a role spec.
+
+The per-candidate facts stored by cv_index (cv_facts: method/country months, method
+mention counts, diameters, OEMs, total months) are materialised once into NumPy
+arrays; a role spec is then scored for every candidate in one pass and only the
+top-k rows are explained.
+
+Role spec (same keys as cv_index.parse_query):
+    {"methods": ["EPB"], "min_diameter": 8.0, "max_diameter": 12.0, "oems": ["Herrenknecht"],
+     "countries": ["Qatar"], "min_years": 10}
+
+    python cv_rank.py "EPB + Herrenknecht + 8-12 m + Qatar, >= 10 years" --top 20
+"""
+import copy, threading, time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from cv_pipeline import CANON_METHODS, METHOD_FAMILIES, OEM_HINTS
+import cv_index
+
+# Component weights; components the spec does not mention are left out and the rest renormalised.
+DEFAULT_WEIGHTS = {"methods": 0.35, "years": 0.20, "diameter": 0.15, "oems": 0.15, "countries": 0.15}
+METHOD_FULL_MONTHS = 36   # this much dated experience in a method counts as a full match
+COUNTRY_FULL_MONTHS = 24
+MAX_DIAMETERS = 8         # diameters kept per candidate (largest first)
+
+# cv_facts method labels -> METHOD_FAMILIES label counted in method_mentions
+_METHOD_FAMILY = {"EPB": "EPB", "SLURRY": "Slurry", "MIXSHIELD": "Mixshield", "NATM": "NATM/SEM",
+                  "DRILL & BLAST": "NATM/SEM", "HARD ROCK": "Hard Rock", "OPEN TBM": "Open TBM",
+                  "SINGLE SHIELD": "Single Shield TBM", "DOUBLE SHIELD": "Double Shield TBM"}
+
+
+class FactMatrix:
+    """Column-oriented facts for indexed candidates (row i <-> ids[i], ids ascending)."""
+
+    def __init__(self, con, since: Optional[float] = None):
+        # since: only candidates (re-)indexed after this timestamp (used by refresh)
+        cond, args = ("", ()) if since is None else (" WHERE indexed_at > ?", (since,))
+        sub = "" if since is None else " WHERE cand_id IN (SELECT id FROM candidates WHERE indexed_at > ?)"
+        cands = con.execute("SELECT id, source_name, position, months, indexed_at FROM candidates" + cond + " ORDER BY id", args).fetchall()
+        n = len(cands)
+        self.ids = np.fromiter((r[0] for r in cands), dtype=np.int64, count=n)
+        self.source_name = [r[1] for r in cands]
+        self.position = [r[2] for r in cands]
+        self.months = np.fromiter((r[3] or 0 for r in cands), dtype=np.float32, count=n)
+        self.built_at = max((r[4] for r in cands), default=since or 0.0)
+
+        self.methods = list(CANON_METHODS)
+        self.families = list(METHOD_FAMILIES)
+        self.oems = list(OEM_HINTS)
+        self.countries = [r[0] for r in con.execute("SELECT DISTINCT country FROM cand_country" + sub + " ORDER BY country", args)]
+        col = {"m": {k: j for j, k in enumerate(self.methods)}, "o": {k: j for j, k in enumerate(self.oems)},
+               "c": {k: j for j, k in enumerate(self.countries)}, "f": {k: j for j, k in enumerate(self.families)}}
+
+        # months per method / country; -1 = evidenced but undated, 0 = absent
+        self.method_months = self._scatter(con, "SELECT cand_id, method, months FROM cand_method" + sub, args, col["m"], len(self.methods))
+        self.country_months = self._scatter(con, "SELECT cand_id, country, months FROM cand_country" + sub, args, col["c"], len(self.countries))
+        self.oem = self._scatter(con, "SELECT cand_id, oem, 1 FROM cand_oem" + sub, args, col["o"], len(self.oems)) > 0
+        self.mentions = self._scatter(con, "SELECT c.id, j.key, j.value FROM candidates c, json_each(c.record_json, "
+                                           "'$.facts.method_mentions') j" + cond.replace("indexed_at", "c.indexed_at"),
+                                      args, col["f"], len(self.families))
+
+        self.diameters = np.full((n, MAX_DIAMETERS), np.nan, dtype=np.float32)
+        rows = con.execute("SELECT cand_id, diameter_m FROM cand_diameter" + sub + " ORDER BY cand_id, diameter_m DESC", args).fetchall()
+        if rows:
+            r = self._row(np.array([x[0] for x in rows], dtype=np.int64))
+            d = np.array([x[1] for x in rows], dtype=np.float32)
+            # rank within candidate: position since the first row of that candidate
+            start = np.r_[0, np.flatnonzero(np.diff(r)) + 1]
+            rank = np.arange(len(r)) - np.repeat(start, np.diff(np.r_[start, len(r)]))
+            keep = rank < MAX_DIAMETERS
+            self.diameters[r[keep], rank[keep]] = d[keep]
+
+    def _row(self, cand_ids):
+        return np.searchsorted(self.ids, cand_ids)
+
+    def _scatter(self, con, sql: str, args: tuple, cols: Dict[str, int], width: int) -> np.ndarray:
+        out = np.zeros((len(self.ids), width), dtype=np.float32)
+        rows = con.execute(sql, args).fetchall()
+        if rows:
+            cid, key, v = zip(*rows)
+            labels, inv = np.unique(np.array(key, dtype=object), return_inverse=True)
+            j = np.array([cols.get(k, -1) for k in labels], dtype=np.intp)[inv]
+            v = np.array(v, dtype=np.float32)
+            ok = j >= 0
+            out[self._row(np.array(cid, dtype=np.int64)[ok]), j[ok]] = np.where(v[ok] > 0, v[ok], -1)
+        return out
+
+    def refresh(self, con) -> "FactMatrix":
+        """
+        This matrix with the candidates indexed since it was built folded in, as a new object;
+        self is left as it was, since other sessions may be scoring it. self when nothing changed.
+        """
+        new = FactMatrix(con, since=self.built_at)
+        if not len(new):
+            return self
+        out = copy.copy(self)
+        out.countries = self.countries + [c for c in new.countries if c not in self.countries]
+        out.country_months = np.pad(self.country_months, ((0, 0), (0, len(out.countries) - len(self.countries))))
+        cm = np.zeros((len(new), len(out.countries)), dtype=np.float32)
+        cm[:, [out.countries.index(c) for c in new.countries]] = new.country_months
+
+        pos = np.searchsorted(self.ids, new.ids)
+        hit = (pos < len(self.ids)) & (self.ids[np.minimum(pos, len(self.ids) - 1)] == new.ids) if len(self.ids) else np.zeros(len(new), bool)
+        for name, arr in (("months", new.months), ("method_months", new.method_months), ("country_months", cm),
+                          ("oem", new.oem), ("mentions", new.mentions), ("diameters", new.diameters)):
+            merged = np.concatenate([getattr(out, name), arr[~hit]])
+            merged[pos[hit]] = arr[hit]
+            setattr(out, name, merged)
+        out.source_name, out.position = list(self.source_name), list(self.position)
+        for i, p in zip(np.flatnonzero(hit), pos[hit]):
+            out.source_name[p], out.position[p] = new.source_name[i], new.position[i]
+        for i in np.flatnonzero(~hit):
+            out.source_name.append(new.source_name[i]); out.position.append(new.position[i])
+        out.ids = np.concatenate([self.ids, new.ids[~hit]])
+        if len(out.ids) > 1 and np.any(np.diff(out.ids) < 0):
+            order = np.argsort(out.ids, kind="stable")
+            for name in ("ids", "months", "method_months", "country_months", "oem", "mentions", "diameters"):
+                setattr(out, name, getattr(out, name)[order])
+            out.source_name = [out.source_name[i] for i in order]
+            out.position = [out.position[i] for i in order]
+        out.built_at = new.built_at
+        return out
+
+    def __len__(self):
+        return len(self.ids)
+
+
+_MATRICES: Dict[str, FactMatrix] = {}
+_MATRICES_LOCK = threading.Lock()
+
+
+def load_matrix(con, db_path: Optional[str] = None) -> FactMatrix:
+    """
+    Cached FactMatrix per index file; new or re-indexed candidates are folded in incrementally.
+    A refresh builds a new matrix and swaps it in, so a matrix already returned never changes.
+    """
+    path = db_path or cv_index.index_path()
+    with _MATRICES_LOCK:
+        fm = _MATRICES.get(path)
+        n = con.execute("SELECT count(*) FROM candidates").fetchone()[0]
+        if fm is None or n < len(fm):
+            fm = FactMatrix(con)
+        else:
+            fm = fm.refresh(con)
+            if len(fm) != n:
+                fm = FactMatrix(con)
+        _MATRICES[path] = fm
+    return fm
+
+
+def _method_scores(fm: FactMatrix, methods: List[str]) -> np.ndarray:
+    """Per required method: 0.5 + 0.5*months/36 if dated, 0.5 if undated evidence, 0.25 if only mentioned."""
+    per = []
+    for m in methods:
+        if m not in fm.methods:
+            per.append(np.zeros(len(fm), dtype=np.float32)); continue
+        mo = fm.method_months[:, fm.methods.index(m)]
+        fam = _METHOD_FAMILY.get(m)
+        mentioned = fm.mentions[:, fm.families.index(fam)] > 0 if fam in fm.families else np.zeros(len(fm), bool)
+        per.append(np.where(mo > 0, 0.5 + 0.5 * np.minimum(mo / METHOD_FULL_MONTHS, 1.0),
+                            np.where(mo < 0, 0.5, np.where(mentioned, 0.25, 0.0))))
+    return np.mean(per, axis=0)
+
+
+def _diameter_scores(fm: FactMatrix, lo: float, hi: float) -> np.ndarray:
+    """1 when any project diameter falls in [lo, hi]; decays with the distance to the range otherwise."""
+    d = fm.diameters
+    dist = np.where(d < lo, lo - d, np.where(d > hi, d - hi, 0.0))
+    best = np.where(np.isnan(d), np.inf, dist).min(axis=1)
+    return np.clip(1.0 - best / max(lo, 1.0), 0.0, 1.0)
+
+
+def _column_scores(fm: FactMatrix, values: List[str], vocab: List[str], mat: np.ndarray, full_months: Optional[int]) -> np.ndarray:
+    per = []
+    for v in values:
+        if v not in vocab:
+            per.append(np.zeros(len(fm), dtype=np.float32)); continue
+        x = mat[:, vocab.index(v)].astype(np.float32)
+        if full_months is None:
+            per.append(x)
+        else:
+            per.append(np.where(x > 0, 0.5 + 0.5 * np.minimum(x / full_months, 1.0), np.where(x < 0, 0.5, 0.0)))
+    return np.mean(per, axis=0)
+
+
+def score_all(fm: FactMatrix, spec: Dict, weights: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    """Component scores in [0, 1] for every candidate plus their weighted 'total'."""
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    comp = {}
+    if spec.get("methods"):
+        comp["methods"] = _method_scores(fm, spec["methods"])
+    if spec.get("min_diameter") is not None or spec.get("max_diameter") is not None:
+        comp["diameter"] = _diameter_scores(fm, float(spec.get("min_diameter") or 0.0),
+                                            float(spec["max_diameter"]) if spec.get("max_diameter") is not None else np.inf)
+    if spec.get("oems"):
+        comp["oems"] = _column_scores(fm, spec["oems"], fm.oems, fm.oem, None)
+    if spec.get("countries"):
+        comp["countries"] = _column_scores(fm, spec["countries"], fm.countries, fm.country_months, COUNTRY_FULL_MONTHS)
+    if spec.get("min_years"):
+        comp["years"] = np.minimum(fm.months / (12.0 * spec["min_years"]), 1.0)
+    if not comp:
+        comp["years"] = np.minimum(fm.months / 120.0, 1.0)
+    wsum = sum(w[k] for k in comp) or 1.0
+    total = np.zeros(len(fm), dtype=np.float32)
+    for k, v in comp.items():
+        total += (w[k] / wsum) * v
+    comp["total"] = total
+    return comp
+
+
+def _explain(fm: FactMatrix, i: int, spec: Dict) -> List[str]:
+    why = []
+    for m in spec.get("methods") or []:
+        mo = fm.method_months[i, fm.methods.index(m)] if m in fm.methods else 0
+        fam = _METHOD_FAMILY.get(m)
+        if mo > 0:
+            why.append(f"{m} {int(mo)} mo")
+        elif mo < 0:
+            why.append(f"{m} (undated)")
+        elif fam in fm.families and fm.mentions[i, fm.families.index(fam)] > 0:
+            why.append(f"{m} mentioned")
+        else:
+            why.append(f"no {m}")
+    if spec.get("min_diameter") is not None or spec.get("max_diameter") is not None:
+        d = fm.diameters[i][~np.isnan(fm.diameters[i])]
+        why.append("Ø " + "/".join(f"{x:g}" for x in d) + " m" if d.size else "no diameter")
+    for o in spec.get("oems") or []:
+        why.append(o if o in fm.oems and fm.oem[i, fm.oems.index(o)] else f"no {o}")
+    for c in spec.get("countries") or []:
+        mo = fm.country_months[i, fm.countries.index(c)] if c in fm.countries else 0
+        why.append(f"{c} {int(mo)} mo" if mo > 0 else (f"{c} (mentioned)" if mo < 0 else f"no {c}"))
+    yrs = int(fm.months[i] // 12)
+    if spec.get("min_years"):
+        why.append(f"{yrs} y {'≥' if yrs >= spec['min_years'] else '<'} {spec['min_years']}")
+    else:
+        why.append(f"{yrs} y")
+    return why
+
+
+def rank(fm: FactMatrix, spec: Dict, top: int = 20, weights: Optional[Dict[str, float]] = None) -> List[dict]:
+    """Top-k candidates for a role spec, best first, each with component scores and a short explanation."""
+    if not len(fm):
+        return []
+    comp = score_all(fm, spec, weights)
+    total = comp["total"]
+    # one sortable key: score to 4 decimals first, then months of experience
+    key = np.rint(total.astype(np.float64) * 1e4) * 1e4 + np.minimum(fm.months, 9999)
+    k = min(top, len(fm))
+    idx = np.argpartition(-key, k - 1)[:k]
+    idx = idx[np.argsort(-key[idx], kind="stable")]
+    out = []
+    for i in idx:
+        row = {"id": int(fm.ids[i]), "source_name": fm.source_name[i], "position": fm.position[i],
+               "score": round(float(total[i]), 3)}
+        row.update({name: round(float(v[i]), 2) for name, v in comp.items() if name != "total"})
+        row["why"] = ", ".join(_explain(fm, i, spec))
+        out.append(row)
+    return out
+
+
+def rank_query(con, q: str, top: int = 20, db_path: Optional[str] = None) -> List[dict]:
+    return rank(load_matrix(con, db_path), cv_index.parse_query(q), top)
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Rank all indexed candidates against a role spec.")
+    ap.add_argument("query")
+    ap.add_argument("--db", default=None)
+    ap.add_argument("--top", type=int, default=20)
+    a = ap.parse_args()
+    con = cv_index.connect(a.db)
+    t0 = time.perf_counter()
+    fm = load_matrix(con, a.db)
+    t1 = time.perf_counter()
+    rows = rank(fm, cv_index.parse_query(a.query), a.top)
+    t2 = time.perf_counter()
+    for r in rows:
+        print(f"{r['score']:.3f} {r['id']:6d} {r['source_name'] or '-':24.24s} {r['why']}")
+    print(f"{len(fm)} candidates: matrix build {1000 * (t1 - t0):.0f} ms, ranking {1000 * (t2 - t1):.1f} ms")
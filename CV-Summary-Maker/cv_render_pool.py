@@ -0,0 +1,114 @@
+"""
+Process-pool DOCX rendering.
+
+python-docx/lxml rendering is pure Python and holds the GIL, so threads do not help.
+Each worker process loads the template bytes once and renders structured CV dicts to
+DOCX bytes with either backend: "ooxml" (cv_ooxml, default) or "python-docx".
+A CV dict has the keys returned by ensure_schema:
+    {"identity", "profile", "work", "education", "skills", "courses", "full_text"}
+
+CLI (re-render stored results, one JSON object per line):
+    python cv_render_pool.py results.jsonl out_dir --workers 8 [--backend python-docx]
+"""
+import functools, io, json, os, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+RENDER_WORKERS_ENV = "CV_RENDER_WORKERS"
+RENDER_BACKEND_ENV = "CV_RENDER_BACKEND"
+RENDER_BACKENDS = ("ooxml", "python-docx")
+
+_TEMPLATE_BYTES: Optional[bytes] = None
+
+
+def default_workers() -> int:
+    try:
+        n = int(os.getenv(RENDER_WORKERS_ENV, "0"))
+    except ValueError:
+        n = 0
+    return n if n > 0 else (os.cpu_count() or 1)
+
+
+def default_backend() -> str:
+    b = os.getenv(RENDER_BACKEND_ENV, "ooxml")
+    return b if b in RENDER_BACKENDS else "ooxml"
+
+
+def renderer(backend: str = "ooxml"):
+    """render_docx_from_template-compatible callable for a backend name."""
+    if backend == "python-docx":
+        from cv_pipeline import render_docx_from_template
+        return render_docx_from_template
+    from cv_ooxml import render_docx_ooxml
+    return render_docx_ooxml
+
+
+def _init_worker(template_path: str):
+    global _TEMPLATE_BYTES
+    with open(template_path, "rb") as fh:
+        _TEMPLATE_BYTES = fh.read()
+    import cv_pipeline  # noqa: F401  (pay the python-docx import once per worker)
+
+
+def render_cv(cv: dict, template=None, backend: str = "ooxml") -> bytes:
+    """Render one structured CV. template is a path or bytes; defaults to the worker's preload."""
+    tpl = template if template is not None else _TEMPLATE_BYTES
+    if isinstance(tpl, (bytes, bytearray)) and backend == "python-docx":
+        tpl = io.BytesIO(tpl)
+    return renderer(backend)(
+        tpl, cv.get("identity") or {}, cv.get("profile") or "", cv.get("work") or [],
+        cv.get("education") or [], cv.get("skills") or [], cv.get("courses") or [],
+        full_text=cv.get("full_text") or "")
+
+
+class RenderPool:
+    """ProcessPoolExecutor with the template preloaded in every worker."""
+
+    def __init__(self, template_path: str, workers: Optional[int] = None, backend: Optional[str] = None):
+        self.workers = workers or default_workers()
+        self.backend = backend or default_backend()
+        # spawn: never fork a process that may be running Streamlit's server threads
+        self._ex = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(template_path,))
+
+    def submit(self, cv: dict):
+        return self._ex.submit(render_cv, cv, None, self.backend)
+
+    def map(self, cvs: Iterable[dict], chunksize: int = 1) -> Iterator[bytes]:
+        return self._ex.map(functools.partial(render_cv, template=None, backend=self.backend), cvs, chunksize=chunksize)
+
+    def close(self):
+        self._ex.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse, time
+    from cv_pipeline import DEFAULT_TEMPLATE_PATH
+
+    ap = argparse.ArgumentParser(description="Re-render stored structured CVs to DOCX in parallel.")
+    ap.add_argument("records", help="JSONL file, one structured CV per line (optional 'name' key)")
+    ap.add_argument("out_dir")
+    ap.add_argument("--workers", type=int, default=0)
+    ap.add_argument("--template", default=DEFAULT_TEMPLATE_PATH)
+    ap.add_argument("--backend", choices=RENDER_BACKENDS, default=default_backend())
+    a = ap.parse_args()
+
+    with open(a.records, encoding="utf-8") as fh:
+        cvs = [json.loads(line) for line in fh if line.strip()]
+    os.makedirs(a.out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    with RenderPool(a.template, a.workers or None, a.backend) as pool:
+        for i, (cv, data) in enumerate(zip(cvs, pool.map(cvs, chunksize=4))):
+            name = cv.get("name") or f"cv_{i:05d}"
+            with open(os.path.join(a.out_dir, f"CV BOT - {os.path.splitext(name)[0]}.docx"), "wb") as out:
+                out.write(data)
+    dt = time.perf_counter() - t0
+    print(f"rendered {len(cvs)} CVs with {pool.workers} {pool.backend} workers in {dt:.2f}s ({len(cvs) / dt if dt else 0:.1f}/s)")
@@ -0,0 +1,157 @@
+"""
+Size-based routing between a fast and a strong model.
+
+Short, simple CVs go to the fast model; long, table-heavy or many-role CVs go straight
+to the strong one, and a fast answer that fails schema_problems() is re-asked on the
+strong model. TierStats keeps per-tier latency and an approximate cost for the batch.
+"""
+import json, re, threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from cv_llm import _strong_prompt, schema_problems
+from cv_llm_client import CallPolicy, LLMCallError, Provider, call_llm_json
+from cv_usage import PRICES, totals
+
+STRONG_MODELS = {"gemini": "gemini-2.5-pro", "openai": "gpt-4o"}
+
+
+_TABLE_LINE_RE = re.compile(r"\t|\||\S {2,}\S.* {2,}\S")
+_DATE_RANGE_RE = re.compile(r"(?:19|20)\d\d(?:[-/.]\d{1,2})?\s*(?:-|–|—|to|until)\s*(?:(?:\w{3,9}\s+)?(?:19|20)\d\d|present|current|now|date)", re.I)
+
+
+class RoutingConfig(NamedTuple):
+    fast_model: str
+    strong_model: str
+    max_fast_chars: int = 12000        # canonical text longer than this -> strong
+    max_table_ratio: float = 0.25      # share of raw lines that look like table rows
+    max_short_line_ratio: float = 0.6  # share of 1-3 word lines (cell-per-line table extraction)
+    max_fast_roles: int = 12           # date ranges in the text
+    escalate_on_schema: bool = True
+
+
+def cv_features(raw: str, text: str) -> Dict[str, float]:
+    """Routing features: raw keeps the line structure that canonicalize_text collapses."""
+    lines = [ln for ln in (raw or "").splitlines() if ln.strip()]
+    n = len(lines) or 1
+    return {
+        "chars": len(text or ""),
+        "lines": len(lines),
+        "table_ratio": sum(1 for ln in lines if _TABLE_LINE_RE.search(ln)) / n,
+        "short_line_ratio": sum(1 for ln in lines if len(ln.split()) <= 3) / n,
+        "roles": len(_DATE_RANGE_RE.findall(text or "")),
+    }
+
+
+def route(features: Dict[str, float], cfg: RoutingConfig) -> Tuple[str, List[str]]:
+    """('fast' | 'strong', reasons)."""
+    why = []
+    if features["chars"] > cfg.max_fast_chars:
+        why.append(f"{features['chars']} chars")
+    if features["table_ratio"] > cfg.max_table_ratio:
+        why.append(f"table rows {features['table_ratio']:.0%}")
+    if features["lines"] >= 40 and features["short_line_ratio"] > cfg.max_short_line_ratio:
+        why.append(f"short lines {features['short_line_ratio']:.0%}")
+    if features["roles"] > cfg.max_fast_roles:
+        why.append(f"{features['roles']} date ranges")
+    return ("strong" if why else "fast"), why
+
+
+def approx_cost(model: str, in_chars: int, out_chars: int) -> float:
+    """USD estimate at ~4 characters per token; unknown models cost 0."""
+    pin, pout = PRICES.get(model, (0.0, 0.0, 0.0))[:2]
+    return (in_chars * pin + out_chars * pout) / 4 / 1e6
+
+
+def _cost(info: dict, in_chars: int, resp) -> float:
+    """Priced provider usage of a call; the character estimate when the provider reported none."""
+    if info.get("usage"):
+        return totals(info["usage"])["usd"]
+    return approx_cost(info["model"], in_chars, _out_chars(resp))
+
+
+class TierStats:
+    """Per-tier counts, latency and approximate cost for one batch."""
+
+    def __init__(self):
+        self._rows: Dict[str, List[Tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, seconds: float, cost: float):
+        with self._lock:
+            self._rows.setdefault(tier, []).append((seconds, cost))
+
+    def summary(self) -> List[dict]:
+        out = []
+        with self._lock:
+            items = sorted(self._rows.items())
+        for tier, rows in items:
+            secs = sorted(r[0] for r in rows)
+            out.append({"tier": tier, "calls": len(rows), "mean_s": round(sum(secs) / len(secs), 2),
+                        "p95_s": round(secs[min(len(secs) - 1, int(0.95 * len(secs)))], 2),
+                        "total_s": round(sum(secs), 1), "approx_usd": round(sum(r[1] for r in rows), 4)})
+        return out
+
+
+def describe_call(info: dict, routed: bool) -> str:
+    """One-line caption for a call_routed info dict."""
+    out = (f"Answered by {info['provider']} ({info['model']}) in {info['seconds']:.1f}s · "
+           f"attempts {info['attempts']}, hedged {info['hedged']}")
+    if routed:
+        out += f" · {info['tier']}" + (f" ({', '.join(info['route_reasons'])})" if info["route_reasons"] else "")
+    if info["escalated"]:
+        out += f" · escalated: {'; '.join(info['escalated'])}"
+    if info.get("pack", 1) > 1:
+        out += f" · packed with {info['pack'] - 1} other CV{'s' if info['pack'] > 2 else ''}"
+    if info.get("unpacked"):
+        out += f" · sent alone: {'; '.join(info['unpacked'])}"
+    return out
+
+
+def _out_chars(resp) -> int:
+    return len(json.dumps(resp, ensure_ascii=False, separators=(",", ":")))
+
+
+def _chain(model: str, primary: Provider, fallback: Optional[Provider], fallback_model: Optional[str]) -> List[Provider]:
+    chain = [primary._replace(model=model)]
+    if fallback is not None:
+        chain.append(fallback._replace(model=fallback_model or fallback.model))
+    return chain
+
+
+def call_routed(payload: dict, raw: str, primary: Provider, fallback: Optional[Provider], cfg: Optional[RoutingConfig],
+                policy: CallPolicy = CallPolicy(), stats: Optional[TierStats] = None) -> Tuple[dict, dict]:
+    """
+    call_llm_json with tier selection. Without cfg the primary's model is used as is (tier 'fixed').
+    info gains: tier, route_reasons, escalated (schema problems of the fast answer, if any).
+    """
+    text = payload.get("resume_text") or ""
+    in_chars = len(text) + len(_strong_prompt())
+    if cfg is None:
+        resp, info = call_llm_json(payload, _chain(primary.model, primary, fallback, None), policy)
+        info.update(tier="fixed", route_reasons=[], escalated=[])
+        if stats is not None:
+            stats.record("fixed", info["seconds"], _cost(info, in_chars, resp))
+        return resp, info
+
+    tier, why = route(cv_features(raw, text), cfg)
+    fb_strong = STRONG_MODELS.get(fallback.name) if fallback is not None else None
+    model = cfg.fast_model if tier == "fast" else cfg.strong_model
+    resp, info = call_llm_json(payload, _chain(model, primary, fallback, None if tier == "fast" else fb_strong), policy)
+    if stats is not None:
+        stats.record(tier, info["seconds"], _cost(info, in_chars, resp))
+    escalated = schema_problems(resp) if tier == "fast" and cfg.escalate_on_schema else []
+    if escalated:
+        try:
+            resp2, info2 = call_llm_json(payload, _chain(cfg.strong_model, primary, fallback, fb_strong), policy)
+        except LLMCallError as e:
+            info["errors"].append(f"escalation failed: {e}")  # keep the fast answer
+        else:
+            if stats is not None:
+                stats.record("strong (escalated)", info2["seconds"], _cost(info2, in_chars, resp2))
+            info2["seconds"] += info["seconds"]
+            info2["attempts"] += info["attempts"]
+            info2["hedged"] += info["hedged"]
+            info2["usage"] = info["usage"] + info2["usage"]
+            resp, info, tier = resp2, info2, "strong"
+    info.update(tier=tier, route_reasons=why, escalated=escalated)
+    return resp, info
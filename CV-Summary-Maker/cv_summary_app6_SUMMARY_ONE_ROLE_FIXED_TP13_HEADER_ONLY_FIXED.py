@@ -1,930 +1,25 @@
 
-import re
-# ====== THIRD-PERSON SUMMARY (HR style, tunnelling-specific; evidence-only) ======
-def _years_only(total_months: int, work: list) -> int:
-    """Return years as an integer (floor). Fallback by deriving from work durations."""
-    try:
-        m = int(total_months or 0)
-    except Exception:
-        m = 0
-    if m <= 0 and work:
-        # derive crude months from work blocks if needed
-        months = 0
-        for w in work:
-            a, b = w.get("from"), w.get("to")
-            da = _parse_date_any(a); db = _parse_date_any(b)
-            if da and db:
-                months += max(0, (db.year - da.year)*12 + (db.month - da.month))
-        m = months
-    return max(0, m // 12)
-
-_SECTOR_PATTERNS = [
-    (re.compile(r'\b(metro|subway|rail|underground|lrt|mrt|stations?)\b', re.I), "metro/rail"),
-    (re.compile(r'\b(road|highway|expressway|tunnel\b(?! boring))\b', re.I), "road"),
-    (re.compile(r'\b(sewer|sewage|wastewater|storm|drain|water(?!\s*stop)|pipeline|culvert)\b', re.I), "water/sewer"),
-    (re.compile(r'\b(power|cable|utility|utilities|electrical)\b', re.I), "utilities/power"),
-    (re.compile(r'\b(airport|runway|airfield)\b', re.I), "airport"),
-]
-
-def _infer_sectors(text: str) -> list:
-    seen = []
-    for rx, label in _SECTOR_PATTERNS:
-        if rx.search(text or ""):
-            seen.append(label)
-    # de-dupe preserving order
-    out, seen_set = [], set()
-    for s in seen:
-        if s not in seen_set:
-            out.append(s); seen_set.add(s)
-    return out
-
-def _collect_methods_oems_diams_countries(raw_text: str, work: list) -> tuple:
-    """
-    Collect methods, OEMs, diameters and countries from text/work.
-    Falls back to regex-based extraction if the global helpers (_methods/_oems/_diameters_m/_countries)
-    are not available in this file.
-    """
-    blob = raw_text or ""
-    for w in work or []:
-        parts = [w.get("role",""), w.get("project",""), w.get("city_country","")]
-        parts += [b for b in (w.get("bullets") or []) if b]
-        blob += " " + " ".join(map(str, parts))
-
-    # METHODS
-    try:
-        methods = [m.upper() for m in _methods(blob)]
-    except Exception:
-        # Fallback: use METHOD_HINTS if present
-        methods = []
-        try:
-            for m in METHOD_HINTS:
-                rx = r"" + m.replace(" ", "[- ]?") + r""
-                if re.search(rx, blob, re.I):
-                    methods.append(m.upper())
-        except Exception:
-            methods = []
-
-    # OEMS
-    try:
-        oems = _oems(blob)
-    except Exception:
-        oems = []
-        try:
-            for o in OEM_HINTS:
-                if re.search(r""+re.escape(o)+r"", blob, re.I):
-                    oems.append(o)
-        except Exception:
-            oems = []
-
-    # DIAMETERS
-    try:
-        diams = _diameters_m(blob)
-    except Exception:
-        diams = []
-        try:
-            mm = [float(x)/1000.0 for x in DIAM_MM_RE.findall(blob)]
-            m  = [float(x) for x in DIAM_M_RE.findall(blob)]
-            diams = sorted(set([round(v,2) for v in mm+m]), reverse=True)
-        except Exception:
-            diams = []
-
-    # COUNTRIES
-    try:
-        countries = _countries(blob)
-    except Exception:
-        countries = []
-        try:
-            for c in COUNTRY_HINTS:
-                if re.search(r""+c+r"", blob, re.I):
-                    countries.append(c.replace("\\",""))
-            # de-dupe preserve order
-            seen=set(); countries=[x for x in countries if not (x in seen or seen.add(x))]
-        except Exception:
-            countries = []
-
-    return methods, oems, diams, countries
-
-def build_summary_third_person(ident: dict, work: list, raw_text: str, fallback_position: str) -> str:
-    """
-    Compose a 3–4 sentence paragraph in third person, HR tone.
-    Uses only evidenced facts (methods, max diameter, OEMs, sectors, countries).
-    Role is taken from fallback_position (UI), with a fallback to identity.position.
-    """
-    role = (fallback_position or ident.get("position") or "Tunnelling Professional").strip()
-    years = _years_only(ident.get("total_experience_months"), work)
-    methods, oems, diams, countries = _collect_methods_oems_diams_countries(raw_text, work)
-    sectors = _infer_sectors(raw_text + " " + " ".join([str(b) for it in (work or []) for b in (it.get('bullets') or [])]))
-
-    # sentence 1
-    s1 = f"Highly experienced {role} with over {years} years in mechanized tunnelling." if years > 0 else f"Highly experienced {role} in mechanized tunnelling."
-
-    # sentence 2 (methods + diameter + OEMs), only if any present
-    clauses = []
-    if methods:
-        clauses.append(", ".join(sorted(set(methods), key=lambda x: methods.index(x))[:3]))
-    if diams:
-        mx = diams[0]
-        try:
-            if mx >= 1.0:
-                clauses.append(f"up to {mx:.0f} m")
-            else:
-                clauses.append(f"up to {mx:.2f} m")
-        except Exception:
-            pass
-    s2 = ""
-    if clauses:
-        s2 = "Demonstrated capability across " + clauses[0]
-        if len(clauses) >= 2:
-            s2 += f", {', '.join(clauses[1:])}"
-        s2 += "."
-    if oems:
-        s2 = (s2 + " " if s2 else "") + "Experience with OEMs such as " + ", ".join(oems[:3]) + "."
-
-    # sentence 3 (sectors + countries)
-    s3 = ""
-    if sectors and countries:
-        s3 = f"Track record across {', '.join(sectors[:3])} projects in {', '.join(countries[:5])}."
-    elif countries:
-        s3 = f"International project exposure in {', '.join(countries[:5])}."
-    elif sectors:
-        s3 = f"Project background spans {', '.join(sectors[:3])}."
-
-    # Merge sentences (3–4 sentences; we have up to 3 deterministic ones)
-    parts = [s for s in [s1, s2, s3] if s]
-    paragraph = " ".join(parts).strip()
-
-    # guard: force third person (no first-person pronouns)
-    if re.search(r'\b(I|my|me|mine)\b', paragraph, re.I):
-        paragraph = re.sub(r'\b(I|my|me|mine)\b', 'the candidate', paragraph, flags=re.I)
-
-    return paragraph
-# ====== /THIRD-PERSON SUMMARY ======
-
-import os, io, re, json, tempfile, hashlib, unicodedata, datetime, time
-from typing import List, Optional, Tuple
+import os, io, json, tempfile, hashlib, time, uuid, zipfile
 import streamlit as st
-import time
-
-# ---------------- Ingestion deps ----------------
-try:
-    import fitz  # PyMuPDF for PDF
-    HAVE_PYMUPDF = True
-except Exception:
-    HAVE_PYMUPDF = False
-
-try:
-    from pdfminer_high_level import extract_text as pdfminer_extract_text  # fallback alias if user has different import
-    HAVE_PDFMINER = True
-except Exception:
-    try:
-        from pdfminer.high_level import extract_text as pdfminer_extract_text
-        HAVE_PDFMINER = True
-    except Exception:
-        HAVE_PDFMINER = False
-
-try:
-    from docx import Document as DocxReader  # python-docx for reading .docx text
-    HAVE_DOXC_READ = True
-except Exception:
-    HAVE_DOXC_READ = False
-
-# ---------------- Word export deps ----------------
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-
-# ---------------- Fonts & layout ----------------
-COLON_TAB_INCH = 1.60  # tab stop for colon alignment
-TOP_FONT = 'Cambria'    # For heading + top identity block
-BODY_FONT = 'Verdana'   # For everything else
-
-# ---------------- Regexes & hints ----------------
-SPACE_RE = re.compile(r"\s+")
-HYPHEN_WRAP_RE = re.compile(r"(\w)-\n(\w)")
-NEWLINE_BULLET_RE = re.compile(r"[\u2022\u25CF\u25A0\u00B7]")
-HEADER_FOOTER_RE = re.compile(r"Page\s+\d+\s+of\s+\d+", re.I)
-EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-PHONE_RE = re.compile(r"(\+?\d[\d \-\(\)]{7,}\d)")
-URL_RE = re.compile(r"(https?://\S+|www\.\S+)", re.I)
-
-ISO_COUNTRIES = ["Afghanistan", "Albania", "Algeria", "Andorra", "Angola", "Antigua and Barbuda", "Argentina", "Armenia", "Australia", "Austria", "Azerbaijan", "Bahamas", "Bahrain", "Bangladesh", "Barbados", "Belarus", "Belgium", "Belize", "Benin", "Bhutan", "Bolivia", "Bosnia and Herzegovina", "Botswana", "Brazil", "Brunei", "Bulgaria", "Burkina Faso", "Burundi", "Cabo Verde", "Cambodia", "Cameroon", "Canada", "Central African Republic", "Chad", "Chile", "China", "Colombia", "Comoros", "Congo", "Costa Rica", "Côte d’Ivoire", "Croatia", "Cuba", "Cyprus", "Czechia", "Democratic Republic of the Congo", "Denmark", "Djibouti", "Dominica", "Dominican Republic", "Ecuador", "Egypt", "El Salvador", "Equatorial Guinea", "Eritrea", "Estonia", "Eswatini", "Ethiopia", "Fiji", "Finland", "France", "Gabon", "Gambia", "Georgia", "Germany", "Ghana", "Greece", "Grenada", "Guatemala", "Guinea", "Guinea-Bissau", "Guyana", "Haiti", "Honduras", "Hungary", "Iceland", "India", "Indonesia", "Iran", "Iraq", "Ireland", "Israel", "Italy", "Jamaica", "Japan", "Jordan", "Kazakhstan", "Kenya", "Kiribati", "Korea, North", "Korea, South", "Kuwait", "Kyrgyzstan", "Laos", "Latvia", "Lebanon", "Lesotho", "Liberia", "Libya", "Liechtenstein", "Lithuania", "Luxembourg", "Madagascar", "Malawi", "Malaysia", "Maldives", "Mali", "Malta", "Marshall Islands", "Mauritania", "Mauritius", "Mexico", "Micronesia", "Moldova", "Monaco", "Mongolia", "Montenegro", "Morocco", "Mozambique", "Myanmar", "Namibia", "Nauru", "Nepal", "Netherlands", "New Zealand", "Nicaragua", "Niger", "Nigeria", "North Macedonia", "Norway", "Oman", "Pakistan", "Palau", "Panama", "Papua New Guinea", "Paraguay", "Peru", "Philippines", "Poland", "Portugal", "Qatar", "Romania", "Russia", "Rwanda", "Saint Kitts and Nevis", "Saint Lucia", "Saint Vincent and the Grenadines", "Samoa", "San Marino", "Sao Tome and Principe", "Saudi Arabia", "Senegal", "Serbia", "Seychelles", "Sierra Leone", "Singapore", "Slovakia", "Slovenia", "Solomon Islands", "Somalia", "South Africa", "South Sudan", "Spain", "Sri Lanka", "Sudan", "Suriname", "Sweden", "Switzerland", "Syria", "Taiwan", "Tajikistan", "Tanzania", "Thailand", "Timor-Leste", "Togo", "Tonga", "Trinidad and Tobago", "Tunisia", "Turkey", "Turkmenistan", "Tuvalu", "Uganda", "Ukraine", "United Arab Emirates", "United Kingdom", "United States", "Uruguay", "Uzbekistan", "Vanuatu", "Vatican City", "Venezuela", "Vietnam", "Yemen", "Zambia", "Zimbabwe", "Hong Kong", "Macau", "Palestine"]
-ALIAS_TO_COUNTRY = {"UK": "United Kingdom", "Great Britain": "United Kingdom", "GB": "United Kingdom", "UAE": "United Arab Emirates", "U.A.E": "United Arab Emirates", "U.A.E.": "United Arab Emirates", "USA": "United States", "U.S.A": "United States", "U.S.A.": "United States", "US": "United States", "U.S.": "United States", "United States of America": "United States", "KSA": "Saudi Arabia", "PRC": "China", "People's Republic of China": "China", "Mainland China": "China", "South Korea": "Korea, South", "Republic of Korea": "Korea, South", "ROK": "Korea, South", "North Korea": "Korea, North", "DPRK": "Korea, North", "Czech Republic": "Czechia", "Ivory Coast": "Côte d’Ivoire", "Cote d'Ivoire": "Côte d’Ivoire", "Burma": "Myanmar", "Lao PDR": "Laos", "Viet Nam": "Vietnam", "Russian Federation": "Russia", "Swaziland": "Eswatini", "Cape Verde": "Cabo Verde", "Taipei, Taiwan": "Taiwan"}
-COUNTRY_HINTS = ISO_COUNTRIES  # keep prior inference paths working
-LANG_HINTS = ["English","Thai","Hindi","Malay","Tamil","Arabic","Italian","French","German","Spanish","Chinese","Cantonese","Mandarin","Vietnamese","Korean","Japanese"]
-OEM_HINTS = ["Herrenknecht","Robbins","Terratec","CREG","Iseki","RASA","Kawasaki","Hitachi Zosen"]
-
-MONTHS = ["JAN","FEB","MAR","APR","MAY","JUN","JUL","AUG","SEP","OCT","NOV","DEC"]
-MONTH_MAP = {m:i+1 for i,m in enumerate(MONTHS)}
-
-# ---------------- Utils ----------------
-@st.cache_data(show_spinner=False)
-def _extract_text_pymupdf(b: bytes) -> str:
-    try:
-        import fitz as _fitz
-        doc = _fitz.open(stream=b, filetype="pdf")
-        return "\n".join(p.get_text("text") for p in doc)
-    except Exception:
-        return ""
-
-@st.cache_data(show_spinner=False)
-def _extract_text_pdfminer(b: bytes) -> str:
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-            tmp.write(b); tmp.flush(); path = tmp.name
-        try:
-            return pdfminer_extract_text(path) or ""
-        finally:
-            try: os.unlink(path)
-            except Exception: pass
-    except Exception:
-        return ""
-
-def _extract_text_docx(b: bytes) -> str:
-    if not HAVE_DOXC_READ: return ""
-    from docx import Document as _Doc
-    with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as tmp:
-        tmp.write(b); tmp.flush(); path = tmp.name
-    try:
-        d = _Doc(path)
-        texts = []
-        for p in d.paragraphs:
-            texts.append(p.text)
-        for tbl in d.tables:
-            for row in tbl.rows:
-                texts.append(" | ".join([c.text for c in row.cells]))
-        return "\n".join(texts)
-    except Exception:
-        return ""
-    finally:
-        try: os.unlink(path)
-        except Exception: pass
-
-def extract_text_any(uploaded_file) -> str:
-    name = uploaded_file.name.lower()
-    data = uploaded_file.getvalue()
-    if name.endswith(".pdf"):
-        txt = ""
-        if HAVE_PYMUPDF:
-            txt = _extract_text_pymupdf(data)
-        if (not txt or len(txt.strip()) < 100) and HAVE_PDFMINER:
-            txt = _extract_text_pdfminer(data)
-        return (txt or "").strip()
-    elif name.endswith(".docx"):
-        return (_extract_text_docx(data) or "").strip()
-    else:
-        return ""
-
-def canonical_symbols(s: str) -> str:
-    s = s.replace("\u2300","Ø").replace("⌀","Ø").replace("Φ","Ø").replace("φ","Ø")
-    s = re.sub(r"\b[Dd][Ii][Aa]\.?", " Ø ", s)
-    return s
-
-def canonicalize_text(raw: str) -> str:
-    s = unicodedata.normalize("NFKC", raw or "")
-    s = HEADER_FOOTER_RE.sub(" ", s)
-    s = NEWLINE_BULLET_RE.sub(" • ", s)
-    s = HYPHEN_WRAP_RE.sub(r"\1\2", s)
-    s = canonical_symbols(s)
-    s = s.replace("\r","")
-    s = SPACE_RE.sub(" ", s)
-    return s.strip()
-
-def strip_pii(s: str) -> str:
-    s = EMAIL_RE.sub("[REDACTED_EMAIL]", s)
-    s = PHONE_RE.sub("[REDACTED_PHONE]", s)
-    s = URL_RE.sub("[REDACTED_URL]", s)
-    return s
-
-TBM_TERMS = ["tbm operator","tbm pilot","epb","slurry","mixshield","herrenknecht","robbins","terratec","creg","natm","drill & blast","drill and blast"]
-def role_from_text(t: str) -> str:
-    tl = t.lower()
-    if sum(tl.count(k) for k in TBM_TERMS) > 0:
-        return "TBM OPERATOR"
-    return "Tunneling Professional"
-
-
-def _fmt_period(s: Optional[str]) -> str:
-    """Normalize to 'Month YYYY'. Accept 'YYYY-MM', 'MM/YYYY', 'Mon YYYY', 'Present'."""
-    import calendar, re
-    if not s or s in ["-","null","None"]:
-        return "-"
-    s = str(s).strip()
-    if re.search(r"present|current|ongoing", s, re.I):
-        return "Present"
-    m = re.match(r"^(\d{4})[-/](\d{1,2})$", s)  # YYYY-MM
-    if m:
-        y, mo = int(m.group(1)), int(m.group(2))
-        mo = calendar.month_name[mo] if 1 <= mo <= 12 else "--"
-        return f"{mo} {y}"
-    m = re.match(r"^(\d{1,2})[-/](\d{4})$", s)  # MM/YYYY
-    if m:
-        mo, y = int(m.group(1)), int(m.group(2))
-        mo = calendar.month_name[mo] if 1 <= mo <= 12 else "--"
-        return f"{mo} {y}"
-    m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", s)  # Mon YYYY or Month YYYY
-    if m:
-        token = m.group(1)
-        try:
-            from calendar import month_name, month_abbr
-            lookup = {ab.lower():month_name[i] for i,ab in enumerate(month_abbr) if ab}
-            lookup.update({mn.lower():mn for mn in month_name if mn})
-            return f"{lookup.get(token.lower(), token.title())} {m.group(2)}"
-        except Exception:
-            return f"{token.title()} {m.group(2)}"
-    return s
-
-def _parse_to_key(s: Optional[str]) -> Tuple[int,int,int]:
-    if not s: return (0,0,0)
-    ss = str(s).strip()
-    if re.search(r"present|current|ongoing", ss, re.I): return (9999,12,1)
-    m = re.match(r"^(\d{4})[-/](\d{1,2})$", ss)
-    if m: return (int(m.group(1)), int(m.group(2)), 0)
-    m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", ss)
-    if m:
-        y=int(m.group(2)); mo=MONTH_MAP.get(m.group(1)[:3].upper(), 12)
-        return (y, mo, 0)
-    m = re.search(r"(\d{4})", ss)
-    if m: return (int(m.group(1)), 12, 0)
-    return (0,0,0)
-
-def sort_work(work: List[dict]) -> List[dict]:
-    return sorted(work or [], key=lambda x: _parse_to_key(x.get("to")), reverse=True)
-
-def months_to_ym(m) -> str:
-    try: m=int(float(m))
-    except Exception: return "0m"
-    if m<=0: return "0m"
-    y=m//12; mo=m%12
-    return (f"{y}y " if y else "") + (f"{mo}m" if mo else "")
-
-# ------- Identity helpers -------
-def infer_identity(text: str, position_fallback: str) -> dict:
-    name_initials = "—"
-    m = re.search(r"\b([A-Z])[a-zA-Z]+\s+([A-Z])[a-zA-Z]+", text)
-    if m: name_initials = f"{m.group(1)}.{m.group(2)}."
-    nat = "—"
-    for c in COUNTRY_HINTS:
-        if re.search(r"\b"+c+r"\b", text, re.I): nat = c.replace("\\",""); break
-    langs_found = [L for L in LANG_HINTS if re.search(r"\b"+L+r"\b", text, re.I)]
-    yob = "-"
-    m = re.search(r"\b(19|20)\d{2}\b", text)
-    if m: yob = m.group(0)
-    return {
-        "name_initials": name_initials,
-        "position": position_fallback,
-        "nationality": nat,
-        "languages": langs_found or ["English"],
-        "year_of_birth": yob,
-        "total_experience_months": 0
-    }
-
-DIAM_MM_RE = re.compile(r"\b(?:Ø|diam(?:eter)?|dia)\s*([0-9]{3,5})\s*mm\b", re.I)
-DIAM_M_RE  = re.compile(r"\b(?:Ø|diam(?:eter)?|dia)\s*([0-9]+(?:\.[0-9]+)?)\s*m\b", re.I)
-
-def _diameters_m(text: str) -> List[float]:
-    mm = [float(x)/1000.0 for x in DIAM_MM_RE.findall(text)]
-    m  = [float(x) for x in DIAM_M_RE.findall(text)]
-    return sorted(set([round(v,2) for v in mm+m]), reverse=True)
-
-def _oems(text: str) -> List[str]:
-    found = []
-    for o in OEM_HINTS:
-        if re.search(r"\b"+re.escape(o)+r"\b", text, re.I):
-            found.append(o)
-    return sorted(set(found))
-
-
-def _countries(text: str) -> list:
-    # ISO coverage + aliases; case-insensitive whole-word-ish matching.
-    t = text or ""
-    found = set()
-    # Normalize common dotted abbreviations
-    norm = t.replace("U.A.E.", "UAE").replace("U.S.A.", "USA")
-    # 1) alias matches
-    for alias, canonical in ALIAS_TO_COUNTRY.items():
-        pat = r'(?<![A-Za-z])' + re.escape(alias) + r'(?![A-Za-z])'
-        if re.search(pat, norm, flags=re.IGNORECASE):
-            found.add(canonical)
-    # 2) direct ISO country names
-    for cname in ISO_COUNTRIES:
-        pat = r'(?<![A-Za-z])' + re.escape(cname) + r'(?![A-Za-z])'
-        if re.search(pat, norm, flags=re.IGNORECASE):
-            found.add(cname)
-    return sorted(found)
-
-
-def _parse_date_any(s: Optional[str]) -> Optional[datetime.date]:
-    if not s: return None
-    s = str(s).strip()
-    if re.search(r"present|current|ongoing", s, re.I):
-        today = datetime.date.today()
-        return datetime.date(today.year, today.month, 1)
-    m = re.match(r"^(\d{4})[-/](\d{1,2})$", s)
-    if m:
-        return datetime.date(int(m.group(1)), int(m.group(2)), 1)
-    m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", s)
-    if m:
-        mo = MONTH_MAP.get(m.group(1)[:3].upper(), 1)
-        return datetime.date(int(m.group(2)), mo, 1)
-    m = re.search(r"(\d{4})", s)
-    if m:
-        return datetime.date(int(m.group(1)), 1, 1)
-    return None
-
-def _dur_ym(a: Optional[str], b: Optional[str]) -> str:
-    da = _parse_date_any(a); db = _parse_date_any(b)
-    if not da or not db: return ""
-    total = (db.year - da.year)*12 + (db.month - da.month)
-    if total < 0: total = 0
-    y = total // 12; mo = total % 12
-    if y and mo: return f"{y}y {mo}m"
-    if y: return f"{y}y"
-    if mo: return f"{mo}m"
-    return "0m"
-
-# -------- Evidence-gated METHOD detection (project-local) --------
-
-CANON_METHODS = [
-    "EPB","SLURRY","MIXSHIELD","NATM","DRILL & BLAST","HARD ROCK","OPEN TBM","SINGLE SHIELD","DOUBLE SHIELD","MICROTUNNELLING","ROADHEADER","RAISE BORING"
-]
-
-NAME_SYNONYMS = {
-    "EPB": [r"epb\b", r"earth\s*pressure\s*balance", r"epbm\b"],
-    "SLURRY": [r"\bslurry\b(?!.*mix)", r"slurry\s*(shield|tbm)", r"bentonite"],
-    "MIXSHIELD": [r"mix[-\s]?shield", r"mixshield"],
-    "NATM": [r"\bnatm\b", r"\bsem\b", r"sprayed\s*concrete\s*lining", r"\bscl\b"],
-    "DRILL & BLAST": [r"\bdrill(?:\s*&\s*| and )blast\b", r"\bd&b\b"],
-    "HARD ROCK": [r"hard[-\s]?rock\s*(tbm)?"],
-    "OPEN TBM": [r"open\s*(mode|face)\s*tbm", r"\bopen\s*mode\b"],
-    "SINGLE SHIELD": [r"single\s*shield"],
-    "DOUBLE SHIELD": [r"double\s*shield"],
-    "MICROTUNNELLING": [r"\bmicrotunnel", r"\bmtbm\b", r"\bavn\b", r"pipe\s*jacking"],
-    "ROADHEADER": [r"\broadheader\b", r"boom\s*header"],
-    "RAISE BORING": [r"raise\s*bor(e|ing)"]
-}
-
-TRAIT_SYNONYMS = {
-    "EPB": [r"face\s*pression|face\s*pressure", r"screw\s*conveyor", r"foam|polymer", r"bulkhead"],
-    "SLURRY": [r"separation\s*plant", r"slurry\s*density|viscosity", r"bentonite", r"slurry\s*pump"],
-    "MIXSHIELD": [r"air\s*cushion", r"submerged\s*wall", r"compressed\s*air"],
-    "NATM": [r"shotcrete", r"lattice\s*girder", r"rock\s*bolt", r"convergence\s*monitor"],
-    "DRILL & BLAST": [r"charging", r"initiation", r"stemming", r"blast\s*round"],
-    "HARD ROCK": [r"disc\s*cutter", r"penetration\s*rate", r"torque|thrust", r"abrasiv"],
-    "OPEN TBM": [r"gripper\s*pads?", r"no\s*pressure\s*control", r"immediate\s*support"],
-    "SINGLE SHIELD": [r"shield\s*tail", r"annular\s*grout|tail\s*grout", r"thrust\s*jacks"],
-    "DOUBLE SHIELD": [r"telescopic\s*shield", r"simultaneous\s*excavation", r"gripper\s*mode"],
-    "MICROTUNNELLING": [r"jacking\s*frame", r"intermediate\s*jacking", r"guidance\s*system"],
-    "ROADHEADER": [r"cutter\s*picks?", r"boom", r"profil(?:e|ing)"],
-    "RAISE BORING": [r"pilot\s*hole", r"ream(?:er|ing)"]
-}
-
-def _regex_any(patterns: List[str]):
-    return re.compile("|".join(f"(?:{p})" for p in patterns), re.I)
-
-NAME_REGEX = {k: _regex_any(v) for k,v in NAME_SYNONYMS.items()}
-TRAIT_REGEX = {k: _regex_any(v) for k,v in TRAIT_SYNONYMS.items()}
-
-SPECIFICITY = {"MIXSHIELD":3,"SLURRY":2,"EPB":2,"SINGLE SHIELD":2,"DOUBLE SHIELD":2,"OPEN TBM":2,"NATM":2,"DRILL & BLAST":2,"HARD ROCK":2,"MICROTUNNELLING":2,"ROADHEADER":2,"RAISE BORING":2}
-
-def detect_method_project_local(text: str) -> Optional[str]:
-    if not text or not text.strip():
-        return None
-    scores = []
-    for label in CANON_METHODS:
-        name_hit = bool(NAME_REGEX.get(label, re.compile(r"$^")).search(text))
-        trait_hit = bool(TRAIT_REGEX.get(label, re.compile(r"$^")).search(text))
-        score = 2 if (name_hit and trait_hit) else (1 if name_hit else 0)
-        if score > 0:
-            scores.append((score, SPECIFICITY.get(label,1), label))
-    if not scores:
-        return None
-    scores.sort(reverse=True)
-    best = scores[0][2]
-    if best == "SLURRY":
-        if any(lab == "MIXSHIELD" and sc >= scores[0][0] for sc,sp,lab in scores):
-            best = "MIXSHIELD"
-    return best
-
-# -------- Bullets rewrite (sentence-aware, soft 18-40 words target, 3-6 bullets) --------
-
-ADMIN_NOISE = re.compile(r"\b(email|microsoft (office|windows)|excel|word|ppt|powerpoint|outlook|generic reporting|documentation)\b", re.I)
-TUNNEL_SIGNALS = re.compile(r"\b(EPB|slurry|mix[- ]?shield|NATM|drill(?:\s*&\s*blast| and blast)|ring build|VMT|foam|polymer|face pressure|screw conveyor|hyperbaric|cutterhead|convergence|shotcrete|rock bolt|separation plant|slurry density|viscosity|settlement|annular grout|thrust|torque|advance rate|downtime)\b", re.I)
-
-CONJ_SPLIT = re.compile(r"\s+(and|which|that|while|whereas|as well as)\s+", re.I)
-
-def _normalize_whitespace(s: str) -> str:
-    return SPACE_RE.sub(" ", (s or "")).strip(" .;,-")
-
-def _word_count(s: str) -> int:
-    return 0 if not s else len(_normalize_whitespace(s).split())
-
-def _split_long_sentence(s: str, max_words=42) -> List[str]:
-    s = _normalize_whitespace(s)
-    if _word_count(s) <= max_words:
-        return [s]
-    # heuristic split
-    tokens = s.split()
-    mid = len(tokens)//2
-    return [" ".join(tokens[:mid]), " ".join(tokens[mid:])]
-
-def rewrite_project_bullets(raw_bullets: List[str]) -> List[str]:
-    # Evidence-only, grammar-preserving bullets. Target 18-40 words; 3-6 bullets.
-    cleaned = []
-    for b in raw_bullets or []:
-        t = _normalize_whitespace(str(b))
-        if not t:
-            continue
-        if ADMIN_NOISE.search(t) and not re.search(r"\b(RAMS|permit|confined|hyperbaric|H2S|CH4|gas|TBM rescue)\b", t, re.I):
-            continue
-        parts = _split_long_sentence(t, max_words=42)
-        for p in parts:
-            if _word_count(p) < 8:
-                continue
-            cleaned.append(p)
-
-    # de-dup (case-insensitive)
-    dedup = []
-    seen = set()
-    for x in cleaned:
-        k = _normalize_whitespace(x).lower()
-        if k in seen: 
-            continue
-        seen.add(k)
-        dedup.append(x)
-
-    def score(x: str):
-        has_sig = 1 if TUNNEL_SIGNALS.search(x) else 0
-        has_num = 1 if re.search(r"\d", x) else 0
-        wc = _word_count(x)
-        length_penalty = abs(wc - 28)  # center near 28 words
-        return (-has_sig, -has_num, length_penalty, len(x))
-
-    dedup.sort(key=score)
-    return dedup[:6] if len(dedup) >= 6 else dedup
-
-# -------- Summary paragraph (richer: 2-3 sentences) --------
-
-
-
-def build_summary_paragraph(full_text: str, work: List[dict], ident: dict) -> str:
-    """LLM-written, tunnelling-HR paragraph (3–4+ sentences), using ONE primary role and years-only experience.
-       Falls back to deterministic paragraph if the LLM is unavailable or violates rules.
-    """
-    import re, json
-
-    # --- helper: canonicalise and choose ONE primary role ---
-    role_syn = {
-        "tbm pilot": "TBM Operator",
-        "tbm op": "TBM Operator",
-        "tbm operator": "TBM Operator",
-        "shift engineer": "TBM Shift Engineer",
-        "tbm shift engineer": "TBM Shift Engineer",
-        "natm engineer": "NATM Engineer",
-        "scl engineer": "NATM Engineer",
-        "blasting engineer": "Blasting Engineer",
-        "blast engineer": "Blasting Engineer",
-        "tunnelling engineer": "Tunnel Engineer",
-        "tunnel engineer": "Tunnel Engineer",
-        "senior tunnel engineer": "Senior Tunnel Engineer",
-        "site engineer": "Tunnel Site Engineer",
-        "geotechnical engineer": "Geotechnical Engineer",
-        "construction manager": "Construction Manager",
-        "tunnel construction manager": "Tunnel Construction Manager",
-        "project manager": "Project Manager",
-        "project director": "Project Director"
-    }
-    seniority_order = [
-        "Project Director",
-        "Construction Manager",
-        "Tunnel Construction Manager",
-        "Project Manager",
-        "Senior Tunnel Engineer",
-        "NATM Engineer",
-        "TBM Shift Engineer",
-        "Geotechnical Engineer",
-        "Tunnel Site Engineer",
-        "Tunnel Engineer",
-        "TBM Operator",
-    ]
-    rank = {r:i for i,r in enumerate(seniority_order)}
-
-    def norm_role(r):
-        rl = (r or "").strip()
-        low = rl.lower()
-        return role_syn.get(low, rl)
-
-    # parse dates for recency scoring
-    def _parse_date_any(sv):
-        if not sv: return None
-        sv = str(sv).strip()
-        if re.search(r"present|current|ongoing", sv, re.I):
-            today = datetime.date.today()
-            return datetime.date(today.year, today.month, 1)
-        m = re.match(r"^(\d{4})[-/](\d{1,2})$", sv)
-        if m:
-            return datetime.date(int(m.group(1)), int(m.group(2)), 1)
-        m = re.match(r"^([A-Za-z]{3,9})\s+(\d{4})$", sv)
-        if m:
-            MONTH_MAP = {"JAN":1,"FEB":2,"MAR":3,"APR":4,"MAY":5,"JUN":6,"JUL":7,"AUG":8,"SEP":9,"OCT":10,"NOV":11,"DEC":12}
-            mo = MONTH_MAP.get(m.group(1)[:3].upper(), 1)
-            return datetime.date(int(m.group(2)), mo, 1)
-        m = re.search(r"(\d{4})", sv)
-        if m:
-            return datetime.date(int(m.group(1)), 1, 1)
-        return None
-
-    roles = []
-    for it in work or []:
-        r = norm_role(it.get("role",""))
-        if r: roles.append((r, _parse_date_any(it.get("to")), _parse_date_any(it.get("from"))))
-    # choose best: seniority -> recency -> frequency
-    if roles:
-        # frequency map
-        freq = {}
-        for r,_,_ in roles:
-            freq[r] = freq.get(r,0)+1
-        # pick max by (seniority rank, recency date, frequency)
-        def key_fn(tup):
-            r, to, _ = tup
-            s_rank = -(100 - rank.get(r, 100))  # lower better; invert for max
-            rec = to or datetime.date(1900,1,1)
-            return (s_rank, rec, freq.get(r,0))
-        best = max(roles, key=key_fn)[0]
-        primary_role = best
-    else:
-        primary_role = ident.get("position") or "Tunnelling Professional"
-
-    # --- collect evidence from work blocks (evidence-only) ---
-    DIAM_MM_RE = re.compile(r"\b(?:Ø|diam(?:eter)?|dia)\s*([0-9]{3,5})\s*mm\b", re.I)
-    DIAM_M_RE  = re.compile(r"\b(?:Ø|diam(?:eter)?|dia)\s*([0-9]+(?:\.[0-9]+)?)\s*m\b", re.I)
-    OEM_HINTS = ["Herrenknecht","Robbins","Terratec","CREG","Iseki","RASA","Kawasaki","Hitachi Zosen"]
-    # recognise but do not force—presence only if text contains it
-    METHOD_HINTS = [
-        "EPB","SLURRY","MIXSHIELD","SINGLE SHIELD","DOUBLE SHIELD",
-        "OPEN TBM","HARD ROCK","MICROTUNNELLING","NATM","DRILL & BLAST","SCL"
-    ]
-    COUNTRY_HINTS = [
-        "Qatar","U\\.A\\.E","UAE","United Arab Emirates","Bahrain","Saudi","Oman","Kuwait",
-        "Malaysia","Thailand","Singapore","Italy","India","Australia","United Kingdom","UK",
-        "Germany","France","Spain","Turkey","Indonesia","Philippines","Vietnam","China",
-        "Hong Kong","Taiwan","Japan","Korea","Norway","Poland"
-    ]
-
-    def _diameters_m(blob):
-        mm = [float(x)/1000.0 for x in DIAM_MM_RE.findall(blob)]
-        m  = [float(x) for x in DIAM_M_RE.findall(blob)]
-        return sorted(set([round(v,2) for v in (mm+m)]))
-
-    methods, oems, diams, countries = [], [], [], []
-    sectors = set()
-
-    for item in work or []:
-        role  = str(item.get("role",""))
-        proj  = str(item.get("project",""))
-        place = str(item.get("city_country",""))
-        rb    = [str(b) for b in (item.get("bullets") or []) if b]
-        blob  = " ".join([role, proj, place] + rb)
-
-        for mh in METHOD_HINTS:
-            if re.search(rf"\b{mh}\b", blob, re.I):
-                methods.append(mh)
-        oems.extend([o for o in OEM_HINTS if re.search(rf"\b{o}\b", blob, re.I)])
-        diams.extend(_diameters_m(blob))
-        for c in COUNTRY_HINTS:
-            if re.search(rf"\b{c}\b", blob, re.I):
-                countries.append(c.replace("\\",""))
-        if re.search(r"\bmetro|rail|station\b", blob, re.I): sectors.add("metro/rail")
-        if re.search(r"\bwater|sewage|utility\b", blob, re.I): sectors.add("utility/water")
-        if re.search(r"\bhighway|road\b", blob, re.I): sectors.add("highway")
-        if re.search(r"\bcavern|station box|underground station\b", blob, re.I): sectors.add("caverns/stations")
 
-    # de-dup and trim evidence
-    def _uniq(seq): 
-        out=[]; 
-        [out.append(x) for x in seq if x not in out]; 
-        return out
-
-    methods   = _uniq(methods)
-    oems      = _uniq(oems)[:3]
-    countries = _uniq(countries)[:6]
-    diams     = sorted(set(diams))
-    years_total = ident.get("total_experience_months") or 0
-    try:
-        years_total = int(float(years_total))
-    except Exception:
-        years_total = 0
-    years = years_total // 12
-    rem = years_total % 12
-    years_phrase = f"over {years} years" if rem >= 6 and years>0 else (f"{years} years" if years>0 else "years")
-
-    # --- LLM prompt (tunnelling HR persona) ---
-    evidence = {
-        "primary_role": primary_role,
-        "total_experience_months": years_total,
-        "methods": methods,
-        "diameters_m": diams,
-        "oems": oems,
-        "sectors": sorted(list(sectors)),
-        "countries": countries,
-        "years_phrase_hint": years_phrase
-    }
-    prompt = (
-        "You are a tunnelling HR specialist. Write a single-paragraph 'Summary of Experience' with UK spelling.\n"
-        "Length 3–4 sentences by default; go longer only if the evidence is rich.\n"
-        "Use only the facts provided; do not invent roles, methods, diameters, OEMs, sectors, or locations.\n"
-        "Use the exact primary_role; state years of experience (not months): say 'over X years' if ≥6 extra months, else 'X years'.\n"
-        "If present in evidence, mention methods (EPB, slurry, Mixshield, single/double-shield, NATM/SCL, drill-and-blast), "
-        "diameters (e.g., 'Ø 6–11 m' or 'up to Ø 11 m'), top OEMs (≤3), sectors/assets (metro/rail, water/utility, highway, station caverns/shafts), and countries/regions.\n"
-        f"Evidence JSON: {json.dumps(evidence, ensure_ascii=False)}\n"
-        "Output: one paragraph, no bullets, no headers."
-    )
-
-    # --- Try LLM if provider+api_key exist; fallback to deterministic paragraph ---
-    try:
-        if 'provider' in globals() and 'api_key' in globals() and api_key:
-            if str(globals().get('provider','')).startswith("OpenAI"):
-                from openai import OpenAI
-                client = OpenAI(api_key=api_key)
-                mdl = globals().get('model') or globals().get('pick') or "gpt-4o-mini"
-                resp = client.chat.completions.create(
-                    model=mdl,
-                    messages=[{"role":"user","content":prompt}],
-                    temperature=0.2
-                )
-                text = (resp.choices[0].message.content or "").strip()
-            else:
-                import google.generativeai as genai
-                genai.configure(api_key=api_key)
-                mdl = globals().get('model') or globals().get('pick') or "gemini-2.5-flash"
-                gmodel = genai.GenerativeModel(mdl)
-                # simple RPM guard
-                time.sleep(0.12)  # ~8–9 rpm; user asked cap 10 rpm globally
-                resp = gmodel.generate_content(prompt, generation_config={"temperature":0.2})
-                text = (resp.text or "").strip()
-            # guardrails
-            bad = (not text) or ("\n•" in text) or ("\n-" in text) or (len(text.split()) < 25)
-            if not bad:
-                return text
-    except Exception:
-        pass
-
-    # fallback: deterministic paragraph similar to previous version
-    # (short, evidence-only)
-    parts = []
-    if years>0:
-        parts.append(f"{primary_role} with {years_phrase} in tunnelling.")
-    else:
-        parts.append(f"{primary_role} in tunnelling.")
-    if methods:
-        parts.append("Experience with " + ", ".join(m for m in methods[:4]) + ".")
-    if diams:
-        dmin, dmax = min(diams), max(diams)
-        if dmin != dmax:
-            parts.append(f"Worked across diameters Ø {dmin:.0f}–{dmax:.0f} m.")
-        else:
-            parts.append(f"Worked up to Ø {dmax:.0f} m.")
-    if oems:
-        parts.append("OEMs: " + ", ".join(oems) + ".")
-    if countries:
-        parts.append("Countries: " + ", ".join(countries) + ".")
-    if sectors:
-        parts.append("Sectors: " + ", ".join(sorted(sectors)) + ".")
-    return " ".join(parts)
-
-def _clear_body(doc: Document):
-    for para in list(doc.paragraphs):
-        p = para._element; p.getparent().remove(p)
-    for tbl in list(doc.tables):
-        t = tbl._element; t.getparent().remove(t)
-
-def _add_heading(doc: Document, text: str, size=16, bold=True, italic=True, align_center=True):
-    p=doc.add_paragraph()
-    r=p.add_run(str(text))
-    r.font.name = TOP_FONT
-    r.font.size = Pt(size)
-    r.bold = bold
-    r.italic = italic
-    if align_center: p.alignment = 1
-    return p
-
-def _add_bold_line(doc: Document, text, size=10):
-    p=doc.add_paragraph()
-    r=p.add_run(str(text))
-    r.bold=True
-    r.font.name = BODY_FONT
-    r.font.size = Pt(size)
-
-def _add_text(doc: Document, text, size=10):
-    p=doc.add_paragraph()
-    r=p.add_run(str(text))
-    r.font.name = BODY_FONT
-    r.font.size = Pt(size)
-
-def _add_bullet(doc: Document, text, size=10):
-    try:
-        p = doc.add_paragraph(style='List Bullet')
-        r = p.add_run(str(text))
-    except Exception:
-        p = doc.add_paragraph()
-        try: 
-            p.paragraph_format.left_indent = Inches(0.25)
-        except Exception: 
-            pass
-        r = p.add_run("• " + str(text))
-    r.font.name = BODY_FONT
-    r.font.size = Pt(size)
-
-def _add_horizontal_rule(doc: Document):
-    p = doc.add_paragraph()
-    p_par = p._element
-    p_pr = p_par.get_or_add_pPr()
-    p_borders = OxmlElement('w:pBdr')
-    bottom = OxmlElement('w:bottom')
-    bottom.set(qn('w:val'), 'single')
-    bottom.set(qn('w:sz'), '8')
-    bottom.set(qn('w:space'), '1')
-    bottom.set(qn('w:color'), '000000')
-    p_borders.append(bottom)
-    p_pr.append(p_borders)
-
-def _add_identity_line(doc: Document, label: str, value: str, tab_pos_in=COLON_TAB_INCH):
-    p = doc.add_paragraph()
-    pf = p.paragraph_format
-    pf.left_indent = Pt(0); pf.first_line_indent = Pt(0)
-    pf.space_before = Pt(0); pf.space_after = Pt(0)
-    pf.line_spacing = 1.0
-
-    pPr = p._p.get_or_add_pPr()
-    tabs = pPr.find(qn('w:tabs'))
-    if tabs is None:
-        tabs = OxmlElement('w:tabs'); pPr.append(tabs)
-    tab = OxmlElement('w:tab')
-    tab.set(qn('w:val'), 'left')
-    tab.set(qn('w:pos'), str(int(tab_pos_in * 1440)))
-    tab.set(qn('w:leader'), 'underscore')
-    tabs.append(tab)
-
-    r1 = p.add_run(label + " ")
-    r1.font.name = TOP_FONT; r1.font.size = Pt(10); r1.bold = True
-
-    rtab = p.add_run('\t')
-    rtab.font.name = TOP_FONT; rtab.font.size = Pt(10); rtab.bold = True
-
-    r2 = p.add_run(': ')
-    r2.font.name = TOP_FONT; r2.font.size = Pt(10); r2.bold = True
-
-    r3 = p.add_run(str(value))
-    r3.font.name = TOP_FONT; r3.font.size = Pt(10); r3.bold = True
-
-def _add_top_identity_paragraphs(doc: Document, pos: str, name_i: str, nat: str, langs: str, yob: str, exp: str):
-    labels = ["POSITION","NAME","NATIONALITY","LANGUAGES","YEAR OF BIRTH","EXPERIENCE"]
-    values = [pos, name_i, nat, langs, yob, exp]
-    for L, V in zip(labels, values):
-        _add_identity_line(doc, L, V, tab_pos_in=COLON_TAB_INCH)
-        doc.add_paragraph("")  # blank line under each label line
+from cv_pipeline import (
+    extract_text_any, canonicalize_text, strip_pii, build_payload,
+    sanitize_cv_json, ensure_schema, cv_facts, upload_key, DEFAULT_TEMPLATE_PATH,
+)
+from cv_render_pool import RenderPool, renderer, default_workers, default_backend, RENDER_WORKERS_ENV, RENDER_BACKENDS
+import cv_index, cv_rank
+from cv_pagefilter import filter_cv_text, describe_filter
+from cv_ingest import iter_cvs, describe_skipped, docx_arcname
+from cv_export import BatchExport, EXPORT_STEM, build_record, csv_text, jsonl_line
+from cv_usage import UsageLog, by_model, describe_usage, totals
+from cv_profile import RunProfiler, profile_default
 
 # -------- LLM plumbing --------
-
-def _strong_prompt() -> str:
-    return (
-        "You are a specialized HR in the tunneling industry. "
-        "Return STRICT JSON with keys exactly:\n"
-        "identity: { name_initials, position, nationality, languages[], year_of_birth, total_experience_months }\n"
-        "profile_summary: short paragraph (2-4 lines) summarizing seniority, key methods (EPB/Slurry/Mixshield/NATM/Hard Rock/Open TBM/Shield/Drill & Blast), diameters, TBM OEMs, and countries.\n"
-        "work_experiences: array of { from:'YYYY-MM'|Mon YYYY|'-', to:'YYYY-MM'|Mon YYYY|'Present', role, project, city_country, bullets[] }\n"
-        "education: string[] or objects with degree/institution/city_country/year\n"
-        "skills: string[]\n"
-        "courses: string[]\n"
-        "Constraints: redact PII; initials for names; use '-' for unknown; do not include extra text outside JSON."
-    )
-
-def call_gemini_json(api_key: str, model: str, payload: dict) -> dict:
-    import google.generativeai as genai, json as _json, re as _re
-    genai.configure(api_key=api_key)
-    gmodel = genai.GenerativeModel(model)
-    resp = gmodel.generate_content(
-        _strong_prompt() + "\nINPUT:\n" + json.dumps(payload, ensure_ascii=False),
-        generation_config={"temperature": 0, "response_mime_type":"application/json"}
-    )
-    out = resp.text or "{}"
-    try:
-        return _json.loads(out)
-    except Exception:
-        m = _re.search(r"(\{.*\})", out, _re.S)
-        return _json.loads(m.group(1)) if m else {}
-
-def call_openai_json(api_key: str, model: str, payload: dict) -> dict:
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{"role":"system","content":_strong_prompt()},
-                  {"role":"user","content": json.dumps(payload, ensure_ascii=False)}],
-        response_format={"type":"json_object"},
-        temperature=0
-    )
-    return json.loads(resp.choices[0].message.content or "{}")
+# Provider settings and call policy, model routing, request packing and the worker-service client
+from cv_llm_client import Provider, CallPolicy, DEFAULT_MODELS, API_KEY_ENVS
+from cv_router import RoutingConfig, TierStats, describe_call, STRONG_MODELS
+from cv_pack import PackConfig, PackItem, PackResult, Packer, call_pack, packable
+from cv_worker_service import WorkerClient, WORKER_URL_ENV, batch_options, ensure_local_service
 
 # ------------------ APP UI ------------------
 st.set_page_config(page_title="CV Summary → DOCX Template", layout="wide")
@@ -944,297 +39,62 @@ else:
     pick = st.sidebar.selectbox("Model", models, index=0, key="model_pick")
     model = st.sidebar.text_input("Custom model name", value="", key="custom_model_name") if pick == "Custom..." else pick
 
+_primary_name = "gemini" if provider.startswith("Google") else "openai"
+auto_route = st.sidebar.checkbox("Auto-route fast/strong models", value=False, key="auto_route",
+                                 help="Model above handles short, simple CVs; long or table-heavy ones (or fast answers that fail schema checks) go to the strong model.")
+if auto_route:
+    strong_model = st.sidebar.text_input("Strong model", value=STRONG_MODELS[_primary_name], key="strong_model")
+    with st.sidebar.expander("Routing thresholds"):
+        st.number_input("Max characters for fast model", min_value=1000, max_value=200000, value=RoutingConfig._field_defaults["max_fast_chars"], step=1000, key="route_max_chars")
+        st.slider("Max table-row share", 0.0, 1.0, value=RoutingConfig._field_defaults["max_table_ratio"], step=0.05, key="route_table_ratio")
+        st.number_input("Max roles (date ranges) for fast model", min_value=1, max_value=100, value=RoutingConfig._field_defaults["max_fast_roles"], step=1, key="route_max_roles")
+        st.checkbox("Escalate when the fast answer fails schema checks", value=True, key="route_escalate")
+
+st.sidebar.header("Reliability")
+_fallback_name = "openai" if _primary_name == "gemini" else "gemini"
+use_fallback = st.sidebar.checkbox(f"Fall back to {'OpenAI' if _fallback_name == 'openai' else 'Gemini'} on failure",
+                                   value=bool(os.getenv(API_KEY_ENVS[_fallback_name])), key="use_fallback")
+if use_fallback:
+    fallback_key = st.sidebar.text_input("Fallback API Key", type="password", value=os.getenv(API_KEY_ENVS[_fallback_name]) or "", key="fallback_key")
+    fallback_model = st.sidebar.text_input("Fallback model", value=DEFAULT_MODELS[_fallback_name], key="fallback_model")
+call_timeout = st.sidebar.number_input("Per-attempt timeout (s)", min_value=5, max_value=600, value=60, step=5, key="call_timeout")
+hedge_calls = st.sidebar.checkbox("Hedge slow requests", value=True, key="hedge_calls",
+                                  help="Send a second identical request when one runs past the provider's p95 latency; the first answer wins.")
+
 st.sidebar.header("Options")
+use_service = st.sidebar.checkbox("Process on the shared worker service", value=bool(os.getenv(WORKER_URL_ENV)), key="use_service",
+                                  help="Queue the batch on one service shared by every session on this host (global rate limit, "
+                                       f"fair turns between users); {WORKER_URL_ENV} or a local one started on demand.")
 default_position = st.sidebar.text_input("Fallback POSITION", value="Tunneling Professional", key="fallback_pos")
 batch_zip = st.sidebar.checkbox("Also create ZIP of all DOCXs", value=True, key="zip_all")
+export_csv = st.sidebar.checkbox("Add a flat CSV to the JSONL records", value=False, key="export_csv",
+                                 help=f"{EXPORT_STEM}.jsonl (one record per CV: identity, work history, facts, timings) "
+                                      "is always written and goes into the ZIP; the CSV has one row per CV.")
+render_backend = st.sidebar.selectbox("DOCX renderer", list(RENDER_BACKENDS), index=RENDER_BACKENDS.index(default_backend()), key="render_backend",
+                                      help="ooxml writes the document XML directly (fast); python-docx is the original renderer.")
+render_workers = st.sidebar.number_input("Render worker processes (0 = render inline)", min_value=0, max_value=os.cpu_count() or 1,
+                                         value=min(default_workers(), 4) if os.getenv(RENDER_WORKERS_ENV) else 0, step=1, key="render_workers",
+                                         disabled=use_service, help="The worker service uses its own --render-workers instead.")
+pack_cvs = st.sidebar.checkbox("Pack short CVs into shared requests", value=False, key="pack_cvs", disabled=use_service,
+                               help=f"Up to {PackConfig._field_defaults['max_items']} short CVs "
+                                    f"(≤ ~{PackConfig._field_defaults['max_item_tokens']:,} tokens each) per LLM request; "
+                                    "a CV whose packed answer fails validation is re-asked alone. "
+                                    "Not available on the worker service, which sends one CV per request.")
+page_filter = st.sidebar.checkbox("Strip certificates, letters and boilerplate before the LLM", value=True, key="page_filter",
+                                  help="Drops repeated headers/footers, empty pages and declarations; certificate and reference pages shrink to one line.")
+index_save = st.sidebar.checkbox("Save results to the candidate index", value=True, key="index_save",
+                                 help=f"Local SQLite index used by Candidate search ({cv_index.index_path()}).")
+profile_run = st.sidebar.checkbox("Profile the next run", value=profile_default(), key="profile_run", disabled=use_service,
+                                  help="cProfile + stack sampling of one Generate run; offers .pstats and a flamegraph stack file. "
+                                       "Not available on the worker service (profile it with bench_load.py --profile).")
+
+TEMPLATE_PATH = DEFAULT_TEMPLATE_PATH
+
+st.header("Upload resumes (PDF, DOCX or ZIP)")
+files = st.file_uploader("Upload one or many CVs", type=["pdf","docx","zip"], accept_multiple_files=True, key="cv_files",
+                         help="ZIP archives are read member by member; folders inside them are kept in the output ZIP.")
+st.file_uploader("…or a whole folder", type=["pdf","docx","zip"], accept_multiple_files="directory", key="cv_files_extra")
 
-HERE = os.path.dirname(__file__) if "__file__" in globals() else os.getcwd()
-TEMPLATE_PATH = os.path.join(HERE, "template", "CURRICULUM VITAE.docx")
-if not os.path.exists(TEMPLATE_PATH):
-    alt = os.path.join(HERE, "CURRICULUM VITAE.docx")
-    if os.path.exists(alt):
-        TEMPLATE_PATH = alt
-
-st.header("Upload resumes (PDF or DOCX)")
-files = st.file_uploader("Upload one or many CVs", type=["pdf","docx"], accept_multiple_files=True, key="cv_files")
-
-def build_payload(text: str, fallback_position: str) -> dict:
-    # UI fallback position is the single source of truth; only if it's empty do we infer.
-    role = (fallback_position or "").strip()
-    if not role:
-        role = role_from_text(text)
-    return {"desired_position": role, "resume_text": text}
-
-def sanitize_cv_json(data: dict) -> dict:
-    s = json.dumps(data, ensure_ascii=False)
-    s = EMAIL_RE.sub("[REDACTED_EMAIL]", s)
-    s = PHONE_RE.sub("[REDACTED_PHONE]", s)
-    s = URL_RE.sub("[REDACTED_URL]", s)
-    try: return json.loads(s)
-    except Exception: return data
-
-def ensure_schema(d: dict, position: str, raw_text: str):
-    d = d or {}
-    ident = d.get("identity") or {}
-    if not ident or (ident.get("name_initials") in [None,"-","—",""] and ident.get("nationality") in [None,"-","—",""]):
-        ident = {**infer_identity(raw_text, position), **ident}
-    months = ident.get("total_experience_months")
-    try: months = int(float(months))
-    except Exception: months = 12 * len(d.get("work_experiences") or [])
-    ident["total_experience_months"] = months
-    langs = ident.get("languages") or ["English"]
-    if isinstance(langs, list) and not langs:
-        ident["languages"] = ["English"]
-    if isinstance(langs, str) and not langs.strip():
-        ident["languages"] = ["English"]
-    profile = d.get("profile_summary") or ""
-    # Force UI fallback position as single source of truth
-    if position and str(position).strip():
-        ident["position"] = str(position).strip()
-    work = d.get("work_experiences") or []
-    edu = d.get("education") or []
-    skills = d.get("skills") or []
-    courses = d.get("courses") or []
-    return ident, profile, work, edu, skills, courses
-
-def project_specs(role, proj, place, bullets) -> str:
-    blob = " ".join([str(role or ""), str(proj or ""), str(place or "")] + [str(b) for b in (bullets or []) if b])
-    meth = detect_method_project_local(blob)
-    ds = _diameters_m(blob)
-    os_ = _oems(blob)
-    parts = []
-    if meth: parts.append("Method: " + meth)
-    if ds: parts.append("Ø: " + ", ".join(f"{d:.2f} m" for d in ds[:3]))
-    if os_: parts.append("OEM: " + ", ".join(os_[:3]))
-    return " | ".join(parts)
-
-
-# ---------- Summary helpers (synonym-aware; summary-only) ----------
-METHOD_FAMILIES = {
-    "EPB": r"\b(EPB|earth\s*pressure\s*balance|balance\s*shield)\b",
-    "Slurry": r"\b(slurry|bentonite\s*slurry)\b",
-    "Mixshield": r"\b(mix\s*shield|mixshield)\b",
-    "Double Shield TBM": r"\b(double\s*shield|DS\b|DSTS)\b",
-    "Single Shield TBM": r"\b(single\s*shield|SS\b)\b",
-    "Open TBM": r"\b(open\s*(?:tbm|gripper|tunnel\s*borer)|gripper\s*tbm)\b",
-    "Hard Rock": r"\b(hard\s*rock)\b",
-    "NATM/SEM": r"\b(NATM|SEM|drill\s*(?:&|and)\s*blast|D&B)\b",
-}
-
-SECTOR_PATTERNS = [
-    (re.compile(r"\b(metro|subway|rail|underground|lrt|mrt|stations?)\b", re.I), "metro/rail"),
-    (re.compile(r"\b(road|highway|expressway)\b", re.I), "road"),
-    (re.compile(r"\b(water|sewer|wastewater|drainage)\b", re.I), "water/sewer"),
-    (re.compile(r"\b(airport|runway|terminal)\b", re.I), "airport"),
-    (re.compile(r"\b(mining|mine)\b", re.I), "mining"),
-    (re.compile(r"\b(hydro|power\s*plant)\b", re.I), "power/hydro"),
-    (re.compile(r"\b(utility|cable|pipe\s*jacking)\b", re.I), "utilities"),
-]
-
-def _extract_methods_synonyms(text: str) -> list:
-    buf = text or ""
-    scores = {}
-    for label, rx in METHOD_FAMILIES.items():
-        n = len(re.findall(rx, buf, flags=re.I))
-        if n:
-            scores[label] = scores.get(label, 0) + n
-    # sort by frequency desc, keep top 3
-    ordered = [k for k, _ in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0].lower()))]
-    return ordered[:3]
-
-def _extract_sectors(text: str) -> list:
-    buf = text or ""
-    found = []
-    for rx, label in SECTOR_PATTERNS:
-        if rx.search(buf):
-            found.append(label)
-    # preserve order, dedupe
-    seen = set(); out = []
-    for x in found:
-        if x not in seen:
-            out.append(x); seen.add(x)
-    return out[:3]
-
-def _collect_summary_facts(identity: dict, work: list, raw_text: str) -> dict:
-    # Combine text from work items and full text
-    blob_parts = [raw_text or ""]
-    for w in work or []:
-        blob_parts.extend([str(w.get("role","")), str(w.get("project","")), str(w.get("city_country",""))])
-        for b in (w.get("bullets") or []):
-            if b: blob_parts.append(str(b))
-    blob = " ".join(blob_parts)
-
-    # Methods: use synonym-aware first, fallback to existing helpers if present
-    methods = _extract_methods_synonyms(blob)
-    if not methods:
-        try:
-            methods = [m.upper() for m in _methods(blob)]
-        except Exception:
-            methods = []
-
-    # OEMs
-    try:
-        oems = _oems(blob)
-    except Exception:
-        oems = []
-        for o in OEM_HINTS:
-            if re.search(r"\b"+re.escape(o)+r"\b", blob, re.I):
-                oems.append(o)
-    # cap
-    oems = list(dict.fromkeys(oems))[:3]
-
-    # Sectors
-    sectors = _extract_sectors(blob)
-
-    # Countries
-    try:
-        countries = _countries(blob)
-    except Exception:
-        countries = []
-        for c in COUNTRY_HINTS:
-            if re.search(r"\b"+c+r"\b", blob, re.I):
-                countries.append(c.replace("\\\\",""))
-    countries = list(dict.fromkeys(countries))[:5]
-
-    # Years (not months)
-    months = int(identity.get("total_experience_months") or 0)
-    years = months // 12 if months > 0 else 0
-
-    return {"methods": methods, "oems": oems, "sectors": sectors, "countries": countries, "years": years}
-
-def build_summary_third_person(identity: dict, work: list, raw_text: str, fallback_position: str) -> str:
-    # Resolve position: prefer forced identity.position (caller ensures override)
-    position = (identity.get("position") or fallback_position or "Tunneling Professional").strip()
-
-    facts = _collect_summary_facts(identity, work, raw_text)
-    years = facts["years"]
-    methods = facts["methods"]
-    oems = facts["oems"]
-    sectors = facts["sectors"]
-    countries = facts["countries"]
-
-    parts = []
-
-    # Sentence 1
-    if years > 0:
-        parts.append(f"Highly experienced {position} with over {years} years in mechanized tunnelling.")
-    else:
-        parts.append(f"Highly experienced {position} in mechanized tunnelling.")
-
-    # Sentence 2 (methods + OEMs) — methods are MUST-HAVE if any evidence
-    if methods:
-        if oems:
-            parts.append(f"Proficient in {', '.join(methods)} and experienced with OEMs such as {', '.join(oems)}.")
-        else:
-            parts.append(f"Proficient in {', '.join(methods)}.")
-    elif oems:
-        parts.append(f"Experienced with OEMs such as {', '.join(oems)}.")
-
-    # Sentence 3 (sectors)
-    if sectors:
-        parts.append(f"Track record across {', '.join(sectors)} projects.")
-
-    # Sentence 4 (countries)
-    if countries:
-        parts.append(f"International experience in {', '.join(countries)}.")
-
-    return " ".join(parts)
-
-
-def render_docx_from_template(template_path: str, identity: dict, profile: str, work: List[dict], edu: List, skills: List[str], courses: List[str], full_text: str) -> bytes:
-    doc = Document(template_path)
-    _clear_body(doc)
-
-    p = doc.add_paragraph()
-    r=p.add_run("CURRICULUM VITAE")
-    r.font.name = TOP_FONT; r.font.size = Pt(16); r.bold = True; r.italic = True
-    p.alignment = 1
-    doc.add_paragraph()
-
-    pos = identity.get("position") or "Tunneling Professional"
-    name_i = identity.get("name_initials") or "—"
-    nat = identity.get("nationality") or "—"
-    langs_field = identity.get("languages") or ["English"]
-    if isinstance(langs_field, str): 
-        langs = langs_field or "English"
-    else: 
-        langs = ", ".join([str(x) for x in langs_field]) or "English"
-    yob = identity.get("year_of_birth") or "—"
-    exp = months_to_ym(identity.get("total_experience_months") or 0)
-
-    _add_top_identity_paragraphs(doc, pos, name_i, nat, langs, yob, exp)
-
-    _add_horizontal_rule(doc)
-    doc.add_paragraph()
-
-    _add_bold_line(doc, "SUMMARY OF EXPERIENCE", size=10)
-    para = build_summary_third_person(identity, work, "", identity.get("position"))
-    _add_text(doc, para, size=10)
-    doc.add_paragraph()
-    _add_bold_line(doc, "WORK EXPERIENCES", size=10)
-    for item in sort_work(work):
-        period = _fmt_period(item.get("from")) + " – " + _fmt_period(item.get("to"))
-        dur = _dur_ym(item.get("from"), item.get("to"))
-        if dur: period = f"{period} — {dur}"
-        _add_bold_line(doc, period, size=10)
-
-        role = (item.get("role") or "").strip()
-        proj = (item.get("project") or "").strip()
-        place = (item.get("city_country") or "").strip()
-        line = " — ".join([t for t in [role, f"{proj}, {place}".strip(', ')] if t])
-        _add_text(doc, line, size=10)
-
-        raw_bullets = [b for b in (item.get("bullets") or []) if b and str(b).strip()]
-        spec_line = project_specs(role, proj, place, raw_bullets)
-        if spec_line:
-            _add_text(doc, spec_line, size=10)
-
-        bullets = rewrite_project_bullets(raw_bullets)
-        for b in bullets:
-            _add_bullet(doc, b, size=10)
-        doc.add_paragraph()
-
-    if edu:
-        cleaned_edu = [e for e in edu if (isinstance(e, dict) and any([e.get("degree"), e.get("institution"), e.get("city_country"), e.get("year")])) or (isinstance(e, str) and e.strip())]
-        if cleaned_edu:
-            _add_bold_line(doc, "EDUCATION", size=10)
-            for e in cleaned_edu:
-                if isinstance(e, dict):
-                    deg = e.get("degree") or "-"
-                    inst = e.get("institution") or "-"
-                    cc = e.get("city_country") or "-"
-                    yr = e.get("year") or "-"
-                    _add_bullet(doc, f"{deg} — {inst}, {cc} ({yr})", size=10)
-                else:
-                    _add_bullet(doc, str(e), size=10)
-            doc.add_paragraph()
-
-    if skills:
-        cleaned_sk = [s for s in skills if s and str(s).strip()]
-        if cleaned_sk:
-            _add_bold_line(doc, "SKILLS", size=10)
-            for s in cleaned_sk[:10]:
-                _add_bullet(doc, s, size=10)
-            doc.add_paragraph()
-
-    if courses:
-        cleaned_c = [c for c in courses if c and str(c).strip()]
-        if cleaned_c:
-            _add_bold_line(doc, "COURSES & SEMINARS", size=10)
-            for t in cleaned_c[:10]:
-                _add_bullet(doc, t, size=10)
-
-    out_path = tempfile.mktemp(suffix='.docx')
-    doc.save(out_path)
-    with open(out_path, "rb") as fh:
-        return fh.read()
-
-HERE = os.path.dirname(__file__) if "__file__" in globals() else os.getcwd()
-TEMPLATE_PATH = os.path.join(HERE, "template", "CURRICULUM VITAE.docx")
-if not os.path.exists(TEMPLATE_PATH):
-    alt = os.path.join(HERE, "CURRICULUM VITAE.docx")
-    if os.path.exists(alt):
-        TEMPLATE_PATH = alt
 # ---- Merge files from multiple uploaders (if present) ----
 try:
     _files_main = st.session_state.get("cv_files")
@@ -1251,59 +111,312 @@ except Exception:
 # ---- /merge ----
 
 
+def _call_config():
+    """(primary, fallback, route_cfg, policy) from the sidebar."""
+    primary = Provider(_primary_name, api_key, model or st.session_state.get("model_pick") or DEFAULT_MODELS[_primary_name])
+    fallback = None
+    if st.session_state.get("use_fallback") and st.session_state.get("fallback_key"):
+        fallback = Provider(_fallback_name, st.session_state["fallback_key"],
+                            st.session_state.get("fallback_model") or DEFAULT_MODELS[_fallback_name])
+    route_cfg = None
+    if st.session_state.get("auto_route"):
+        route_cfg = RoutingConfig(
+            fast_model=primary.model, strong_model=st.session_state.get("strong_model") or STRONG_MODELS[_primary_name],
+            max_fast_chars=int(st.session_state.get("route_max_chars", RoutingConfig._field_defaults["max_fast_chars"])),
+            max_table_ratio=float(st.session_state.get("route_table_ratio", RoutingConfig._field_defaults["max_table_ratio"])),
+            max_fast_roles=int(st.session_state.get("route_max_roles", RoutingConfig._field_defaults["max_fast_roles"])),
+            escalate_on_schema=bool(st.session_state.get("route_escalate", True)))
+    policy = CallPolicy(timeout=float(st.session_state.get("call_timeout", 60)), hedge=bool(st.session_state.get("hedge_calls", True)))
+    return primary, fallback, route_cfg, policy
+
+
+def _service_client() -> WorkerClient:
+    url = os.getenv(WORKER_URL_ENV)
+    return WorkerClient(url) if url else ensure_local_service()
+
+
 if st.button("Generate DOCX CVs", key="gen_btn"):
     if not os.path.exists(TEMPLATE_PATH):
         st.error("Template not found. Place 'CURRICULUM VITAE.docx' inside ./template/ or beside the script.")
     elif not api_key:
         st.error("Paste your API key.")
     elif not files:
-        st.warning("Upload at least one PDF/DOCX.")
+        st.warning("Upload at least one PDF/DOCX or a ZIP of them.")
+    elif st.session_state.get("use_service"):
+        primary, fallback, route_cfg, policy = _call_config()
+        opts = batch_options(primary, fallback, route_cfg, policy, st.session_state.get("fallback_pos", "Tunneling Professional"),
+                             bool(st.session_state.get("index_save", True)), st.session_state.get("render_backend") or default_backend(),
+                             bool(st.session_state.get("page_filter", True)))
+        skipped = []
+        try:
+            sub = _service_client().submit(st.session_state.setdefault("svc_session", uuid.uuid4().hex),
+                                           ((f.name, f.getvalue()) for f in iter_cvs(files, skipped)), opts)
+        except OSError as e:
+            st.error(f"Worker service unavailable: {e}")
+        else:
+            st.session_state["svc_batch"] = sub["batch"]
+            st.session_state["svc_docx"] = {}
+            st.session_state.pop("svc_records", None)
+        if describe_skipped(skipped):
+            st.caption(describe_skipped(skipped))
     else:
         out_files = []
-        for f in files:
-            st.subheader(f"📄 {f.name}")
-            raw = extract_text_any(f)
-            if not raw:
-                st.error("Could not extract text. Install PyMuPDF/pdfminer.six for PDF and python-docx for DOCX.")
-                st.markdown("---"); continue
-            text = strip_pii(canonicalize_text(raw))
-            payload = build_payload(text, st.session_state.get("fallback_pos","Tunneling Professional"))
-
-            with st.spinner(f"Calling {st.session_state.get('provider_sel','Google Gemini')}…"):
-                try:
-                    if provider.startswith("Google"):
-                        time.sleep(0.15)  # soft throttle
-                        resp = call_gemini_json(api_key, model or st.session_state.get("model_pick","gemini-2.5-flash"), payload)
-                    else:
-                        resp = call_openai_json(api_key, model or st.session_state.get("model_pick","gpt-4o-mini"), payload)
-                except Exception as e:
-                    st.error(f"API error: {e}"); st.markdown("---"); continue
-
-            data = sanitize_cv_json(resp or {})
-            identity, profile, work, edu, skills, courses = ensure_schema(data, payload["desired_position"], text)
-
-            try:
-                docx_bytes = render_docx_from_template(TEMPLATE_PATH, identity, profile, work, edu, skills, courses, full_text=text)
-            except Exception as e:
-                st.error(f"DOCX error: {e}"); continue
-
-            base_no_ext = os.path.splitext(f.name)[0]
-            out_name = f"CV BOT - {base_no_ext}.docx"
+        out_dir = tempfile.mkdtemp(prefix="cv_bot_")
+        export = BatchExport(out_dir, bool(st.session_state.get("export_csv")))
 
+        def _emit_docx(src_name: str, docx_bytes: bytes):
+            arcname = docx_arcname(src_name)
+            out_name = os.path.basename(arcname)
             st.download_button(
-                label=f"⬇️ Download {out_name}",
+                label=f"⬇️ Download {arcname}",
                 data=docx_bytes,
                 file_name=out_name,
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                key=f"dl_{hashlib.sha1((base_no_ext).encode()).hexdigest()[:8]}"
+                key=f"dl_{hashlib.sha1(arcname.encode()).hexdigest()[:8]}"
             )
-
-            tmp_path = os.path.join(tempfile.gettempdir(), out_name)
+            # spooled to disk so a large batch does not keep every DOCX in memory for the ZIP
+            tmp_path = os.path.join(out_dir, *arcname.split("/"))
+            os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
             with open(tmp_path, "wb") as fh: fh.write(docx_bytes)
-            out_files.append(tmp_path)
+            out_files.append((arcname, tmp_path))
+
+        # Rendering holds the GIL; for multi-file batches hand it to worker processes
+        workers = int(st.session_state.get("render_workers", 0) or 0)
+        backend = st.session_state.get("render_backend") or default_backend()
+        render_fn = renderer(backend)
+        multi = len(files) > 1 or any(f.name.lower().endswith(".zip") for f in files)
+        pool = RenderPool(TEMPLATE_PATH, workers, backend) if workers > 0 and multi else None
+        pending = []
+        primary, fallback, route_cfg, policy = _call_config()
+        tier_stats = TierStats()
+        packer = Packer(PackConfig()) if st.session_state.get("pack_cvs") and multi else None
+        usage_log, batch_calls, batch_id = UsageLog(), [], time.strftime("%Y%m%d-%H%M%S")
+        index_con = cv_index.connect() if st.session_state.get("index_save", True) else None
+        prof = RunProfiler(bool(st.session_state.get("profile_run")))
+        skipped = []
+        try:
+            prof.start()
+            def _prepare(f):
+                """Extract, filter and redact one CV; None (error shown) when no text comes out."""
+                t_file = time.perf_counter()
+                notes = []
+                raw = extract_text_any(f, notes)
+                t_extract = time.perf_counter() - t_file
+                if not raw:
+                    st.subheader(f"📄 {f.name}")
+                    st.error("Could not extract text. Install PyMuPDF/pdfminer.six for PDF and python-docx for DOCX.")
+                    st.markdown("---"); return None
+                if st.session_state.get("page_filter", True):
+                    raw, filter_stats = filter_cv_text(raw)
+                    if describe_filter(filter_stats):
+                        notes.append(describe_filter(filter_stats))
+                pii_counts = {}
+                text = strip_pii(canonicalize_text(raw), pii_counts)
+                payload = build_payload(text, st.session_state.get("fallback_pos","Tunneling Professional"))
+                return PackItem(f.name, payload, raw, {"t_file": t_file, "t_extract": t_extract, "notes": notes, "pii": pii_counts,
+                                                       "sha1": upload_key(f)})
+
+            def _finish(res: PackResult):
+                """Everything after the LLM answer: captions, accounting, schema, index, export, DOCX."""
+                name, payload, ctx = res.item.key, res.item.payload, res.item.ctx
+                text, pii_counts = payload["resume_text"], ctx["pii"]
+                st.subheader(f"📄 {name}")
+                for note in ctx["notes"]:
+                    st.caption(note)
+                if res.error is not None:
+                    batch_calls.extend(res.error.info.get("usage") or [])
+                    usage_log.write(batch_id, name, res.error.info.get("usage") or [])
+                    st.error(f"API error: {res.error}"); st.markdown("---"); return
+                call_info = res.info
+                batch_calls.extend(call_info["usage"])
+                usage_log.write(batch_id, name, call_info["usage"])
+                if (route_cfg is not None or call_info["fallback"] or call_info["hedged"] or call_info["attempts"] > 1
+                        or call_info.get("pack", 1) > 1 or call_info.get("unpacked")):
+                    st.caption(describe_call(call_info, route_cfg is not None))
+
+                if call_info["usage"]:
+                    st.caption(describe_usage(call_info["usage"]))
+
+                data = sanitize_cv_json(res.resp or {}, pii_counts)
+                if pii_counts:
+                    st.caption("Redacted: " + ", ".join(f"{k} ×{v}" for k, v in sorted(pii_counts.items())))
+                identity, profile, work, edu, skills, courses = ensure_schema(data, payload["desired_position"], text)
+                content_hash, facts = ctx["sha1"], cv_facts(identity, work)
+                if index_con is not None:
+                    try:
+                        cv_index.index_candidate(index_con, content_hash, name, identity, work, edu, skills, courses, facts)
+                    except Exception as e:
+                        st.warning(f"Index error: {e}")
+                export.write(build_record(name, identity, profile, work, edu, skills, courses, content_hash=content_hash,
+                                          batch=batch_id, facts=facts, llm=call_info,
+                                          timings={"extract_s": ctx["t_extract"], "llm_s": call_info["seconds"],
+                                                   "total_s": time.perf_counter() - ctx["t_file"]}))
+
+                if pool is not None:
+                    pending.append((name, pool.submit({"identity": identity, "profile": profile, "work": work, "education": edu,
+                                                       "skills": skills, "courses": courses, "full_text": text})))
+                    return
+                try:
+                    docx_bytes = render_fn(TEMPLATE_PATH, identity, profile, work, edu, skills, courses, full_text=text)
+                except Exception as e:
+                    st.error(f"DOCX error: {e}"); return
+                _emit_docx(name, docx_bytes)
+
+            def _send(group):
+                if not group:
+                    return
+                with st.spinner(f"Calling {st.session_state.get('provider_sel','Google Gemini')}"
+                                + (f" with {len(group)} CVs in one request…" if len(group) > 1 else "…")):
+                    if provider.startswith("Google"):
+                        time.sleep(0.15)  # soft throttle
+                    results = call_pack(group, primary, fallback, route_cfg, policy, tier_stats)
+                for res in results:
+                    _finish(res)
+
+            # one CV in memory at a time (a few short ones when packing): ZIP members are decompressed as the loop reaches them
+            for f in iter_cvs(files, skipped):
+                item = _prepare(f)
+                if item is None:
+                    continue
+                if packer is not None and packable(item, packer.cfg, route_cfg):
+                    _send(packer.add(item))
+                else:
+                    _send([item])
+            if packer is not None:
+                _send(packer.flush())
 
-        if out_files and st.session_state.get("zip_all", True):
-            buf = io.BytesIO(); import zipfile
+            for fname, fut in pending:
+                try:
+                    docx_bytes = fut.result()
+                except Exception as e:
+                    st.error(f"DOCX error ({fname}): {e}"); continue
+                _emit_docx(fname, docx_bytes)
+        finally:
+            prof.stop()
+            export.close()
+            if pool is not None:
+                pool.close()
+            if index_con is not None:
+                index_con.close()
+
+        if describe_skipped(skipped):
+            st.caption(describe_skipped(skipped))
+
+        if batch_calls:
+            st.subheader("Token usage")
+            _tot = totals(batch_calls)
+            st.caption(f"{_tot['calls']} calls · {_tot['input_tokens']:,} input tokens ({_tot['cached_tokens']:,} cached) · "
+                       f"{_tot['output_tokens']:,} output tokens · ${_tot['usd']:.4f} · logged to {usage_log.path}")
+            st.dataframe(by_model(batch_calls), hide_index=True)
+
+        if (route_cfg is not None or packer is not None) and tier_stats.summary():
+            st.subheader("Model routing")
+            st.dataframe(tier_stats.summary(), hide_index=True)
+
+        if prof.ran:
+            st.subheader("Profile")
+            _cum = ("cProfile of the run's thread (on Python 3.12+ every thread of the process, other sessions included)"
+                    if prof.cprofiled else "not collected, another run or profiler held cProfile")
+            st.caption(f"{prof.seconds:.1f}s run · cum/own: {_cum} · sampled: all pipeline threads of the process")
+            st.dataframe(prof.summary(), hide_index=True)
+            _stem = time.strftime("cv_run_%Y%m%d-%H%M%S")
+            if prof.cprofiled:
+                st.download_button("⬇️ Profile (.pstats)", data=prof.pstats_bytes(), file_name=f"{_stem}.pstats",
+                                   mime="application/octet-stream", key="prof_pstats")
+            st.download_button("⬇️ Collapsed stacks (flamegraph)", data=prof.collapsed(), file_name=f"{_stem}.collapsed.txt",
+                               mime="text/plain", key="prof_collapsed")
+
+        if export.count:
+            with open(export.jsonl_path, "rb") as fh:
+                st.download_button(f"⬇️ Records ({export.count} CVs, JSONL)", data=fh.read(), file_name=f"{EXPORT_STEM}.jsonl",
+                                   mime="application/x-ndjson", key="records_dl")
+
+        if (out_files or export.count) and st.session_state.get("zip_all", True):
+            buf = io.BytesIO()
             with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
-                for pth in out_files: z.write(pth, arcname=os.path.basename(pth))
+                for arcname, pth in out_files + export.files(): z.write(pth, arcname=arcname)
             st.download_button("📦 Download ALL (ZIP)", data=buf.getvalue(), file_name="cv_bot_docx_summaries.zip", mime="application/zip", key="zip_dl")
+
+# ------------------ Shared worker service: batch status ------------------
+@st.fragment(run_every=2)
+def _service_batch_view():
+    batch = st.session_state.get("svc_batch")
+    if not batch:
+        return
+    client = _service_client()
+    try:
+        stat = client.status(batch)
+    except OSError as e:
+        st.warning(f"Worker service unavailable: {e}")
+        return
+    counts = stat["counts"]
+    n_final = sum(counts.get(k, 0) for k in ("done", "error", "cancelled"))
+    st.subheader("Batch on the worker service")
+    st.progress(n_final / max(1, stat["total"]),
+                text=" · ".join(f"{k} {v}" for k, v in sorted(counts.items())) + f" of {stat['total']}")
+    if not stat["finished"] and st.button("Cancel queued CVs", key="svc_cancel"):
+        client.cancel(batch)
+    cache = st.session_state.setdefault("svc_docx", {})
+    for job in stat["jobs"]:
+        if job["state"] == "queued":
+            st.caption(f"📄 {job['name']} · queued ({job['queue_position']} ahead)")
+        elif job["state"] == "running":
+            st.caption(f"📄 {job['name']} · processing…")
+        elif job["state"] == "error":
+            st.error(f"{job['name']}: {job['error']}")
+        elif job["state"] == "done" and job["docx"]:
+            if job["id"] not in cache:
+                cache[job["id"]] = client.docx(job["id"])
+            arcname = docx_arcname(job["name"])
+            st.download_button(label=f"⬇️ Download {arcname}", data=cache[job["id"]], file_name=os.path.basename(arcname),
+                               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                               key=f"svc_dl_{job['id']}")
+            for note in job["notes"]:
+                st.caption(note)
+    if stat["finished"]:
+        if stat["tiers"]:
+            st.dataframe(stat["tiers"], hide_index=True)
+        if stat["usage"]:
+            st.dataframe(stat["usage"], hide_index=True)
+        if cache and st.session_state.get("zip_all", True):
+            if "svc_records" not in st.session_state:
+                st.session_state["svc_records"] = client.records(batch)
+            records = st.session_state["svc_records"]
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+                for job in stat["jobs"]:
+                    if job["id"] in cache:
+                        z.writestr(docx_arcname(job["name"]), cache[job["id"]])
+                if records:
+                    z.writestr(f"{EXPORT_STEM}.jsonl", "".join(jsonl_line(r) for r in records))
+                    if st.session_state.get("export_csv"):
+                        z.writestr(f"{EXPORT_STEM}.csv", csv_text(records))
+            st.download_button("📦 Download ALL (ZIP)", data=buf.getvalue(), file_name="cv_bot_docx_summaries.zip",
+                               mime="application/zip", key="svc_zip_dl")
+
+
+_service_batch_view()
+
+# ------------------ Candidate search ------------------
+st.header("Candidate search")
+search_mode = st.radio("Mode", ["Filter", "Rank"], horizontal=True, key="cand_mode",
+                       help="Filter: candidates matching every term. Rank: whole pool scored against the terms as a role spec.")
+search_q = st.text_input("Filters separated by + or ,", value="", key="cand_query",
+                         placeholder="EPB + Herrenknecht + 8-12 m + Qatar, >= 10 years")
+if search_q.strip():
+    _con = cv_index.connect()
+    try:
+        _t0 = time.perf_counter()
+        if search_mode == "Rank":
+            _rows = cv_rank.rank_query(_con, search_q, top=50)
+        else:
+            _rows = cv_index.search_query(_con, search_q, limit=200)
+        _ms = (time.perf_counter() - _t0) * 1000
+        _total = cv_index.count(_con)
+    finally:
+        _con.close()
+    _f = cv_index.parse_query(search_q)
+    st.caption(f"{len(_rows)} of {_total} candidates in {_ms:.1f} ms · "
+               + json.dumps({k: v for k, v in _f.items() if v}, ensure_ascii=False))
+    if _rows:
+        st.dataframe(_rows, use_container_width=True, hide_index=True)
@@ -0,0 +1,196 @@
+"""
+Token usage and cost accounting.
+
+Every provider request (extraction, targeted re-ask, summary paragraph) calls record() with
+the usage metadata the provider returned. Records go to every collect() scope open in the
+calling context: call_llm_json opens one per call (info["usage"]), the app and the worker
+service one per file, so totals roll up per call, file and batch without threading lists
+through the call chain. cv_llm_client runs attempts with the caller's context, so hedge legs
+are counted too (a losing leg still in flight when the call returns is not).
+
+Prices are USD per 1M tokens (input, output, cached input); CV_PRICES_FILE points to a JSON
+file {"model": [input, output, cached]} that overrides or extends the table. Rows are
+appended to CV_USAGE_LOG (JSONL, or CSV when the name ends in .csv).
+"""
+import contextlib, contextvars, csv, json, os, threading, time, uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PRICES_FILE_ENV = "CV_PRICES_FILE"
+USAGE_LOG_ENV = "CV_USAGE_LOG"
+DEFAULT_USAGE_LOG = os.path.join(HERE, "cv_usage.jsonl")
+
+# USD per 1M tokens (input, output, cached input); list prices, override for your contract.
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+    "gemini-2.5-pro": (1.25, 10.00, 0.31),
+    "gemini-2.0-flash-exp": (0.10, 0.40, 0.025),
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "gpt-4o": (2.50, 10.00, 1.25),
+}
+
+
+def load_prices(path: Optional[str] = None) -> Dict[str, Tuple[float, float, float]]:
+    """MODEL_PRICES with the overrides from path (default: $CV_PRICES_FILE) applied."""
+    prices = dict(MODEL_PRICES)
+    path = path or os.getenv(PRICES_FILE_ENV)
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            for model, row in json.load(fh).items():
+                row = [float(x) for x in row]
+                prices[model] = (row[0], row[1], row[2] if len(row) > 2 else row[0])
+    return prices
+
+
+PRICES = load_prices()
+
+
+class Call(NamedTuple):
+    provider: str
+    model: str
+    kind: str            # extract | reask | packed | summary
+    input_tokens: int    # including cached
+    output_tokens: int
+    cached_tokens: int
+    seconds: float
+    request: str = ""    # id of the shared request this is a share of (split_usage); "" for a whole call
+
+    @property
+    def usd(self) -> float:
+        pin, pout, pcache = PRICES.get(self.model, (0.0, 0.0, 0.0))
+        fresh = max(0, self.input_tokens - self.cached_tokens)
+        return (fresh * pin + self.cached_tokens * pcache + self.output_tokens * pout) / 1e6
+
+
+_SCOPES: contextvars.ContextVar = contextvars.ContextVar("cv_usage_scopes", default=())
+
+
+@contextlib.contextmanager
+def collect():
+    """Collect the Calls recorded in this context (and nested scopes) into the yielded list."""
+    calls: List[Call] = []
+    token = _SCOPES.set(_SCOPES.get() + (calls,))
+    try:
+        yield calls
+    finally:
+        _SCOPES.reset(token)
+
+
+def record(provider: str, model: str, kind: str, tokens: Tuple[int, int, int], seconds: float) -> Call:
+    c = Call(provider, model, kind, tokens[0], tokens[1], tokens[2], round(seconds, 3))
+    for calls in _SCOPES.get():
+        calls.append(c)
+    return c
+
+
+def _int(v) -> int:
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def gemini_tokens(resp) -> Tuple[int, int, int]:
+    """(input, output, cached) from a google-generativeai response."""
+    um = getattr(resp, "usage_metadata", None)
+    return (_int(getattr(um, "prompt_token_count", 0)), _int(getattr(um, "candidates_token_count", 0)),
+            _int(getattr(um, "cached_content_token_count", 0)))
+
+
+def openai_tokens(resp) -> Tuple[int, int, int]:
+    """(input, output, cached) from an OpenAI chat completion."""
+    u = getattr(resp, "usage", None)
+    details = getattr(u, "prompt_tokens_details", None)
+    return (_int(getattr(u, "prompt_tokens", 0)), _int(getattr(u, "completion_tokens", 0)),
+            _int(getattr(details, "cached_tokens", 0)))
+
+
+def split_usage(calls: Iterable[Call], weights: List[float]) -> List[List[Call]]:
+    """
+    Calls of one shared request (a cv_pack group) apportioned by weight, one list per weight.
+    Tokens and seconds are split with cumulative rounding, so the shares sum to the originals.
+    The shares of a call carry one request id, so totals() still counts it once.
+    """
+    total = float(sum(weights))
+    cum, acc = [], 0.0
+    for w in weights:
+        acc += w
+        cum.append(acc / total if total else (len(cum) + 1) / len(weights))
+    out: List[List[Call]] = [[] for _ in weights]
+    for c in calls:
+        rid = c.request or uuid.uuid4().hex[:12]
+        prev = (0, 0, 0, 0.0)
+        for j, f in enumerate(cum):
+            upto = (round(c.input_tokens * f), round(c.output_tokens * f), round(c.cached_tokens * f), c.seconds * f)
+            out[j].append(c._replace(input_tokens=upto[0] - prev[0], output_tokens=upto[1] - prev[1],
+                                     cached_tokens=upto[2] - prev[2], seconds=round(upto[3] - prev[3], 3),
+                                     request=rid))
+            prev = upto
+    return out
+
+
+def totals(calls: Iterable[Call]) -> dict:
+    """Summed usage; "calls" counts provider requests, so the shares of one request count once."""
+    out = {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "seconds": 0.0, "usd": 0.0}
+    shared = set()
+    for c in calls:
+        if not c.request:
+            out["calls"] += 1
+        elif c.request not in shared:
+            shared.add(c.request)
+            out["calls"] += 1
+        out["input_tokens"] += c.input_tokens
+        out["cached_tokens"] += c.cached_tokens
+        out["output_tokens"] += c.output_tokens
+        out["seconds"] += c.seconds
+        out["usd"] += c.usd
+    out["seconds"], out["usd"] = round(out["seconds"], 2), round(out["usd"], 6)
+    return out
+
+
+def by_model(calls: Iterable[Call]) -> List[dict]:
+    """totals() per (provider, model, kind), for a batch table."""
+    groups: Dict[Tuple[str, str, str], List[Call]] = {}
+    for c in calls:
+        groups.setdefault((c.provider, c.model, c.kind), []).append(c)
+    return [dict(provider=p, model=m, kind=k, **totals(cs)) for (p, m, k), cs in sorted(groups.items())]
+
+
+def describe_usage(calls: List[Call]) -> str:
+    """One-line caption; empty when nothing was recorded."""
+    if not calls:
+        return ""
+    t = totals(calls)
+    shared = len({c.request for c in calls if c.request})
+    return (f"Tokens: in {t['input_tokens']:,}" + (f" (cached {t['cached_tokens']:,})" if t["cached_tokens"] else "")
+            + f" · out {t['output_tokens']:,} · {t['calls']} call{'s' if t['calls'] != 1 else ''}"
+            + (f" ({shared} shared)" if shared else "") + f" · ${t['usd']:.4f}")
+
+
+class UsageLog:
+    """Append-only per-call log: JSONL, or CSV when the path ends in .csv."""
+
+    FIELDS = ["ts", "batch", "file"] + list(Call._fields) + ["usd"]
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv(USAGE_LOG_ENV) or DEFAULT_USAGE_LOG
+        self._lock = threading.Lock()
+
+    def write(self, batch: str, file: str, calls: Iterable[Call]):
+        ts = time.strftime("%Y-%m-%dT%H:%M:%S")
+        rows = [dict(ts=ts, batch=batch, file=file, **c._asdict(), usd=round(c.usd, 6)) for c in calls]
+        if not rows:
+            return
+        with self._lock:
+            if self.path.lower().endswith(".csv"):
+                new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                with open(self.path, "a", newline="", encoding="utf-8") as fh:
+                    w = csv.DictWriter(fh, fieldnames=self.FIELDS)
+                    if new:
+                        w.writeheader()
+                    w.writerows(rows)
+            else:
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    for r in rows:
+                        fh.write(json.dumps(r, ensure_ascii=False) + "\n")
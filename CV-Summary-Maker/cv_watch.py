@@ -0,0 +1,280 @@
+"""
+Drop-folder watcher: processes CVs as they land in a shared folder, without the web page.
+
+    python cv_watch.py IN_DIR OUT_DIR --provider gemini --rpm gemini=120
+    python cv_watch.py IN_DIR OUT_DIR --once      # whatever is there now, then exit (cron)
+
+IN_DIR is polled every --interval seconds. PDF/DOCX files and ZIPs (read through cv_ingest) go
+through the pipeline of cv_worker_service (extract -> filter -> redact -> LLM call layer ->
+sanitise -> index -> render), at most --max-pending CVs at a time, so a large drop is worked off
+at a steady rate. OUT_DIR gets each DOCX at its input's relative path
+("ClientA/Smith.pdf" -> "ClientA/CV BOT - Smith.docx") and the cv_export record of every CV
+appended to cv_bot_records.jsonl (and .csv with --csv).
+
+State lives in OUT_DIR/.cv_watch.sqlite: the content hashes already processed, and a stat cache
+(path, size, mtime) so unchanged files are not even reread. A restart carries on where the last
+run stopped; CVs that were in flight are processed again. A file is only read once its mtime is
+--settle seconds old, so half-copied files wait for a later scan. The same content under a second
+name is not processed twice, an edited file has a new hash and is. A CV that fails is retried on
+later scans up to --attempts times, then left until its content changes.
+"""
+import argparse, json, os, signal, sqlite3, sys, threading, time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cv_export import BatchExport
+from cv_ingest import CVItem, docx_arcname, iter_cvs
+from cv_llm_client import API_KEY_ENVS, DEFAULT_MODELS, CallPolicy, Provider
+from cv_render_pool import RENDER_BACKENDS, default_backend
+from cv_router import STRONG_MODELS, RoutingConfig
+from cv_worker_service import FINAL_STATES, Job, WorkerService, _parse_rpm, batch_options
+
+STATE_DB = ".cv_watch.sqlite"
+SESSION = "watch"
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cvs (
+    sha1 TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output TEXT,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hashes TEXT NOT NULL
+);
+"""
+
+
+class WatchState:
+    """Processed CVs by content hash (state done | error), and the CV hashes of each input file as last stat'ed."""
+
+    def __init__(self, path: str):
+        self.con = sqlite3.connect(path, timeout=30)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.executescript(STATE_SCHEMA)
+
+    def settled(self, sha1: str, max_attempts: int) -> bool:
+        """Done, or failed max_attempts times: not to be submitted again."""
+        row = self.con.execute("SELECT state, attempts FROM cvs WHERE sha1 = ?", (sha1,)).fetchone()
+        return row is not None and (row[0] == "done" or row[1] >= max_attempts)
+
+    def mark(self, sha1: str, name: str, state: str, output: str = "", error: str = ""):
+        with self.con:
+            self.con.execute(
+                "INSERT INTO cvs (sha1, name, state, attempts, output, error, updated) VALUES (?, ?, ?, 1, ?, ?, ?) "
+                "ON CONFLICT(sha1) DO UPDATE SET name = excluded.name, state = excluded.state, "
+                "attempts = cvs.attempts + 1, output = excluded.output, error = excluded.error, updated = excluded.updated",
+                (sha1, name, state, output, error, time.time()))
+
+    def name_of(self, sha1: str) -> Optional[str]:
+        row = self.con.execute("SELECT name FROM cvs WHERE sha1 = ? AND state = 'done'", (sha1,)).fetchone()
+        return row[0] if row else None
+
+    def file_hashes(self, path: str, size: int, mtime_ns: int) -> Optional[List[str]]:
+        """CV hashes found in path when it last had this size and mtime; None if it changed or is new."""
+        row = self.con.execute("SELECT hashes FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                               (path, size, mtime_ns)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remember_file(self, path: str, size: int, mtime_ns: int, hashes: List[str]):
+        with self.con:
+            self.con.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, hashes) VALUES (?, ?, ?, ?)",
+                             (path, size, mtime_ns, json.dumps(hashes)))
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.con.execute("SELECT state, COUNT(*) FROM cvs GROUP BY state").fetchall())
+
+
+class _File:
+    """An input file as an upload for cv_ingest; read on first getvalue() (skipped types never are)."""
+
+    def __init__(self, path: str, name: str):
+        self.path, self.name = path, name
+
+    def getvalue(self) -> bytes:
+        with open(self.path, "rb") as fh:
+            return fh.read()
+
+
+def _log(msg: str):
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')}  {msg}", flush=True)
+
+
+class DropWatcher:
+    def __init__(self, in_dir: str, out_dir: str, svc: WorkerService, options: dict, settle: float = 5.0,
+                 max_pending: int = 32, attempts: int = 3, with_csv: bool = False):
+        self.in_dir, self.out_dir = os.path.abspath(in_dir), os.path.abspath(out_dir)
+        if self.out_dir == self.in_dir:
+            raise ValueError("the output folder must not be the input folder (outputs would be picked up as CVs)")
+        self.svc, self.options = svc, options
+        self.settle, self.max_pending, self.attempts = settle, max_pending, attempts
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.state = WatchState(os.path.join(self.out_dir, STATE_DB))
+        self.export = BatchExport(self.out_dir, with_csv, append=True)
+        self.pending: Dict[str, Tuple[Job, str]] = {}   # sha1 -> (job, input name)
+
+    def _inputs(self) -> Iterator[Tuple[str, str]]:
+        """(absolute path, relative POSIX name) of every file under in_dir, out_dir excluded, in name order."""
+        for root, dirs, files in os.walk(self.in_dir):
+            dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != self.out_dir)
+            for f in sorted(files):
+                path = os.path.join(root, f)
+                yield path, os.path.relpath(path, self.in_dir).replace(os.sep, "/")
+
+    def _open(self, h: str) -> bool:
+        return h not in self.pending and not self.state.settled(h, self.attempts)
+
+    def scan(self) -> List[CVItem]:
+        """CVs to submit: unprocessed content in settled files, up to the free --max-pending slots."""
+        room = self.max_pending - len(self.pending)
+        out, taken, now = [], set(), time.time()
+        for path, rel in self._inputs():
+            if room <= 0:
+                break
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue   # removed since the walk
+            if now - st.st_mtime < self.settle:
+                continue
+            hashes = self.state.file_hashes(rel, st.st_size, st.st_mtime_ns)
+            if hashes is not None and not any(self._open(h) and h not in taken for h in hashes):
+                continue
+            skipped, hashes, complete = [], [], True
+            try:
+                for item in iter_cvs([_File(path, rel)], skipped):
+                    hashes.append(item.sha1)
+                    if item.sha1 in taken or not self._open(item.sha1):
+                        first = self.state.name_of(item.sha1)
+                        if first is not None and first != item.name:
+                            skipped.append((item.name, f"same content as {first}, already processed"))
+                        continue
+                    if room <= 0:
+                        complete = False
+                        break
+                    out.append(item)
+                    taken.add(item.sha1)
+                    room -= 1
+            except OSError as e:
+                _log(f"unreadable {rel}: {e}")
+                continue
+            if complete:
+                self.state.remember_file(rel, st.st_size, st.st_mtime_ns, hashes)
+                for name, reason in skipped:
+                    _log(f"skipped {name} ({reason})")
+        return out
+
+    def submit(self, items: List[CVItem]):
+        if not items:
+            return
+        batch = self.svc.submit(SESSION, [(it.name, it.getvalue()) for it in items], self.options)
+        for it, job in zip(items, batch.jobs):
+            self.pending[it.sha1] = (job, it.name)
+        _log(f"queued {len(items)} CV(s), {len(self.pending)} in progress")
+
+    def harvest(self) -> int:
+        """Write out every finished job; returns how many finished."""
+        n = 0
+        for sha1, (job, name) in list(self.pending.items()):
+            if job.state not in FINAL_STATES:
+                continue
+            n += 1
+            del self.pending[sha1]
+            if job.state == "done" and job.docx is not None:
+                arc = docx_arcname(name)
+                path = os.path.join(self.out_dir, *arc.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".part", "wb") as fh:
+                    fh.write(job.docx)
+                os.replace(path + ".part", path)   # never a half-written DOCX under the final name
+                if job.record is not None:
+                    self.export.write(job.record)
+                self.state.mark(sha1, name, "done", output=arc)
+                _log(f"done {name} -> {arc} ({job.seconds:.1f}s)")
+            else:
+                self.state.mark(sha1, name, "error", error=job.error or job.state)
+                _log(f"failed {name}: {job.error or job.state}")
+            job.docx = job.record = None
+        return n
+
+    def run(self, interval: float = 10.0, once: bool = False, stop: Optional[threading.Event] = None):
+        """
+        Harvest finished CVs every half second and scan every `interval` until stop is set (CVs in
+        flight are then finished, nothing new is queued); with once, until a scan finds nothing new.
+        """
+        stop = stop or threading.Event()
+        next_scan = 0.0
+        while True:
+            self.harvest()
+            scanned = queued = 0
+            if not stop.is_set() and (time.monotonic() >= next_scan or (once and not self.pending)):
+                items = self.scan()
+                self.submit(items)
+                scanned, queued = 1, len(items)
+                next_scan = time.monotonic() + interval
+            if not self.pending and (stop.is_set() or (once and scanned and not queued)):
+                break
+            wait = 0.5 if self.pending else max(0.0, next_scan - time.monotonic())
+            if stop.is_set():
+                time.sleep(wait)
+            else:
+                stop.wait(wait)
+        self.export.close()
+        c = self.state.counts()
+        _log(f"stopped: {c.get('done', 0)} processed, {c.get('error', 0)} failed in {self.out_dir}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("in_dir")
+    ap.add_argument("out_dir")
+    ap.add_argument("--interval", type=float, default=10.0, help="seconds between scans")
+    ap.add_argument("--settle", type=float, default=5.0, help="seconds since a file's last change before it is read")
+    ap.add_argument("--once", action="store_true", help="process what is there, then exit")
+    ap.add_argument("--max-pending", type=int, default=32, help="CVs queued or in progress at a time")
+    ap.add_argument("--attempts", type=int, default=3, help="runs of a failing CV before it is left alone")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("CV_WORKER_THREADS", "8")))
+    ap.add_argument("--rpm", default=os.getenv("CV_WORKER_RPM", ""), help="per-provider request rate, e.g. gemini=120,openai=300")
+    ap.add_argument("--render-workers", type=int, default=0, help="DOCX render processes (0 = render in the worker threads)")
+    ap.add_argument("--backend", choices=RENDER_BACKENDS, default=default_backend())
+    ap.add_argument("--provider", choices=list(DEFAULT_MODELS), default="gemini")
+    ap.add_argument("--model", default="")
+    ap.add_argument("--fallback", choices=list(DEFAULT_MODELS), default=None)
+    ap.add_argument("--route", action="store_true", help="fast/strong routing (cv_router)")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--position", default="Tunneling Professional")
+    ap.add_argument("--no-filter", action="store_true", help="send the full extracted text (no cv_pagefilter)")
+    ap.add_argument("--no-index", action="store_true", help="do not add processed CVs to the candidate index")
+    ap.add_argument("--csv", action="store_true", help="also append cv_bot_records.csv")
+    a = ap.parse_args()
+
+    primary = Provider(a.provider, os.getenv(API_KEY_ENVS[a.provider]) or "", a.model or DEFAULT_MODELS[a.provider])
+    if not primary.api_key:
+        sys.exit(f"{API_KEY_ENVS[a.provider]} not set")
+    fallback = Provider(a.fallback, os.getenv(API_KEY_ENVS[a.fallback]) or "", DEFAULT_MODELS[a.fallback]) if a.fallback else None
+    route_cfg = RoutingConfig(primary.model, STRONG_MODELS[a.provider]) if a.route else None
+    options = batch_options(primary, fallback, route_cfg, CallPolicy(timeout=a.timeout), a.position,
+                            not a.no_index, a.backend, not a.no_filter)
+    svc = WorkerService(a.workers, _parse_rpm(a.rpm), a.render_workers)
+    watcher = DropWatcher(a.in_dir, a.out_dir, svc, options, a.settle, a.max_pending, a.attempts, a.csv)
+
+    halt = threading.Event()
+
+    def _stop(*_):
+        if halt.is_set():
+            raise KeyboardInterrupt   # second signal: leave without waiting for in-flight CVs
+        _log(f"stopping after {len(watcher.pending)} CV(s) in progress (again to quit now)")
+        halt.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    _log(f"watching {watcher.in_dir} -> {watcher.out_dir} every {a.interval:g}s ({a.workers} workers)")
+    try:
+        watcher.run(a.interval, a.once, halt)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,523 @@
+"""
+Shared worker service: one process per host that every Streamlit session hands its CVs to.
+
+Sessions post batches over local HTTP. Jobs wait in per-session queues served round-robin,
+so a 200-CV batch from one recruiter cannot starve a 3-CV batch from another. A fixed pool
+of worker threads runs the pipeline (extract -> filter -> redact -> LLM call layer -> sanitise ->
+index -> render), and a token bucket per provider caps the request rate of the whole host
+(retries and fallbacks included, via cv_llm_client.RATE_GATES). The UI polls batch status.
+
+    python cv_worker_service.py --port 8766 --workers 8 --rpm gemini=120,openai=300
+    CV_WORKER_URL=http://127.0.0.1:8766 streamlit run cv_summary_app6_...py
+
+    POST /batches               {"session", "options", "files": [{"name", "data" (base64)}], "more"} -> {"batch", "jobs"}
+    POST /batches/<id>/files    {"files", "more"}: the next chunk of a batch posted with "more": true
+    GET  /batches/<id>          job states, queue positions, captions, routing and token stats
+    POST /batches/<id>/cancel   drop the batch's queued jobs
+    GET  /batches/<id>/records  JSONL export record of every finished CV (cv_export), in batch order
+    GET  /jobs/<id>/docx        rendered DOCX
+    GET  /health                workers, queue depth per session, limiter rates
+"""
+import base64, contextlib, json, os, re, secrets, subprocess, sys, threading, time, urllib.error, urllib.request
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cv_index
+import cv_llm_client
+from cv_pipeline import (extract_text_any, canonicalize_text, strip_pii, build_payload, sanitize_cv_json,
+                         ensure_schema, cv_facts, upload_key, DEFAULT_TEMPLATE_PATH)
+from cv_export import build_record, jsonl_line
+from cv_llm_client import CallPolicy, LLMCallError, Provider
+from cv_pagefilter import filter_cv_text, describe_filter
+from cv_render_pool import RenderPool, renderer, default_backend
+from cv_router import RoutingConfig, TierStats, call_routed, describe_call
+from cv_usage import UsageLog, by_model, describe_usage
+
+WORKER_URL_ENV = "CV_WORKER_URL"
+DEFAULT_PORT = 8766
+BATCH_TTL = 3600.0           # seconds a finished batch (and its DOCX bytes) is kept
+MAX_BODY = 512 * 1024 * 1024
+CHUNK_BYTES = 32 * 1024 * 1024   # file bytes per request of WorkerClient.submit
+FINAL_STATES = ("done", "error", "cancelled")
+
+
+class RateLimiter:
+    """Token bucket: rpm requests per minute, bursts of up to `burst`."""
+
+    def __init__(self, rpm: float, burst: Optional[int] = None):
+        self.rpm = rpm
+        self.capacity = float(burst or max(1, int(rpm // 10)))
+        self._tokens = self.capacity
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rpm / 60.0)
+                self._t = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) * 60.0 / self.rpm
+            time.sleep(wait)
+
+
+class FairQueue:
+    """Per-session FIFO queues served round-robin."""
+
+    def __init__(self):
+        self._q: "OrderedDict[str, deque]" = OrderedDict()
+        self._cv = threading.Condition()
+
+    def put(self, session: str, item):
+        with self._cv:
+            self._q.setdefault(session, deque()).append(item)
+            self._cv.notify()
+
+    def get(self):
+        with self._cv:
+            while not self._q:
+                self._cv.wait()
+            session, dq = next(iter(self._q.items()))
+            item = dq.popleft()
+            del self._q[session]
+            if dq:
+                self._q[session] = dq  # back of the rotation
+            return item
+
+    def remove(self, pred) -> int:
+        with self._cv:
+            n = 0
+            for session in list(self._q):
+                dq = self._q[session]
+                keep = deque(x for x in dq if not pred(x))
+                n += len(dq) - len(keep)
+                if keep:
+                    self._q[session] = keep
+                else:
+                    del self._q[session]
+            return n
+
+    def positions(self) -> Dict[int, int]:
+        """id(item) -> number of jobs that will be taken before it."""
+        with self._cv:
+            queues = [list(dq) for dq in self._q.values()]
+        out, ahead = {}, 0
+        for rnd in range(max((len(q) for q in queues), default=0)):
+            for q in queues:
+                if rnd < len(q):
+                    out[id(q[rnd])] = ahead
+                    ahead += 1
+        return out
+
+    def depth(self) -> Dict[str, int]:
+        with self._cv:
+            return {s: len(dq) for s, dq in self._q.items()}
+
+
+class _Upload:
+    """Minimal stand-in for Streamlit's UploadedFile."""
+
+    def __init__(self, name: str, data: bytes):
+        self.name, self._data = name, data
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+class Job:
+    def __init__(self, job_id: str, batch: "Batch", name: str, data: bytes):
+        self.id, self.batch, self.name, self.data = job_id, batch, name, data
+        self.state = "queued"
+        self.notes: List[str] = []
+        self.error = ""
+        self.seconds = 0.0
+        self.docx: Optional[bytes] = None
+        self.record: Optional[dict] = None
+
+    def status(self, position: Optional[int]) -> dict:
+        return {"id": self.id, "name": self.name, "state": self.state, "queue_position": position,
+                "seconds": round(self.seconds, 2), "notes": self.notes, "error": self.error,
+                "docx": self.docx is not None}
+
+
+class Batch:
+    def __init__(self, batch_id: str, session: str, options: dict):
+        self.id, self.session, self.options = batch_id, session, options
+        self.jobs: List[Job] = []
+        self.tier_stats = TierStats()
+        self.calls = []  # cv_usage.Call for every provider request of the batch
+        self.created = self.touched = time.time()
+        self.finished: Optional[float] = None
+        self.open = False   # more chunks of files to come; not finished before the last one
+
+
+def _options(opts: dict):
+    """(primary, fallback, route_cfg, policy) from the JSON options of a batch."""
+    primary = Provider(**opts["primary"])
+    fallback = Provider(**opts["fallback"]) if opts.get("fallback") else None
+    route_cfg = RoutingConfig(**opts["route"]) if opts.get("route") else None
+    policy = CallPolicy(**(opts.get("policy") or {}))
+    return primary, fallback, route_cfg, policy
+
+
+class WorkerService:
+    def __init__(self, workers: int = 8, rpm: Optional[Dict[str, float]] = None, render_workers: int = 0,
+                 template_path: str = DEFAULT_TEMPLATE_PATH):
+        self.template_path = template_path
+        self.queue = FairQueue()
+        self.batches: Dict[str, Batch] = {}
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.limiters = {name: RateLimiter(r) for name, r in (rpm or {}).items() if r > 0}
+        for name, lim in self.limiters.items():
+            cv_llm_client.RATE_GATES[name] = lim.acquire
+        self.render_pool = RenderPool(template_path, render_workers) if render_workers > 0 else None
+        self._local = threading.local()
+        self.usage_log = UsageLog()
+        self.workers = [threading.Thread(target=self._work, name=f"cvjob-{i}", daemon=True) for i in range(workers)]
+        for t in self.workers:
+            t.start()
+
+    # ---- API ----
+    def submit(self, session: str, files: List[Tuple[str, bytes]], options: dict, more: bool = False) -> Batch:
+        """New batch; with more=True it stays open for add() until a chunk comes with more=False."""
+        _options(options)  # reject malformed options before anything is queued
+        with self._lock:
+            self._purge()
+            batch = Batch(secrets.token_hex(8), session, options)
+            self.batches[batch.id] = batch
+        self.add(batch, files, more)
+        return batch
+
+    def add(self, batch: Batch, files: List[Tuple[str, bytes]], more: bool = False) -> List[Job]:
+        """Queue more files of an open batch (any batch, for submit()); the new jobs in order."""
+        with self._lock:
+            jobs = [Job(secrets.token_hex(8), batch, name, data) for name, data in files]
+            for job in jobs:
+                batch.jobs.append(job)
+                self.jobs[job.id] = job
+            batch.open, batch.touched = more, time.time()
+            self._check_finished(batch)
+        for job in jobs:
+            self.queue.put(batch.session, job)
+        return jobs
+
+    def cancel(self, batch: Batch) -> int:
+        n = self.queue.remove(lambda j: j.batch is batch)
+        with self._lock:
+            for job in batch.jobs:
+                if job.state == "queued":
+                    job.state, job.data = "cancelled", b""
+            self._check_finished(batch)
+        return n
+
+    def status(self, batch: Batch) -> dict:
+        pos = self.queue.positions()
+        jobs = [j.status(pos.get(id(j))) for j in batch.jobs]
+        counts = {}
+        for j in jobs:
+            counts[j["state"]] = counts.get(j["state"], 0) + 1
+        return {"batch": batch.id, "session": batch.session, "total": len(jobs), "counts": counts,
+                "finished": batch.finished is not None, "jobs": jobs, "tiers": batch.tier_stats.summary(),
+                "usage": by_model(batch.calls)}
+
+    def health(self) -> dict:
+        return {"workers": len(self.workers), "queued": self.queue.depth(),
+                "running": sum(1 for j in list(self.jobs.values()) if j.state == "running"),
+                "batches": len(self.batches), "rpm": {k: v.rpm for k, v in self.limiters.items()},
+                "breakers": cv_llm_client.breaker_states()}
+
+    # ---- workers ----
+    def _purge(self):
+        # an open batch whose client stopped sending chunks goes too, BATCH_TTL after its last one
+        cutoff = time.time() - BATCH_TTL
+        for bid in [b.id for b in self.batches.values()
+                    if (b.finished is not None and b.finished < cutoff) or (b.open and b.touched < cutoff)]:
+            for job in self.batches.pop(bid).jobs:
+                self.jobs.pop(job.id, None)
+
+    def _check_finished(self, batch: Batch):
+        if batch.finished is None and not batch.open and all(j.state in FINAL_STATES for j in batch.jobs):
+            batch.finished = time.time()
+
+    def _index_con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = cv_index.connect()
+        return con
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            with self._lock:
+                if job.state != "queued":
+                    continue
+                job.state = "running"
+            t0 = time.monotonic()
+            try:
+                self._run(job)
+                job.state = "done"
+            except Exception as e:
+                job.error = f"API error: {e}" if isinstance(e, LLMCallError) else f"{type(e).__name__}: {e}"
+                job.state = "error"
+            job.seconds = time.monotonic() - t0
+            job.data = b""
+            with self._lock:
+                self._check_finished(job.batch)
+
+    def _account(self, job: Job, calls: list):
+        job.batch.calls.extend(calls)
+        self.usage_log.write(job.batch.id, job.name, calls)
+        if calls:
+            job.notes.append(describe_usage(calls))
+
+    def _run(self, job: Job):
+        opts = job.batch.options
+        primary, fallback, route_cfg, policy = _options(opts)
+        t_job = time.monotonic()
+        upload = _Upload(job.name, job.data)
+        raw = extract_text_any(upload, job.notes)
+        t_extract = time.monotonic() - t_job
+        if not raw:
+            raise ValueError("Could not extract text. Install PyMuPDF/pdfminer.six for PDF and python-docx for DOCX.")
+        if opts.get("page_filter", True):
+            raw, filter_stats = filter_cv_text(raw)
+            if describe_filter(filter_stats):
+                job.notes.append(describe_filter(filter_stats))
+        pii_counts = {}
+        text = strip_pii(canonicalize_text(raw), pii_counts)
+        payload = build_payload(text, opts.get("position") or "Tunneling Professional")
+        try:
+            resp, info = call_routed(payload, raw, primary, fallback, route_cfg, policy, job.batch.tier_stats)
+        except LLMCallError as e:
+            self._account(job, e.info.get("usage") or [])
+            raise
+        self._account(job, info["usage"])
+        if route_cfg is not None or info["fallback"] or info["hedged"] or info["attempts"] > 1:
+            job.notes.append(describe_call(info, route_cfg is not None))
+        data = sanitize_cv_json(resp or {}, pii_counts)
+        if pii_counts:
+            job.notes.append("Redacted: " + ", ".join(f"{k} ×{v}" for k, v in sorted(pii_counts.items())))
+        identity, profile, work, edu, skills, courses = ensure_schema(data, payload["desired_position"], text)
+        content_hash, facts = upload_key(upload), cv_facts(identity, work)
+        if opts.get("index_save", True):
+            try:
+                cv_index.index_candidate(self._index_con(), content_hash, job.name, identity, work, edu, skills, courses, facts)
+            except Exception as e:
+                job.notes.append(f"Index error: {e}")
+        job.record = build_record(job.name, identity, profile, work, edu, skills, courses, content_hash=content_hash,
+                                  batch=job.batch.id, facts=facts, llm=info,
+                                  timings={"extract_s": t_extract, "llm_s": info["seconds"],
+                                           "total_s": time.monotonic() - t_job})
+        cv = {"identity": identity, "profile": profile, "work": work, "education": edu,
+              "skills": skills, "courses": courses, "full_text": text}
+        backend = opts.get("backend") or default_backend()
+        if self.render_pool is not None and backend == self.render_pool.backend:
+            job.docx = self.render_pool.submit(cv).result()
+        else:
+            job.docx = renderer(backend)(self.template_path, identity, profile, work, edu, skills, courses, full_text=text)
+
+    # ---- HTTP ----
+    def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+        httpd = ThreadingHTTPServer((host, port), self._handler())
+        httpd.daemon_threads = True
+        return httpd
+
+    def _handler(self):
+        svc = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body, ctype: str = "application/json"):
+                data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _batch(self, bid: str) -> Optional[Batch]:
+                with svc._lock:
+                    return svc.batches.get(bid)
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/health":
+                    return self._send(200, svc.health())
+                m = re.fullmatch(r"/batches/(\w+)", path)
+                if m:
+                    batch = self._batch(m.group(1))
+                    return self._send(200, svc.status(batch)) if batch else self._send(404, {"error": "no such batch"})
+                m = re.fullmatch(r"/batches/(\w+)/records", path)
+                if m:
+                    batch = self._batch(m.group(1))
+                    if batch is None:
+                        return self._send(404, {"error": "no such batch"})
+                    body = "".join(jsonl_line(j.record) for j in batch.jobs if j.record is not None)
+                    return self._send(200, body.encode("utf-8"), "application/x-ndjson")
+                m = re.fullmatch(r"/jobs/(\w+)/docx", path)
+                if m:
+                    with svc._lock:
+                        job = svc.jobs.get(m.group(1))
+                    if job is None or job.docx is None:
+                        return self._send(404, {"error": "no DOCX for this job"})
+                    return self._send(200, job.docx,
+                                      "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+                self._send(404, {"error": f"no route {path}"})
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                n = int(self.headers.get("Content-Length") or 0)
+                if n > MAX_BODY:
+                    return self._send(413, {"error": "request too large"})
+                try:
+                    req = json.loads(self.rfile.read(n) or b"{}")
+                except ValueError:
+                    return self._send(400, {"error": "invalid JSON"})
+                if path == "/batches":
+                    try:
+                        files = [(f["name"], base64.b64decode(f["data"])) for f in req.get("files") or []]
+                        batch = svc.submit(str(req.get("session") or "anonymous"), files, req.get("options") or {},
+                                           bool(req.get("more")))
+                    except (KeyError, TypeError, ValueError) as e:
+                        return self._send(400, {"error": f"bad batch: {e}"})
+                    return self._send(200, {"batch": batch.id, "jobs": [j.id for j in batch.jobs]})
+                m = re.fullmatch(r"/batches/(\w+)/files", path)
+                if m:
+                    batch = self._batch(m.group(1))
+                    if batch is None or not batch.open:
+                        return self._send(404 if batch is None else 409, {"error": "no such open batch"})
+                    try:
+                        files = [(f["name"], base64.b64decode(f["data"])) for f in req.get("files") or []]
+                    except (KeyError, TypeError, ValueError) as e:
+                        return self._send(400, {"error": f"bad files: {e}"})
+                    return self._send(200, {"batch": batch.id, "jobs": [j.id for j in svc.add(batch, files, bool(req.get("more")))]})
+                m = re.fullmatch(r"/batches/(\w+)/cancel", path)
+                if m:
+                    batch = self._batch(m.group(1))
+                    if batch is None:
+                        return self._send(404, {"error": "no such batch"})
+                    return self._send(200, {"cancelled": svc.cancel(batch)})
+                self._send(404, {"error": f"no route {path}"})
+
+        return Handler
+
+
+# ---------------- Client (used by the Streamlit app) ----------------
+class WorkerClient:
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url, self.timeout = url.rstrip("/"), timeout
+
+    def _call(self, method: str, path: str, body: Optional[dict] = None) -> bytes:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data is not None else {})
+        with urllib.request.urlopen(req, timeout=self.timeout) as r:
+            return r.read()
+
+    def health(self) -> Optional[dict]:
+        try:
+            return json.loads(self._call("GET", "/health"))
+        except (OSError, ValueError):
+            return None
+
+    def submit(self, session: str, files: Iterable[Tuple[str, bytes]], options: dict, chunk_bytes: int = CHUNK_BYTES) -> dict:
+        """
+        One batch, posted in requests of about chunk_bytes of files as `files` yields them, so a
+        large ZIP is never held in memory (or base64 JSON) whole. {"batch", "jobs"} of all chunks.
+        """
+        batch, jobs, chunk, size = None, [], [], 0
+        it = iter(files)
+        nxt = next(it, None)
+        while True:
+            if nxt is not None:
+                chunk.append(nxt)
+                size += len(nxt[1])
+                nxt = next(it, None)
+            if nxt is not None and size < chunk_bytes:
+                continue
+            body = {"files": [{"name": n, "data": base64.b64encode(d).decode("ascii")} for n, d in chunk], "more": nxt is not None}
+            if batch is None:
+                r = json.loads(self._call("POST", "/batches", dict(body, session=session, options=options)))
+                batch = r["batch"]
+            else:
+                try:
+                    r = json.loads(self._call("POST", f"/batches/{batch}/files", body))
+                except OSError:
+                    with contextlib.suppress(OSError, ValueError):
+                        self.cancel(batch)   # do not spend quota on half a batch nobody will collect
+                    raise
+            jobs += r["jobs"]
+            chunk, size = [], 0
+            if nxt is None:
+                return {"batch": batch, "jobs": jobs}
+
+    def status(self, batch: str) -> dict:
+        return json.loads(self._call("GET", f"/batches/{batch}"))
+
+    def cancel(self, batch: str) -> dict:
+        return json.loads(self._call("POST", f"/batches/{batch}/cancel", {}))
+
+    def docx(self, job: str) -> bytes:
+        return self._call("GET", f"/jobs/{job}/docx")
+
+    def records(self, batch: str) -> List[dict]:
+        return [json.loads(line) for line in self._call("GET", f"/batches/{batch}/records").splitlines() if line.strip()]
+
+
+def batch_options(primary: Provider, fallback: Optional[Provider], route_cfg: Optional[RoutingConfig],
+                  policy: CallPolicy, position: str, index_save: bool, backend: str, page_filter: bool = True) -> dict:
+    return {"primary": primary._asdict(), "fallback": fallback._asdict() if fallback else None,
+            "route": route_cfg._asdict() if route_cfg else None, "policy": policy._asdict(),
+            "position": position, "index_save": index_save, "backend": backend, "page_filter": page_filter}
+
+
+def ensure_local_service(port: int = DEFAULT_PORT, wait: float = 15.0) -> WorkerClient:
+    """Client for the service on this host, starting one in the background if none answers."""
+    client = WorkerClient(f"http://127.0.0.1:{port}")
+    if client.health() is not None:
+        return client
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "--port", str(port)], start_new_session=True,
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.25)
+        if client.health() is not None:
+            return client
+    raise urllib.error.URLError(f"worker service did not start on port {port}")
+
+
+def _parse_rpm(s: str) -> Dict[str, float]:
+    out = {}
+    for part in (s or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            out[k.strip()] = float(v)
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Shared CV worker service for all Streamlit sessions on this host.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("CV_WORKER_THREADS", "8")))
+    ap.add_argument("--rpm", default=os.getenv("CV_WORKER_RPM", ""), help="per-provider request rate, e.g. gemini=120,openai=300")
+    ap.add_argument("--render-workers", type=int, default=0, help="DOCX render processes (0 = render in the worker threads)")
+    a = ap.parse_args()
+    svc = WorkerService(a.workers, _parse_rpm(a.rpm), a.render_workers)
+    httpd = svc.serve(a.host, a.port)
+    print(f"CV worker service on http://{a.host}:{a.port}  ({a.workers} workers, rpm {a.rpm or 'unlimited'})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
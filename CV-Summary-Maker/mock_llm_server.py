@@ -0,0 +1,240 @@
+"""
+Local stand-in for the two LLM endpoints the app uses, for offline load and latency tests.
+
+    POST /v1beta/models/{model}:generateContent   Gemini REST (call_gemini_json)
+    POST /v1/chat/completions                     OpenAI   (call_openai_json)
+
+JSON-mode requests get a schema-valid compact CV (built-in, or --fixture with a verbose
+result JSON), packed requests (cv_pack) one such CV per input id; plain-text requests get a
+summary paragraph. Latency is log-normal, and
+the server can inject 5xx errors, periodic 429 bursts, an RPM limit (429 + Retry-After)
+and malformed JSON answers (markdown fence + trailing comma, or cut off mid-array).
+
+    python mock_llm_server.py --port 8765 --latency-median 1.2 --latency-sigma 0.7 --error-rate 0.02 --burst-every 60 --burst-len 5
+    GEMINI_BASE_URL=http://127.0.0.1:8765 OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run cv_summary_app6_...py
+"""
+import json, math, random, re, threading, time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Optional
+
+from cv_llm import compact_from_verbose
+
+CANNED_CV = {
+    "identity": {"name_initials": "J.D.", "position": "TBM Operator", "nationality": "Italy",
+                 "languages": ["English", "Italian"], "year_of_birth": "1980"},
+    "work_experiences": [
+        {"from": "2019-03", "to": "Present", "role": "TBM Operator", "project": "Metro Line 3, EPB TBM Ø 6.6 m, Herrenknecht",
+         "city_country": "Doha, Qatar", "bullets": ["Operated EPB TBM with foam conditioning and face pressure control.",
+                                                    "Ring build with VMT guidance; 2.1 km drive."]},
+        {"from": "2014-06", "to": "2019-02", "role": "TBM Operator", "project": "Sewer tunnel, slurry TBM Ø 3.2 m, Robbins",
+         "city_country": "Milan, Italy", "bullets": ["Slurry separation plant and bentonite density monitoring."]},
+        {"from": "2010-01", "to": "2014-05", "role": "Segment Erector", "project": "Road tunnel, Mixshield Ø 11.2 m",
+         "city_country": "Istanbul, Turkey", "bullets": ["Segment erection and annular grouting."]},
+    ],
+    "education": ["Diploma in Mechanical Engineering — Technical Institute, Turin, Italy (1999)"],
+    "skills": ["EPB", "Slurry", "Ring build", "VMT guidance"],
+    "courses": ["Confined space", "First aid"],
+}
+CANNED_SUMMARY = ("TBM Operator with over 14 years of experience in mechanised tunnelling across metro, sewer and road "
+                  "projects. Experience covers EPB, slurry and Mixshield machines with diameters from Ø 3.2 to 11.2 m, "
+                  "working with Herrenknecht and Robbins equipment. International experience in Qatar, Italy and Turkey, "
+                  "including ring build, segment erection and face pressure control.")
+
+
+_PACK_ID_RE = re.compile(r'\{"id": ("(?:[^"\\]|\\.)*")')
+
+
+class MockConfig(NamedTuple):
+    latency_median: float = 1.0    # seconds, log-normal
+    latency_sigma: float = 0.6
+    latency_max: float = 120.0
+    error_rate: float = 0.0        # share of requests answered 500/503
+    burst_every: float = 0.0       # seconds between 429 bursts (0 = off)
+    burst_len: float = 0.0         # seconds each burst lasts
+    rpm: int = 0                   # requests per minute per API (gemini / openai) before 429; 0 = unlimited
+    seed: Optional[int] = None
+    fixture: Optional[dict] = None  # verbose result JSON to serve instead of CANNED_CV
+    bad_json_rate: float = 0.0     # share of JSON answers that are fenced/trailing-comma or truncated
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "429_burst": 0, "429_rpm": 0, "5xx": 0, "404": 0, "bad_json": 0}
+
+    def bump(self, key: str):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class MockLLMServer:
+    """Threaded HTTP server; start() returns the base URL, stop() shuts it down."""
+
+    def __init__(self, cfg: MockConfig = MockConfig(), host: str = "127.0.0.1", port: int = 0):
+        self.cfg = cfg
+        self.stats = MockStats()
+        self._rng = random.Random(cfg.seed)
+        self._rng_lock = threading.Lock()
+        self._recent = {"gemini": deque(), "openai": deque()}
+        self._t0 = time.monotonic()
+        body = compact_from_verbose(cfg.fixture or CANNED_CV)
+        self._json_text = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # ---- behaviour ----
+    def _latency(self) -> float:
+        with self._rng_lock:
+            x = self._rng.lognormvariate(math.log(max(self.cfg.latency_median, 1e-6)), self.cfg.latency_sigma)
+        return min(x, self.cfg.latency_max)
+
+    def _fault(self, api: str):
+        """(status, retry_after, stats key) for an injected failure, or None."""
+        now = time.monotonic()
+        c = self.cfg
+        if c.burst_every > 0 and c.burst_len > 0:
+            phase = (now - self._t0) % c.burst_every
+            if phase < c.burst_len:
+                return 429, math.ceil(c.burst_len - phase), "429_burst"
+        if c.rpm > 0:
+            recent = self._recent[api]
+            with self._rng_lock:
+                while recent and now - recent[0] > 60:
+                    recent.popleft()
+                if len(recent) >= c.rpm:
+                    return 429, math.ceil(60 - (now - recent[0])), "429_rpm"
+                recent.append(now)
+        with self._rng_lock:
+            if c.error_rate > 0 and self._rng.random() < c.error_rate:
+                return self._rng.choice((500, 503)), 0, "5xx"
+        return None
+
+    def _malformed(self, text: str) -> str:
+        """text as a careless model might send it, or unchanged."""
+        with self._rng_lock:
+            if not (self.cfg.bad_json_rate > 0 and self._rng.random() < self.cfg.bad_json_rate):
+                return text
+            cut = self._rng.random() < 0.5
+            at = self._rng.randint(len(text) // 3, len(text) - 2)
+        self.stats.bump("bad_json")
+        if cut:
+            return text[:at]
+        return "```json\n" + text[:-1] + ",}\n```"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, obj: dict, retry_after: int = 0):
+                data = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if retry_after:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                try:
+                    req = json.loads(self.rfile.read(n) or b"{}")
+                except ValueError:
+                    req = {}
+                server.stats.bump("requests")
+                gemini = re.match(r"^/v1(?:beta)?/models/([^:/]+):generateContent", self.path)
+                openai = self.path.split("?")[0].endswith("/chat/completions")
+                if not (gemini or openai):
+                    server.stats.bump("404")
+                    return self._send(404, {"error": {"code": 404, "message": f"no mock for {self.path}"}})
+                fault = server._fault("gemini" if gemini else "openai")
+                if fault:
+                    status, retry_after, key = fault
+                    server.stats.bump(key)
+                    if gemini:
+                        err = {"code": status, "message": "Resource has been exhausted" if status == 429 else "Internal error",
+                               "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"}
+                    else:
+                        err = {"message": "Rate limit reached" if status == 429 else "Server error",
+                               "type": "rate_limit_error" if status == 429 else "server_error", "code": None}
+                    time.sleep(min(0.05, server.cfg.latency_median))
+                    return self._send(status, {"error": err}, retry_after)
+                time.sleep(server._latency())
+                if gemini:
+                    prompt = "".join(p.get("text", "") for c in req.get("contents", []) for p in c.get("parts", []))
+                    json_mode = (req.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+                else:
+                    prompt = "".join(str(m.get("content") or "") for m in req.get("messages", []))
+                    json_mode = (req.get("response_format") or {}).get("type") == "json_object"
+                ids = _PACK_ID_RE.findall(prompt) if json_mode and '"cvs": [' in prompt else []
+                if ids:
+                    body = server._json_text[1:-1]
+                    text = server._malformed('{"r":[' + ",".join(f'{{"id":{i},{body}}}' for i in ids) + "]}")
+                else:
+                    text = server._malformed(server._json_text) if json_mode else CANNED_SUMMARY
+                pt, ct = max(1, len(prompt) // 4), max(1, len(text) // 4)
+                server.stats.bump("ok")
+                if gemini:
+                    return self._send(200, {
+                        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+                        "usageMetadata": {"promptTokenCount": pt, "candidatesTokenCount": ct, "totalTokenCount": pt + ct},
+                        "modelVersion": gemini.group(1)})
+                return self._send(200, {
+                    "id": f"chatcmpl-mock-{time.monotonic_ns()}", "object": "chat.completion", "created": int(time.time()),
+                    "model": req.get("model") or "mock",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": pt, "completion_tokens": ct, "total_tokens": pt + ct}})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Mock Gemini/OpenAI endpoints for offline load tests.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-median", type=float, default=1.0)
+    ap.add_argument("--latency-sigma", type=float, default=0.6)
+    ap.add_argument("--latency-max", type=float, default=120.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--burst-every", type=float, default=0.0)
+    ap.add_argument("--burst-len", type=float, default=0.0)
+    ap.add_argument("--rpm", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--fixture", default=None, help="verbose result JSON to serve")
+    ap.add_argument("--bad-json-rate", type=float, default=0.0)
+    a = ap.parse_args()
+    fixture = None
+    if a.fixture:
+        with open(a.fixture, encoding="utf-8") as fh:
+            fixture = json.load(fh)
+    srv = MockLLMServer(MockConfig(a.latency_median, a.latency_sigma, a.latency_max, a.error_rate, a.burst_every,
+                                   a.burst_len, a.rpm, a.seed, fixture, a.bad_json_rate), a.host, a.port)
+    print(f"mock LLM on {srv.url}  (GEMINI_BASE_URL={srv.url} OPENAI_BASE_URL={srv.url}/v1)")
+    try:
+        srv._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(srv.stats.counts))
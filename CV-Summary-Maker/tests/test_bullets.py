@@ -0,0 +1,17 @@
+from cv_pipeline import rewrite_cv_bullets
+
+BOILER = "Ensured compliance with all company health, safety and environmental procedures on site at all times."
+
+
+def test_copied_boilerplate_kept_once_across_projects():
+    projects = [[f"Supervised {n} m of EPB tunnel drive number {i} with segment erection and grouting.",
+                 f"Managed a crew of {n // 10} operatives for the cross passage works on contract {i}.", BOILER]
+                for i, n in enumerate(range(100, 1100, 100))]
+    out = rewrite_cv_bullets(projects)
+    assert sum(b.count("health, safety") for bullets in out for b in bullets) == 1
+    assert all(len(bullets) >= 2 for bullets in out)
+
+
+def test_project_with_only_a_repeat_keeps_it():
+    out = rewrite_cv_bullets([[BOILER, "Installed 1,200 rings on the TBM drive for the metro line extension."], [BOILER]])
+    assert len(out[1]) == 1 and "health, safety" in out[1][0]
@@ -0,0 +1,36 @@
+import random
+import re
+
+from cv_pipeline import _METHOD_PATTERN_SRC, scan_methods
+
+WORDS = ["epb", "EPBM", "slurry", "shield", "tail", "mix", "mixshield", "premix", "charging", "discharging", "d&b",
+         "drill", "&", "blast", "and", "tbm", "open", "mode", "boom", "header", "ream", "reamer", "thrust", "jacks",
+         "foam", "polymer", "natm", "sem", "ds", "ss", "hard", "rock", "x", "2", "tunnel", "pressure", "balance",
+         "earth", "bentonite", "profile", "gripper", "pads", "face", "grout", "annular", "pilot", "hole"]
+SEPS = [" ", "", "-", "\n", ", ", "&", "  "]
+
+
+def _reference(text):
+    counts = {}
+    for pat, targets in _METHOD_PATTERN_SRC:
+        n = sum(1 for _ in re.finditer(pat, text, re.I))
+        for t in targets:
+            if n:
+                counts[t] = counts.get(t, 0) + n
+    return counts
+
+
+def test_scan_methods_matches_finditer_per_pattern():
+    rnd = random.Random(45)
+    for _ in range(3000):
+        text = "".join(rnd.choice(WORDS) + rnd.choice(SEPS) for _ in range(rnd.randint(1, 14)))
+        if rnd.random() < 0.1:
+            text = "İ" + text   # lowercases to two characters: the regex fallback for mid-word starts
+        assert scan_methods(text) == _reference(text), text
+
+
+def test_patterns_without_word_boundary_match_inside_words():
+    hits = scan_methods("mixshield tail; premix shield; discharging")
+    assert hits[("trait", "SINGLE SHIELD")] == 1
+    assert hits[("trait", "DRILL & BLAST")] == 1
+    assert hits[("name", "MIXSHIELD")] == 3
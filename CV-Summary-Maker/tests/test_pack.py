@@ -0,0 +1,36 @@
+import cv_llm_client
+from cv_llm_client import CallPolicy, Provider
+from cv_pack import PackItem, call_pack
+
+
+class _HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+
+
+def _fake(status, sent):
+    def call(api_key, model, payload, timeout=None):
+        sent.append(len(payload.get("cvs") or [None]))
+        raise _HTTPError(status)
+    return call
+
+
+def _run(monkeypatch, status):
+    sent = []
+    monkeypatch.setitem(cv_llm_client.PACKED_PROVIDERS, "openai", _fake(status, sent))
+    monkeypatch.setitem(cv_llm_client.PROVIDERS, "openai", _fake(status, sent))
+    monkeypatch.setattr(cv_llm_client, "_BREAKERS", {})
+    group = [PackItem(str(i), {"resume_text": "x" * 400, "desired_position": "TBM"}, "x" * 400) for i in range(4)]
+    out = call_pack(group, Provider("openai", "k", "gpt-4o-mini"), None, None,
+                    CallPolicy(attempts=1, hedge=False, breaker_failures=100))
+    assert [r.item.key for r in out] == ["0", "1", "2", "3"] and all(r.error is not None for r in out)
+    return sent
+
+
+def test_final_error_is_not_split(monkeypatch):
+    assert _run(monkeypatch, 401) == [4]
+
+
+def test_retryable_error_is_split(monkeypatch):
+    assert _run(monkeypatch, 503) == [4, 2, 1, 1, 2, 1, 1]
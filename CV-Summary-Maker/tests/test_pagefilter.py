@@ -0,0 +1,45 @@
+from cv_pagefilter import filter_cv_text
+
+
+def test_boilerplate_run_stops_at_unrecognised_heading():
+    raw = ("John Smith\nTunnel Engineer\nInterests\nFootball\nEmployment Record\n"
+           "2015 - 2019 Site Engineer, ACME, Dubai\nSupervised segment erection and grouting on the metro line.\n"
+           "2012 - 2015 Assistant Engineer, BuildCo, Doha\nSetting out and quantity surveys for road works.\n")
+    out, stats = filter_cv_text(raw)
+    assert "2015 - 2019 Site Engineer, ACME, Dubai" in out
+    assert "2012 - 2015 Assistant Engineer, BuildCo, Doha" in out
+    assert "Football" not in out
+    assert stats["removed"].get("boilerplate", 0) < 40
+
+
+def test_dated_line_ends_boilerplate_without_heading():
+    raw = ("Jane Doe\nDeclaration\nI hereby declare that the above is true.\n"
+           "2018 - present TBM Pilot, Metro Line 3\nOperated EPB machine.\n")
+    out, _ = filter_cv_text(raw)
+    assert "I hereby declare" not in out
+    assert "2018 - present TBM Pilot, Metro Line 3" in out
+    assert "Operated EPB machine." in out
+
+
+def test_short_last_page_with_words_is_kept():
+    raw = ("John Smith\nTunnel Engineer\n2015 - 2019 Site Engineer, ACME, Dubai\nSupervised segment erection.\n"
+           "\fLanguages: English, Arabic\n")
+    out, stats = filter_cv_text(raw)
+    assert "Languages: English, Arabic" in out
+    assert stats["kinds"] == ["cv", "cv"]
+    assert filter_cv_text("CV text of the first page, long enough.\f\n  3  \n")[1]["kinds"][-1] == "empty"
+
+
+def test_personal_fields_end_boilerplate_run():
+    raw = ("John Smith\nPersonal Details\nNationality: British\nInterests\nFootball\n"
+           "Date of birth: 1980\nLanguages: English\n")
+    out, _ = filter_cv_text(raw)
+    assert "Football" not in out
+    assert "Date of birth: 1980" in out
+    assert "Languages: English" in out
+
+
+def test_dropped_unit_holding_identity_facts_is_restored():
+    raw = "John Smith\nTunnel Engineer\nHobbies\nFootball, fluent in Arabic and Italian\n"
+    out, stats = filter_cv_text(raw)
+    assert "Arabic and Italian" in out and stats["restored"] == 1
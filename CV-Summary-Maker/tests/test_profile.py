@@ -0,0 +1,14 @@
+from cv_profile import RunProfiler
+
+
+def test_overlapping_runs_fall_back_to_sampling():
+    first, second = RunProfiler().start(), RunProfiler().start()
+    sum(i * i for i in range(10000))
+    second.stop()
+    first.stop()
+    assert first.cprofiled and not second.cprofiled
+    assert second.ran and second.pstats_bytes() == b""
+    assert all(r["calls"] is None for r in second.summary())
+    third = RunProfiler().start()
+    third.stop()
+    assert third.cprofiled
@@ -0,0 +1,13 @@
+from cv_pipeline import cv_facts
+from cv_quantities import scan_quantities
+
+
+def test_bare_km_is_not_tunnel_length():
+    work = [{"role": "Site Engineer", "project": "Coastal Highway 120 km", "city_country": "Dubai, UAE",
+             "bullets": ["Office located 15 km from site", "Supervised tunnel works"]}]
+    assert cv_facts({}, work)["tunnel_m"] == 0.0
+
+
+def test_km_with_tunnel_word_in_clause_is_length():
+    assert [(q.kind, q.value) for q in scan_quantities("Metro Line 3, 12 km twin-bore tunnels")] == [("length", 12000.0)]
+    assert [(q.kind, q.value) for q in scan_quantities("Road 40 km. Tunnel 3 km long")] == [("length", 3000.0)]
@@ -0,0 +1,12 @@
+from cv_usage import Call, by_model, split_usage, totals
+
+
+def test_shares_of_one_request_count_once():
+    packed = Call("openai", "gpt-4o-mini", "packed", 900, 300, 0, 1.5)
+    single = Call("openai", "gpt-4o-mini", "extract", 400, 100, 0, 0.5)
+    shares = split_usage([packed], [1, 1, 1])
+    calls = [c for s in shares for c in s] + [single]
+    t = totals(calls)
+    assert (t["calls"], t["input_tokens"], t["output_tokens"]) == (2, 1300, 400)
+    assert [(r["kind"], r["calls"]) for r in by_model(calls)] == [("extract", 1), ("packed", 1)]
+    assert totals(shares[0])["calls"] == 1